@@ -4,20 +4,52 @@ AI陪伴对话后端服务
 """
 import os
 import io
+import asyncio
+import base64
 import logging
-from typing import Optional, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import quote
 import numpy as np
-import soundfile as sf
-import torch
-import torchaudio
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import requests
+import httpx
 import json
 from config import Config
+from vad_engine import INT8_OP_TYPES, BatchVAD, OnnxVAD, VADStream, export_sequence_onnx, sequence_onnx_path, speech_segments
+from onnx_runtime import ONNX_INT8, TORCH, backend_name, is_onnx, quantize_dynamic_int8
+from resampler import ResamplerPool, CANONICAL_SAMPLE_RATE
+from scheduler import InferenceScheduler, QueueFullError
+from llm_client import LLMClient, LLMResponseError, LLMStreamInterrupted
+from sentence_splitter import SentenceSplitter
+from audio_output import (
+    ENCODABLE_FORMATS, FALLBACK_FORMAT, FORMATS, AudioFormat, StreamEncoder, UnsupportedOutputFormatError, encode_audio,
+    get_format, negotiate_format
+)
+from voice_prompt import VoicePrompt, VoicePromptRegistry
+from voice_session import VoiceSession, pcm16_to_float
+from model_manager import ModelManager, ModelNotReadyError
+from prefork import worker_info
+from model_server import ASR, TTS, ModelServerClient, server_addresses
+from micro_batcher import MicroBatcher
+from session_store import SessionStore, fit_history, load_session_backend, message_tokens, valid_session_id
+from tts_cache import TTSCache
+from audio_artifacts import AudioArtifact, AudioArtifactStore, RangeNotSatisfiableError, parse_range, valid_artifact_id
+from audio_upload import (
+    AudioTooLongError, UnsupportedAudioError, UploadLimitMiddleware, check_extension, decodable_formats, decode_audio_file
+)
+from asr_engine import (
+    OFFLINE, STREAMING, ASREngine, OfflineParaformerEngine, StreamingParaformerEngine, UnknownASREngineError, engine_name,
+    load_onnx_asr_model, load_onnx_punc_model
+)
+from audio_buffer import as_mono_float32, concat, first_channel, gather_segments, normalize_peak_
+from model_paths import enable_offline_mode, resolve_asr_model, resolve_modelscope_model, resolve_onnx_asr_model, load_silero_vad
+import metrics
+from metrics import MetricsMiddleware, stage_timer, observe_stage, count_early_exit
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +57,9 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="AI陪伴对话服务", description="VAD + ASR + AI对话 + TTS完整流程")
 
+# 上传大小限制：接收请求体的过程中超过MAX_AUDIO_SIZE_MB即返回413（在CORS之前添加，413响应也带CORS头）
+app.add_middleware(UploadLimitMiddleware, max_bytes=Config.MAX_AUDIO_SIZE_MB * 1024 * 1024)
+
 # 配置CORS，允许所有来源
 app.add_middleware(
     CORSMiddleware,
@@ -32,36 +67,257 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有HTTP方法
     allow_headers=["*"],  # 允许所有请求头
-    expose_headers=["X-User-Text", "X-AI-Reply", "X-Audio-Sample-Rate"]  # 暴露自定义响应头供前端读取
+    expose_headers=["X-User-Text", "X-AI-Reply", "X-Audio-Sample-Rate", "X-Audio-Format", "Retry-After", "Server-Timing",
+                    "ETag", "Accept-Ranges", "Content-Range"]  # 暴露自定义响应头供前端读取
 )
 
 # 使用配置
 config = Config()
 
+# 离线模式：模型只从本地路径/缓存加载，不访问任何模型仓库
+if config.MODEL_OFFLINE:
+    enable_offline_mode()
+
+# 请求耗时与各阶段耗时指标（/metrics），可选附加Server-Timing响应头
+app.add_middleware(MetricsMiddleware, server_timing=config.METRICS_SERVER_TIMING)
+
 # ==================== 全局模型实例 ====================
-asr_model = None
+asr_model = None          # 流式ASR（实时会话，及ASR_UPLOAD_ENGINE=streaming时的上传接口）
+asr_offline_model = None  # 离线ASR（上传的完整录音）
+asr_punc_model = None     # 离线识别结果的标点模型（可选）
 vad_model = None
+vad_engine = None
 tts_model = None
+inference_backends: Dict[str, str] = {}  # 各模型实际使用的推理后端（ONNX加载失败时退回torch）
+
+# 拆分部署：ASR/TTS模型在独立的服务进程中，上面的模型实例是转发推理任务的代理（见model_server.py）
+asr_server = ModelServerClient(
+    ASR, server_addresses(config.MODEL_SERVER_DIR, ASR, config.ASR_SERVER_WORKERS), config.MODEL_SERVER_TIMEOUT
+) if config.MODEL_SERVER_ENABLED else None
+tts_server = ModelServerClient(
+    TTS, server_addresses(config.MODEL_SERVER_DIR, TTS, config.TTS_SERVER_WORKERS), config.MODEL_SERVER_TIMEOUT
+) if config.MODEL_SERVER_ENABLED else None
+
+# TTS音色提示注册表（参考音频特征只提取一次）与解析后的参考音频路径
+voice_registry = VoicePromptRegistry(config.TTS_VOICE_CACHE_DIR, config.TTS_MODEL_ID)
+tts_ref_audio = None
+
+# TTS输出缓存（编码后的音频字节：内存LRU + 可选磁盘层）
+tts_cache = TTSCache(
+    int(config.TTS_CACHE_MAX_MB * 1024 * 1024),
+    config.TTS_CACHE_DIR,
+    int(config.TTS_CACHE_DISK_MAX_MB * 1024 * 1024)
+) if config.TTS_CACHE_ENABLED else None
+
+# 回复音频存储（/api/complete、/api/chat 返回的audio_url：内存LRU + 可选磁盘层，按TTL过期）
+artifact_store = AudioArtifactStore(
+    config.AUDIO_ARTIFACT_TTL_SECONDS,
+    int(config.AUDIO_ARTIFACT_MAX_MB * 1024 * 1024),
+    config.AUDIO_ARTIFACT_DIR,
+    int(config.AUDIO_ARTIFACT_DISK_MAX_MB * 1024 * 1024)
+) if config.AUDIO_ARTIFACT_ENABLED else None
+
+# 重采样器缓存（VAD和ASR共用）
+resampler_pool = ResamplerPool(config.RESAMPLER_CACHE_SIZE)
+
+# 拆分部署时ASR/TTS阶段的线程只等待服务进程返回，线程数至少与服务进程数相同，各服务进程才能同时工作
+asr_stage_workers = max(config.SCHEDULER_ASR_WORKERS, config.ASR_SERVER_WORKERS if asr_server else 0)
+tts_stage_workers = max(config.SCHEDULER_TTS_WORKERS, config.TTS_SERVER_WORKERS if tts_server else 0)
+
+# 推理调度器：每个阶段独立的有界线程池，模型推理不在事件循环中执行
+scheduler = InferenceScheduler(
+    {
+        "audio": config.SCHEDULER_AUDIO_WORKERS,
+        "vad": config.SCHEDULER_VAD_WORKERS,
+        "asr": asr_stage_workers,
+        "tts": tts_stage_workers
+    },
+    max_queue=config.SCHEDULER_MAX_QUEUE,
+    queue_timeout=config.SCHEDULER_QUEUE_TIMEOUT
+)
+
+# 模型管理器：ASR/VAD/TTS在后台并行加载（或首次使用时加载），加载函数在TTS模块之后注册
+model_manager = ModelManager(
+    lazy=config.MODEL_LAZY_LOAD,
+    wait_timeout=config.MODEL_LOAD_WAIT_SECONDS,
+    warmup=config.MODEL_WARMUP
+)
+
+async def require_models(*names: str):
+    """等待接口依赖的模型加载结束，超时仍在加载时返回503并带上Retry-After"""
+    try:
+        await model_manager.wait_for(*names)
+    except ModelNotReadyError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def run_stage(stage: str, func, *args, **kwargs):
+    """
+    在对应阶段的线程池中执行阻塞函数，排队已满时返回503并带上Retry-After
+    vad/asr/tts阶段先等待对应模型加载结束
+    """
+    await require_models(stage)
+    try:
+        return await scheduler.run(stage, func, *args, **kwargs)
+    except QueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+# ==================== 音频预处理 ====================
+def prepare_audio(source: Union[bytes, BinaryIO]) -> Tuple[np.ndarray, int]:
+    """
+    解码上传的音频（字节或可seek的文件对象），统一转换为16000Hz float32单声道
+    逐块解码只保留单声道，每个请求只重采样一次，VAD和ASR共用同一份数据
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with stage_timer("decode"):
+        audio_data, sample_rate = decode_audio_file(source, CANONICAL_SAMPLE_RATE, config.MAX_AUDIO_SECONDS)
+    
+    if sample_rate != CANONICAL_SAMPLE_RATE:
+        logger.info(f"重采样: {sample_rate}Hz -> {CANONICAL_SAMPLE_RATE}Hz")
+        audio_data = resample_audio(audio_data, sample_rate, CANONICAL_SAMPLE_RATE)
+    return audio_data, CANONICAL_SAMPLE_RATE
+
+async def decode_upload(audio: UploadFile) -> Tuple[np.ndarray, int]:
+    """
+    解码上传的音频文件：直接从上传的临时文件流式解码（不把整个文件读入内存），
+    格式不支持或无法解码时返回415，超过大小或时长限制时返回413
+    """
+    if audio.size is not None and audio.size > config.MAX_AUDIO_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"上传的音频超过大小限制（{config.MAX_AUDIO_SIZE_MB}MB）")
+    try:
+        check_extension(audio.filename, config.SUPPORTED_AUDIO_FORMATS)
+        return await run_stage("audio", prepare_audio, audio.file)
+    except UnsupportedAudioError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=415, detail=str(e))
+    except AudioTooLongError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=413, detail=str(e))
+
+def resample_audio(audio_data: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """重采样（采样率相同时直接返回，不计入重采样耗时）"""
+    if orig_sr == target_sr:
+        return audio_data
+    with stage_timer("resample"):
+        return resampler_pool.resample(audio_data, orig_sr, target_sr)
+
+def output_format(
+    fmt: Optional[str] = Query(None, alias="format", description="回复音频格式：wav/wav-float/opus/mp3/pcm"),
+    accept: Optional[str] = Header(None)
+) -> AudioFormat:
+    """回复音频的输出格式：format参数优先，其次按Accept头协商，都没有时使用TTS_OUTPUT_FORMAT"""
+    try:
+        return negotiate_format(fmt, accept, config.TTS_OUTPUT_FORMAT)
+    except UnsupportedOutputFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def encode_reply_audio(audio_data: np.ndarray, sample_rate: int, audio_format: AudioFormat) -> Tuple[bytes, int]:
+    """将音频编码为输出格式，返回 (编码后的字节, 实际采样率)"""
+    with stage_timer("encode"):
+        return encode_audio(audio_data, sample_rate, audio_format, resampler_pool.resample)
+
+def audio_headers(audio_format: AudioFormat, sample_rate: int, filename: Optional[str] = None,
+                  disposition: str = "inline") -> dict:
+    """回复音频的响应头；filename只给出文件名主干，扩展名随输出格式"""
+    headers = {
+        "X-Audio-Sample-Rate": str(sample_rate),
+        "X-Audio-Format": audio_format.name,
+        "Vary": "Accept"
+    }
+    if filename:
+        headers["Content-Disposition"] = f"{disposition}; filename={audio_format.filename(filename)}"
+    return headers
+
+def audio_response(content: bytes, sample_rate: int, audio_format: AudioFormat, headers: Optional[dict] = None,
+                   filename: Optional[str] = None, disposition: str = "inline") -> Response:
+    """整段回复音频的响应"""
+    return Response(
+        content=content,
+        media_type=audio_format.content_type(sample_rate),
+        headers={**(headers or {}), **audio_headers(audio_format, sample_rate, filename, disposition)}
+    )
+
+async def streaming_tts_response(text: str, headers: dict, audio_format: AudioFormat,
+                                 filename: Optional[str] = None, disposition: str = "inline") -> StreamingResponse:
+    """
+    分块TTS响应：CosyVoice流式推理，每生成一块就在TTS线程中编码为输出格式并立即发送，
+    首字节时间约等于第一块的合成时间（WAV/PCM逐块输出；Ogg/Opus约每秒输出一页，MP3按帧输出）
+    """
+    chunks = scheduler.iterate("tts", stream_encoded_speech, text, audio_format)
+    try:
+        first_data, sample_rate = await chunks.__anext__()
+    except QueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except StopAsyncIteration:
+        raise RuntimeError("TTS模型未返回音频数据")
+    
+    async def body():
+        total_bytes = len(first_data)
+        try:
+            if first_data:
+                yield first_data
+            async for data, _ in chunks:
+                total_bytes += len(data)
+                if data:
+                    yield data
+            logger.info(f"流式返回音频: {total_bytes} bytes, 格式={audio_format.name}, 采样率={sample_rate}Hz")
+        except Exception as e:
+            logger.error(f"流式TTS合成中断: {e}")
+        finally:
+            await chunks.aclose()
+    
+    return StreamingResponse(
+        body(),
+        media_type=audio_format.content_type(sample_rate),
+        headers={**headers, **audio_headers(audio_format, sample_rate, filename, disposition)}
+    )
 
 # ==================== VAD声音检测模块 ====================
+def load_vad_engine():
+    """按VAD_BACKEND创建VAD引擎，返回 (模型, 引擎, 推理后端)；ONNX后端不可用时退回PyTorch"""
+    backend = backend_name(config.VAD_BACKEND)
+    if is_onnx(backend):
+        try:
+            model_path = config.VAD_ONNX_PATH
+            if not model_path:
+                # 首次使用时从silero-vad（JIT）权重导出序列模型，之后直接复用ONNX_CACHE_DIR中的结果
+                model_path = sequence_onnx_path(config.ONNX_CACHE_DIR)
+                if not os.path.exists(model_path):
+                    model = load_silero_vad(config.VAD_MODEL_REPO, config.VAD_MODEL_PATH, config.MODEL_OFFLINE)
+                    export_sequence_onnx(model, model_path)
+            if backend == ONNX_INT8:
+                model_path = quantize_dynamic_int8(model_path, config.ONNX_CACHE_DIR, INT8_OP_TYPES)
+            engine = OnnxVAD(model_path, config.VAD_SAMPLE_RATE, config.VAD_BLOCK_FRAMES,
+                             config.ONNX_INTRA_OP_THREADS, config.ONNX_INTER_OP_THREADS)
+            return engine.session, engine, backend
+        except Exception as e:
+            logger.warning(f"VAD的{backend}推理后端不可用，使用PyTorch: {e}")
+    # 使用silero-vad（离线模式或指定路径时从本地加载）
+    model = load_silero_vad(config.VAD_MODEL_REPO, config.VAD_MODEL_PATH, config.MODEL_OFFLINE)
+    return model, BatchVAD(model, config.VAD_SAMPLE_RATE, config.VAD_BLOCK_FRAMES), TORCH
+
 def init_vad_model():
     """初始化VAD模型"""
-    global vad_model
+    global vad_model, vad_engine
     max_retries = 3
     retry_delay = 2  # 秒
     
     for attempt in range(max_retries):
         try:
             logger.info(f"正在加载VAD模型（尝试 {attempt + 1}/{max_retries}）...")
-            # 使用silero-vad
-            model, utils = torch.hub.load(
-                repo_or_dir='snakers4/silero-vad',
-                model='silero_vad',
-                force_reload=False,
-                onnx=False
-            )
-            vad_model = model
-            logger.info("VAD模型加载成功")
+            vad_model, vad_engine, inference_backends["vad"] = load_vad_engine()
+            logger.info(f"VAD模型加载成功（推理后端: {inference_backends['vad']}）")
             return True
         except Exception as e:
             error_msg = str(e)
@@ -83,150 +339,189 @@ def init_vad_model():
     
     return False
 
+def get_speech_probs(audio_data: np.ndarray, sample_rate: int = 16000) -> Optional[np.ndarray]:
+    """计算每帧（16000Hz下512采样点）的语音概率，VAD未加载时返回None"""
+    if vad_engine is None:
+        return None
+    
+    # 确保音频是单声道（取声道是视图，不复制）
+    audio_data = first_channel(audio_data)
+    
+    # 如果采样率不匹配，需要重采样到16000Hz
+    audio_data = resample_audio(audio_data, sample_rate, config.VAD_SAMPLE_RATE)
+    
+    with stage_timer("vad"):
+        return vad_engine.frame_probs(audio_data)
+
 def detect_speech(audio_data: np.ndarray, sample_rate: int = 16000) -> bool:
     """检测音频中是否有语音活动"""
-    global vad_model
-    if vad_model is None:
+    if vad_engine is None:
         logger.warning("VAD模型未初始化，跳过检测")
         return True  # 如果没有VAD，默认认为有语音
     
     try:
-        # 确保音频是单声道
-        if len(audio_data.shape) > 1:
-            audio_data = audio_data[:, 0]
-        
-        # 转换为torch tensor
-        audio_tensor = torch.from_numpy(audio_data).float()
-        
-        # 如果采样率不匹配，需要重采样到16000Hz
-        target_sample_rate = 16000
-        if sample_rate != target_sample_rate:
-            resampler = torchaudio.transforms.Resample(sample_rate, target_sample_rate)
-            audio_tensor = resampler(audio_tensor)
-            sample_rate = target_sample_rate
-        
-        # VAD模型需要按帧处理：16000Hz时每帧512采样点
-        frame_size = 512  # 16000Hz时的帧大小
-        audio_length = audio_tensor.shape[0]
-        
-        # 如果音频太短，填充到至少一帧
-        if audio_length < frame_size:
-            padding = torch.zeros(frame_size - audio_length)
-            audio_tensor = torch.cat([audio_tensor, padding])
-            audio_length = frame_size
-        
-        # 将音频分帧处理
-        has_speech = False
-        num_frames = (audio_length + frame_size - 1) // frame_size  # 向上取整
-        
-        for i in range(num_frames):
-            start_idx = i * frame_size
-            end_idx = min(start_idx + frame_size, audio_length)
-            
-            # 提取当前帧
-            frame = audio_tensor[start_idx:end_idx]
-            
-            # 如果帧不够512采样点，需要填充
-            if frame.shape[0] < frame_size:
-                padding = torch.zeros(frame_size - frame.shape[0])
-                frame = torch.cat([frame, padding])
-            
-            # 确保frame是1D tensor，shape为[512]
-            if len(frame.shape) == 0:
-                frame = frame.unsqueeze(0)
-            if frame.shape[0] != frame_size:
-                # 如果还是不对，截取或填充
-                if frame.shape[0] > frame_size:
-                    frame = frame[:frame_size]
-                else:
-                    padding = torch.zeros(frame_size - frame.shape[0])
-                    frame = torch.cat([frame, padding])
-            
-            # 添加batch维度：[1, 512]
-            frame = frame.unsqueeze(0)
-            
-            # VAD检测当前帧
-            try:
-                speech_prob = vad_model(frame, target_sample_rate).item()
-                if speech_prob > config.VAD_THRESHOLD:
-                    has_speech = True
-                    break  # 只要有一帧检测到语音就返回True
-            except Exception as frame_error:
-                logger.debug(f"帧 {i} VAD检测失败: {frame_error}")
-                continue
-        
-        # 如果所有帧都没有检测到语音，返回False
-        return has_speech
-        
+        speech_probs = get_speech_probs(audio_data, sample_rate)
+        # 与语音区间提取（vad_engine.speech_segments）相同的判定：概率不低于阈值即为语音
+        return bool((speech_probs >= config.VAD_THRESHOLD).any())
     except Exception as e:
         logger.error(f"VAD检测失败: {e}")
         import traceback
         logger.error(traceback.format_exc())
         return True  # 出错时默认认为有语音
 
+def extract_speech(audio_data: np.ndarray, sample_rate: int = 16000) -> Optional[np.ndarray]:
+    """
+    VAD分段并只保留语音区间（保持原采样率），未检测到语音时返回None
+    VAD未加载、关闭分段或检测出错时返回完整音频
+    """
+    audio_data = first_channel(audio_data)
+    
+    if vad_engine is None:
+        logger.warning("VAD模型未初始化，跳过检测")
+        return audio_data
+    
+    if not config.VAD_TRIM_SILENCE:
+        return audio_data if detect_speech(audio_data, sample_rate) else None
+    
+    try:
+        speech_probs = get_speech_probs(audio_data, sample_rate)
+        vad_rate = config.VAD_SAMPLE_RATE
+        num_samples = int(round(len(audio_data) * vad_rate / sample_rate))
+        segments = speech_segments(
+            speech_probs,
+            num_samples,
+            frame_size=vad_engine.frame_size,
+            sample_rate=vad_rate,
+            threshold=config.VAD_THRESHOLD,
+            min_speech_ms=config.VAD_MIN_SPEECH_MS,
+            min_silence_ms=config.VAD_MIN_SILENCE_MS,
+            speech_pad_ms=config.VAD_SPEECH_PAD_MS
+        )
+        if not segments:
+            return None
+        
+        # 区间是VAD采样率下的下标，换算回原始采样率；只有一个区间时是原音频的视图
+        scale = sample_rate / vad_rate
+        speech_audio = gather_segments(
+            audio_data, [(int(start * scale), int(end * scale)) for start, end in segments]
+        )
+        logger.info(f"VAD分段: {len(segments)}个语音区间, 保留 {len(speech_audio)}/{len(audio_data)} 采样点")
+        return speech_audio
+    except Exception as e:
+        logger.error(f"VAD分段失败: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return audio_data  # 出错时使用完整音频
+
 # ==================== ASR语音识别模块 ====================
+def load_funasr_model(model_name: str, revision: str, pinned_path: Optional[str], punc: bool = False):
+    """
+    按ASR_BACKEND加载模型，返回 (模型, 推理后端)（离线模式只从本地路径/缓存加载）
+    torch为funasr.AutoModel；onnx/onnx-int8为funasr_onnx模型，加载失败时退回torch
+    """
+    backend = backend_name(config.ASR_BACKEND)
+    if is_onnx(backend):
+        try:
+            model_dir = resolve_onnx_asr_model(model_name, pinned_path, config.MODEL_CACHE_DIR, config.MODEL_OFFLINE)
+            quantize = backend == ONNX_INT8
+            if punc:
+                return load_onnx_punc_model(model_dir, quantize, config.ONNX_INTRA_OP_THREADS), backend
+            return load_onnx_asr_model(model_dir, quantize, config.ONNX_INTRA_OP_THREADS,
+                                       config.ASR_BATCH_MAX_SIZE, config.ASR_CHUNK_SIZE), backend
+        except Exception as e:
+            logger.warning(f"{model_name}的{backend}推理后端不可用，使用PyTorch: {e}")
+    from funasr import AutoModel
+    return AutoModel(**resolve_asr_model(
+        model_name,
+        revision,
+        pinned_path,
+        config.MODEL_CACHE_DIR,
+        config.MODEL_OFFLINE
+    )), TORCH
+
+def load_asr_model(key: str, model_name: str, revision: str, pinned_path: Optional[str], punc: bool = False):
+    """在本进程中加载模型，拆分部署时改为连接ASR服务进程中的同名模型，返回 (模型, 推理后端)"""
+    if asr_server is not None:
+        model = asr_server.model(key, config.MODEL_SERVER_START_TIMEOUT)
+        return model, model.backend
+    return load_funasr_model(model_name, revision, pinned_path, punc)
+
 def init_asr_model():
-    """初始化ASR模型"""
+    """初始化ASR模型（流式模型，实时会话使用）"""
     global asr_model
     try:
-        from funasr import AutoModel
-        asr_model = AutoModel(
-            model=config.ASR_MODEL_NAME,
-            model_revision=config.ASR_MODEL_REVISION
+        asr_model, inference_backends["asr"] = load_asr_model(
+            "asr", config.ASR_MODEL_NAME, config.ASR_MODEL_REVISION, config.ASR_MODEL_PATH
         )
-        logger.info("ASR模型加载成功")
+        logger.info(f"ASR模型加载成功（推理后端: {inference_backends['asr']}）")
         return True
     except Exception as e:
         logger.error(f"ASR模型加载失败: {e}")
         return False
 
-def transcribe_audio(audio_data: np.ndarray, sample_rate: int = 16000) -> str:
-    """将音频转换为文本"""
-    global asr_model
-    if asr_model is None:
-        raise RuntimeError("ASR模型未初始化")
+def init_asr_offline_model():
+    """初始化离线ASR模型（非流式，上传的完整录音使用）和可选的标点模型，标点模型加载失败时不加标点"""
+    global asr_offline_model, asr_punc_model
+    try:
+        asr_offline_model, inference_backends["asr_offline"] = load_asr_model(
+            "asr_offline", config.ASR_OFFLINE_MODEL_NAME, config.ASR_OFFLINE_MODEL_REVISION, config.ASR_OFFLINE_MODEL_PATH
+        )
+        logger.info(f"离线ASR模型加载成功（推理后端: {inference_backends['asr_offline']}）")
+    except Exception as e:
+        logger.error(f"离线ASR模型加载失败，上传接口将使用流式模型识别: {e}")
+        return False
+    
+    if config.ASR_PUNC_MODEL_NAME:
+        try:
+            asr_punc_model, inference_backends["asr_punc"] = load_asr_model(
+                "asr_punc", config.ASR_PUNC_MODEL_NAME, config.ASR_PUNC_MODEL_REVISION, config.ASR_PUNC_MODEL_PATH, punc=True
+            )
+            logger.info("标点模型加载成功")
+        except Exception as e:
+            logger.warning(f"标点模型加载失败，离线识别结果不加标点: {e}")
+    return True
+
+# 识别引擎按当前加载的模型包装（基准测试会直接替换模型实例）
+asr_engines: Dict[str, ASREngine] = {}
+
+def get_asr_engine(name: str = STREAMING) -> Optional[ASREngine]:
+    """按名称获取识别引擎，对应模型未加载时返回None"""
+    if name == OFFLINE:
+        model, punc_model = asr_offline_model, asr_punc_model
+    else:
+        model, punc_model = asr_model, None
+    if model is None:
+        return None
+    engine = asr_engines.get(name)
+    if engine is None or engine.model is not model or getattr(engine, "punc_model", None) is not punc_model:
+        if name == OFFLINE:
+            engine = OfflineParaformerEngine(model, punc_model)
+        else:
+            engine = StreamingParaformerEngine(
+                model, config.ASR_CHUNK_SIZE, config.ASR_ENCODER_CHUNK_LOOK_BACK, config.ASR_DECODER_CHUNK_LOOK_BACK
+            )
+        asr_engines[name] = engine
+    return engine
+
+def transcribe_audio(audio_data: np.ndarray, sample_rate: int = 16000, engine: str = STREAMING) -> str:
+    """将音频转换为文本（engine指定识别引擎）"""
+    asr_engine = get_asr_engine(engine)
+    if asr_engine is None:
+        raise RuntimeError("ASR模型未初始化" if engine == STREAMING else "离线ASR模型未初始化")
     
     try:
         target_sample_rate = 16000
         
-        if len(audio_data.shape) > 1:
-            audio_data = audio_data[:, 0]
+        audio_data = first_channel(audio_data)
         
         if sample_rate != target_sample_rate:
             logger.info(f"ASR重采样: {sample_rate}Hz -> {target_sample_rate}Hz")
-            audio_tensor = torch.from_numpy(audio_data).float()
-            resampler = torchaudio.transforms.Resample(sample_rate, target_sample_rate)
-            audio_tensor = resampler(audio_tensor)
-            audio_data = audio_tensor.numpy()
+            audio_data = resample_audio(audio_data, sample_rate, target_sample_rate)
             sample_rate = target_sample_rate
         
-        chunk_stride = config.ASR_CHUNK_SIZE[1] * 960
-        
-        total_chunk_num = int((len(audio_data) - 1) / chunk_stride + 1)
-        
-        logger.debug(f"ASR处理: 音频长度={len(audio_data)}采样点, 采样率={sample_rate}Hz, chunk_stride={chunk_stride}, 总chunk数={total_chunk_num}")
-        
-        cache = {}
-        full_text = ""
-        for i in range(total_chunk_num):
-            speech_chunk = audio_data[i * chunk_stride:(i + 1) * chunk_stride]
-            is_final = i == total_chunk_num - 1
-            res = asr_model.generate(
-                input=speech_chunk,
-                cache=cache,
-                is_final=is_final,
-                chunk_size=config.ASR_CHUNK_SIZE,
-                encoder_chunk_look_back=config.ASR_ENCODER_CHUNK_LOOK_BACK,
-                decoder_chunk_look_back=config.ASR_DECODER_CHUNK_LOOK_BACK
-            )
-            
-            if res and len(res) > 0:
-                text = res[0].get('text', '')
-                if text:
-                    full_text += text
-        
-        result = full_text.strip()
-        logger.debug(f"ASR识别结果: {result}")
+        with stage_timer("asr"):
+            result = asr_engine.transcribe(audio_data)
+        logger.debug(f"ASR识别结果（{engine}）: {result}")
         return result
     except Exception as e:
         logger.error(f"ASR识别失败: {e}")
@@ -234,51 +529,194 @@ def transcribe_audio(audio_data: np.ndarray, sample_rate: int = 16000) -> str:
         logger.error(traceback.format_exc())
         raise
 
-# ==================== AI对话模块 ====================
-def chat_with_ai(user_text: str, conversation_history: list = None) -> str:
-    """与AI对话，返回AI回复（使用OpenAI标准格式）"""
+def asr_chunk_samples() -> int:
+    """流式ASR每个分块的采样点数（16000Hz下 chunk_size[1] * 60ms）"""
+    return config.ASR_CHUNK_SIZE[1] * 960
+
+def recognize_chunk(speech_chunk: np.ndarray, cache: dict, is_final: bool) -> str:
+    """
+    流式Paraformer识别一个分块（16000Hz），返回该分块新增的文本
+    cache在同一段语音的各分块之间共享，is_final=True时输出尾部剩余的文字
+    """
+    asr_engine = get_asr_engine(STREAMING)
+    if asr_engine is None:
+        raise RuntimeError("ASR模型未初始化")
+    return asr_engine.recognize_chunk(speech_chunk, cache, is_final)
+
+def recognize_stream_chunk(speech_chunk: np.ndarray, cache: dict, is_final: bool) -> str:
+    """实时会话中识别一个分块（计入asr阶段耗时）"""
+    with stage_timer("asr"):
+        return recognize_chunk(speech_chunk, cache, is_final)
+
+def asr_supports_batch(engine: str = STREAMING) -> bool:
+    """识别引擎能否一次调用识别多段音频（流式Paraformer依赖逐块传递的cache，不合批）"""
+    asr_engine = get_asr_engine(engine)
+    return asr_engine is not None and asr_engine.supports_batch
+
+def recognize_batch(batch: List[np.ndarray], engine: str = STREAMING) -> List[Union[str, Exception]]:
+    """
+    一次识别多段16000Hz音频（微批处理器调用，在ASR线程中执行）
+    逐段识别时单段失败只影响该段，返回对应的异常
+    """
+    asr_engine = get_asr_engine(engine)
+    if asr_engine is None:
+        raise RuntimeError("ASR模型未初始化")
+    return asr_engine.transcribe_batch(batch)
+
+def make_asr_batcher(engine: str) -> Optional[MicroBatcher]:
+    """
+    ASR微批处理：并发请求的整段识别在max_wait_ms内汇集，支持批量推理的模型一次调用处理整批
+    每个识别引擎单独组批（不同模型的音频不能合成一批）
+    """
+    if not config.ASR_BATCH_ENABLED:
+        return None
+    return MicroBatcher(
+        "asr" if engine == STREAMING else f"asr_{engine}",
+        lambda batch: run_stage("asr", recognize_batch, batch, engine),
+        max_batch_size=config.ASR_BATCH_MAX_SIZE,
+        max_wait_ms=config.ASR_BATCH_MAX_WAIT_MS,
+        max_concurrent_batches=asr_stage_workers,
+        max_pending=config.SCHEDULER_MAX_QUEUE * config.ASR_BATCH_MAX_SIZE
+    )
+
+asr_batcher = make_asr_batcher(STREAMING)
+asr_offline_batcher = make_asr_batcher(OFFLINE) if config.ASR_OFFLINE_ENABLED else None
+
+async def select_asr_engine(requested: Optional[str] = None) -> str:
+    """
+    上传接口使用的识别引擎：请求指定的引擎，否则ASR_UPLOAD_ENGINE
+    默认使用离线引擎但离线模型不可用时退回流式引擎；请求明确指定而不可用时返回503
+    """
     try:
-        # 构建消息历史（OpenAI标准格式）
-        messages = []
-        
-        # 添加system prompt（如果配置了的话）
-        if config.SYSTEM_PROMPT:
-            messages.append({
-                "role": "system",
-                "content": config.SYSTEM_PROMPT
-            })
-        
-        # 添加对话历史
-        if conversation_history:
-            messages.extend(conversation_history)
-        
-        # 添加用户消息
+        name = engine_name(requested or config.ASR_UPLOAD_ENGINE)
+    except UnknownASREngineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if name == OFFLINE:
+        await require_models("asr_offline")
+        if asr_offline_model is None:
+            if requested:
+                raise HTTPException(status_code=503, detail="离线ASR模型未加载")
+            return STREAMING
+    return name
+
+async def transcribe(audio_data: np.ndarray, sample_rate: int = 16000, engine: str = STREAMING) -> str:
+    """
+    接口中的ASR识别入口
+    模型支持批量推理且开启了微批处理时与并发请求合批，否则直接在ASR线程池中逐段识别
+    """
+    await require_models("asr_offline" if engine == OFFLINE else "asr")
+    batcher = asr_offline_batcher if engine == OFFLINE else asr_batcher
+    if batcher is None or not asr_supports_batch(engine):
+        return await run_stage("asr", transcribe_audio, audio_data, sample_rate, engine)
+    
+    audio_data = first_channel(audio_data)
+    if sample_rate != CANONICAL_SAMPLE_RATE:
+        audio_data = await run_stage("audio", resample_audio, audio_data, sample_rate, CANONICAL_SAMPLE_RATE)
+    
+    # 阶段耗时在调用方统计（包含组批等待），批处理线程中不再计时
+    with stage_timer("asr"):
+        try:
+            return await batcher.submit(audio_data)
+        except QueueFullError as e:
+            logger.warning(str(e))
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+# ==================== AI对话模块 ====================
+# LLM后端客户端：持久连接池，启动时创建、关闭时释放
+llm_client = LLMClient(
+    config.AI_API_URL,
+    config.AI_API_KEY,
+    connect_timeout=config.AI_API_CONNECT_TIMEOUT,
+    read_timeout=config.AI_API_TIMEOUT,
+    max_connections=config.AI_API_MAX_CONNECTIONS,
+    max_keepalive_connections=config.AI_API_MAX_KEEPALIVE,
+    max_retries=config.AI_API_MAX_RETRIES,
+    http2=config.AI_API_HTTP2
+)
+
+def build_messages(user_text: str, conversation_history: list = None) -> list:
+    """构建消息历史（OpenAI标准格式）"""
+    messages = []
+    
+    # 添加system prompt（如果配置了的话）
+    if config.SYSTEM_PROMPT:
         messages.append({
-            "role": "user",
-            "content": user_text
+            "role": "system",
+            "content": config.SYSTEM_PROMPT
         })
-        
+    
+    # 添加对话历史（按token预算只保留最近的部分，会话摘要固定保留）
+    if conversation_history:
+        history = fit_history(conversation_history, config.SESSION_HISTORY_TOKEN_BUDGET)
+        if len(history) < len(conversation_history):
+            logger.debug(f"对话历史超出预算，保留{len(history)}/{len(conversation_history)}条")
+        messages.extend(history)
+    
+    # 添加用户消息
+    messages.append({
+        "role": "user",
+        "content": user_text
+    })
+    return messages
+
+async def summarize_conversation(previous_summary: str, messages: List[dict]) -> str:
+    """用LLM把早期对话总结成简短摘要（会话历史超出预算时在后台调用）"""
+    names = {"user": "用户", "assistant": "AI"}
+    dialogue = "\n".join(f"{names.get(m.get('role'), m.get('role'))}：{m.get('content', '')}" for m in messages)
+    prompt = (
+        f"请用不超过{config.SESSION_SUMMARY_MAX_CHARS}字的中文概括下面的对话，"
+        "保留用户的称呼、喜好、情绪和还没聊完的事情，只输出摘要。\n"
+        + (f"已有摘要：{previous_summary}\n" if previous_summary else "")
+        + f"对话：\n{dialogue}"
+    )
+    payload = {
+        "model": config.AI_API_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": False
+    }
+    response = await llm_client.post(payload)
+    if response.status_code != 200:
+        raise RuntimeError(f"摘要请求失败（状态码: {response.status_code}）")
+    return response.json()['choices'][0]['message']['content']
+
+session_store = SessionStore(
+    load_session_backend(config.SESSION_BACKEND, config.SESSION_TTL_SECONDS, config.SESSION_MAX_SESSIONS),
+    token_budget=config.SESSION_HISTORY_TOKEN_BUDGET,
+    summarizer=summarize_conversation if config.SESSION_SUMMARIZE else None,
+    summary_max_chars=config.SESSION_SUMMARY_MAX_CHARS
+)
+
+async def load_history(session_id: Optional[str], conversation_history: Optional[list]) -> Optional[list]:
+    """
+    对话历史：带session_id时使用服务端会话，客户端发送的历史中只保留system消息（如角色设定）放在最前面；
+    否则使用客户端发送的历史
+    """
+    if not session_id:
+        return conversation_history
+    if not valid_session_id(session_id):
+        raise HTTPException(status_code=400, detail="session_id格式错误（1-128位字母、数字、下划线或连字符）")
+    pinned = [message for message in conversation_history or [] if isinstance(message, dict) and message.get("role") == "system"]
+    return pinned + await session_store.history(session_id)
+
+async def remember_turn(session_id: Optional[str], user_text: str, ai_reply: str):
+    """把一轮对话追加到服务端会话（没有session_id时不保存）"""
+    if session_id and ai_reply:
+        await session_store.append(session_id, user_text, ai_reply)
+
+async def chat_with_ai(user_text: str, conversation_history: list = None) -> str:
+    """与AI对话，返回AI回复（使用OpenAI标准格式）"""
+    try:
         # OpenAI标准格式的请求体
         payload = {
             "model": config.AI_API_MODEL,
-            "messages": messages,
+            "messages": build_messages(user_text, conversation_history),
             "stream": False
         }
         
-        # OpenAI标准格式的请求头
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {config.AI_API_KEY}"  # OpenAI标准格式
-        }
-        
         logger.debug(f"AI API请求: URL={config.AI_API_URL}, Model={config.AI_API_MODEL}")
         
-        response = requests.post(
-            config.AI_API_URL,
-            json=payload,
-            headers=headers,
-            timeout=config.AI_API_TIMEOUT
-        )
+        with stage_timer("llm"):
+            response = await llm_client.post(payload)
         
         if response.status_code == 200:
             result = response.json()
@@ -313,10 +751,10 @@ def chat_with_ai(user_text: str, conversation_history: list = None) -> str:
             logger.error(f"响应内容: {response.text}")
             return f"抱歉，API调用失败（状态码: {response.status_code}），请检查API地址和配置。"
             
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logger.error(f"AI API请求超时（超过{config.AI_API_TIMEOUT}秒）")
         return "抱歉，API请求超时，请稍后再试。"
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         logger.error("AI API连接失败，请检查网络连接和API地址")
         return "抱歉，无法连接到API服务器，请检查网络连接。"
     except Exception as e:
@@ -325,11 +763,73 @@ def chat_with_ai(user_text: str, conversation_history: list = None) -> str:
         logger.error(traceback.format_exc())
         return "抱歉，发生了错误，请稍后再试。"
 
+async def stream_chat_with_ai(user_text: str, conversation_history: list = None) -> AsyncIterator[str]:
+    """
+    与AI对话（SSE流式），逐段产出AI回复文本
+    
+    尚未产出任何文本时出错，产出与chat_with_ai一致的提示语；
+    已产出部分文本后出错，抛出LLMStreamInterrupted（提示语不能接在半句回复后面）
+    """
+    payload = {
+        "model": config.AI_API_MODEL,
+        "messages": build_messages(user_text, conversation_history),
+        "stream": True
+    }
+    
+    logger.debug(f"AI API流式请求: URL={config.AI_API_URL}, Model={config.AI_API_MODEL}")
+    
+    # 只累计等待LLM输出的时间，不含消费方处理每段文本（如逐句合成）的时间
+    elapsed = 0.0
+    started = False
+    start_time = time.perf_counter()
+    try:
+        async for delta in llm_client.stream(payload):
+            elapsed += time.perf_counter() - start_time
+            started = True
+            yield delta
+            start_time = time.perf_counter()
+        elapsed += time.perf_counter() - start_time
+    except Exception as e:
+        if isinstance(e, LLMResponseError):
+            logger.error(f"AI API流式调用失败: {e}")
+            if e.status_code == 401:
+                apology = "抱歉，API认证失败，请检查API密钥配置。"
+            elif e.status_code == 404:
+                apology = "抱歉，API端点不存在，请检查API地址配置。"
+            else:
+                apology = f"抱歉，API调用失败（状态码: {e.status_code}），请检查API地址和配置。"
+        elif isinstance(e, httpx.TimeoutException):
+            logger.error(f"AI API请求超时（超过{config.AI_API_TIMEOUT}秒）")
+            apology = "抱歉，API请求超时，请稍后再试。"
+        elif isinstance(e, httpx.TransportError):
+            logger.error("AI API连接失败，请检查网络连接和API地址")
+            apology = "抱歉，无法连接到API服务器，请检查网络连接。"
+        else:
+            logger.error(f"AI流式对话失败: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            apology = "抱歉，发生了错误，请稍后再试。"
+        if started:
+            raise LLMStreamInterrupted(f"AI回复中断: {type(e).__name__}: {e}") from e
+        yield apology
+    finally:
+        observe_stage("llm", elapsed)
+
 # ==================== TTS语音合成模块 ====================
 def init_tts_model():
     """初始化TTS模型（CosyVoice）"""
     global tts_model
     
+    # 拆分部署：连接TTS服务进程（模型和音色特征都在服务进程中）
+    if tts_server is not None:
+        try:
+            tts_model = tts_server.model("tts", config.MODEL_SERVER_START_TIMEOUT)
+            logger.info(f"✓ 已连接TTS服务进程（{config.TTS_SERVER_WORKERS}个）")
+            return True
+        except Exception as e:
+            logger.error(f"TTS服务进程不可用: {e}")
+            return False
+    
     model_id = config.TTS_MODEL_ID
     
     # 方法1: 尝试使用CosyVoice AutoModel（推荐）
@@ -359,11 +859,8 @@ def init_tts_model():
         except ImportError as e:
             raise ImportError(f"CosyVoice未正确安装: {e}")
         
-        # 使用modelscope下载的模型路径
-        from modelscope import snapshot_download
-        
-        # 模型已经下载到了这个路径（根据日志）
-        model_dir = snapshot_download(model_id)
+        # 模型路径：指定路径 > 本地缓存（离线模式）> modelscope下载
+        model_dir = resolve_modelscope_model(model_id, config.TTS_MODEL_PATH, config.MODEL_CACHE_DIR, config.MODEL_OFFLINE)
         logger.info(f"使用模型路径: {model_dir}")
         
         # 初始化CosyVoice AutoModel
@@ -388,11 +885,10 @@ def init_tts_model():
     # 方法2: 尝试使用modelscope pipeline（备用，通常不工作）
     try:
         logger.info("尝试方法2: 使用modelscope pipeline（备用方法）...")
-        from modelscope import snapshot_download
         from modelscope.pipelines import pipeline
         
-        logger.info(f"正在下载模型: {model_id}")
-        model_dir = snapshot_download(model_id)
+        logger.info(f"正在获取模型: {model_id}")
+        model_dir = resolve_modelscope_model(model_id, config.TTS_MODEL_PATH, config.MODEL_CACHE_DIR, config.MODEL_OFFLINE)
         logger.info(f"模型路径: {model_dir}")
         
         # 尝试pipeline初始化
@@ -411,147 +907,149 @@ def init_tts_model():
     logger.info("TTS功能将不可用，但其他功能（VAD、ASR、AI对话）正常")
     return False
 
-def text_to_speech(text: str) -> Tuple[np.ndarray, int]:
-    """将文本转换为语音，返回音频数据和采样率"""
-    global tts_model
+def is_cosyvoice_model() -> bool:
+    """判断当前TTS模型是否为CosyVoice（有可调用的inference_zero_shot和sample_rate属性）"""
+    model_type = type(tts_model).__name__
+    
+    # 方法1: 检查类型名称
+    is_cosyvoice_by_type = 'CosyVoice' in model_type
+    
+    # 方法2: 检查是否有inference_zero_shot方法
+    inference_method = getattr(tts_model, 'inference_zero_shot', None)
+    has_inference_method = inference_method is not None
+    is_callable = callable(inference_method)
+    
+    # 方法3: 检查是否有sample_rate属性（CosyVoice特有）
+    has_sample_rate = hasattr(tts_model, 'sample_rate')
+    
+    # 综合判断：是CosyVoice模型
+    is_cosyvoice = (is_cosyvoice_by_type or (has_inference_method and is_callable)) and has_sample_rate
+    
+    logger.debug(f"TTS模型检查: 类型={model_type}, 类型匹配={is_cosyvoice_by_type}, 有inference_zero_shot={has_inference_method}, 方法可调用={is_callable}, 有sample_rate={has_sample_rate}, 判断结果={is_cosyvoice}")
+    return is_cosyvoice
+
+def resolve_ref_audio() -> str:
+    """返回TTS参考音频路径，配置的路径不存在时尝试备用路径"""
+    # 使用配置文件中的参考音频路径
+    ref_audio = config.TTS_REF_AUDIO
+    if os.path.exists(ref_audio):
+        return ref_audio
+    
+    logger.warning(f"参考音频不存在: {ref_audio}，尝试备用路径")
+    cosyvoice_path = os.path.join(os.path.dirname(__file__), 'CosyVoice')
+    backup_paths = [
+        os.path.join(cosyvoice_path, 'asset', 'zero_shot_prompt.wav'),
+        os.path.join('CosyVoice', 'asset', 'zero_shot_prompt.wav'),
+        './asset/zero_shot_prompt.wav'
+    ]
+    for backup_path in backup_paths:
+        if os.path.exists(backup_path):
+            logger.info(f"使用备用参考音频路径: {backup_path}")
+            return backup_path
+    
+    logger.error(f"找不到参考音频文件，请检查配置 TTS_REF_AUDIO 或确保文件存在")
+    raise FileNotFoundError(f"参考音频文件不存在: {ref_audio}")
+
+def get_default_voice() -> VoicePrompt:
+    """默认音色：参考音频路径只解析一次，说话人特征首次使用时提取并缓存"""
+    global tts_ref_audio
+    if tts_ref_audio is None:
+        tts_ref_audio = resolve_ref_audio()
+    return voice_registry.get(tts_ref_audio, config.TTS_PROMPT_TEXT)
+
+def init_voice_prompt() -> bool:
+    """绑定TTS模型并预先提取默认音色特征"""
+    voice_registry.bind(tts_model)
+    try:
+        voice = get_default_voice()
+        logger.info(f"默认音色已就绪: {voice.spk_id}（预计算={'是' if voice.precomputed else '否'}）")
+        return True
+    except Exception as e:
+        logger.warning(f"默认音色预计算失败，将在首次合成时重试: {e}")
+        return False
+
+def to_mono_float32(audio_data) -> np.ndarray:
+    """将TTS输出（tensor/list/ndarray）转换为一维float32数组（已经是float32时与模型输出共享内存）"""
+    if audio_data is None:
+        raise ValueError("TTS输出中没有找到音频数据")
+    return as_mono_float32(audio_data)
+
+def iter_tts_chunks(text: str, stream: bool = False, voice: Optional[VoicePrompt] = None) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    逐段产出合成的音频 (float32单声道, 采样率)
+    stream=True 时使用CosyVoice的流式推理，每生成一小段就产出；
+    stream=False 时CosyVoice按文本分段产出，每段一个结果
+    voice为None时使用默认音色
+    """
     if tts_model is None:
         logger.error("TTS模型未初始化")
         raise RuntimeError("TTS模型未初始化，请检查模型加载状态")
     
-    try:
-        # 检查是否是CosyVoice模型
-        model_type = type(tts_model).__name__
-        
-        # 方法1: 检查类型名称
-        is_cosyvoice_by_type = 'CosyVoice' in model_type
-        
-        # 方法2: 检查是否有inference_zero_shot方法
-        has_inference_method = hasattr(tts_model, 'inference_zero_shot')
-        if has_inference_method:
-            inference_method = getattr(tts_model, 'inference_zero_shot', None)
-            is_callable = callable(inference_method)
-        else:
-            is_callable = False
-        
-        # 方法3: 检查是否有sample_rate属性（CosyVoice特有）
-        has_sample_rate = hasattr(tts_model, 'sample_rate')
-        
-        # 综合判断：是CosyVoice模型
-        is_cosyvoice_model = (is_cosyvoice_by_type or (has_inference_method and is_callable)) and has_sample_rate
-        
-        logger.info(f"TTS模型检查: 类型={model_type}, 类型匹配={is_cosyvoice_by_type}, 有inference_zero_shot={has_inference_method}, 方法可调用={is_callable}, 有sample_rate={has_sample_rate}, 判断结果={is_cosyvoice_model}")
-        
-        if is_cosyvoice_model:
-            # CosyVoice AutoModel的调用方式
-            # CosyVoice3使用inference_zero_shot方法
-            # 需要提供：文本、系统提示、参考音频路径
-            import os
-            
-            # 使用配置文件中的参考音频路径
-            ref_audio = config.TTS_REF_AUDIO
-            
-            # 检查参考音频是否存在，如果不存在则尝试备用路径
-            if not os.path.exists(ref_audio):
-                logger.warning(f"参考音频不存在: {ref_audio}，尝试备用路径")
-                # 尝试备用路径
-                cosyvoice_path = os.path.join(os.path.dirname(__file__), 'CosyVoice')
-                backup_paths = [
-                    os.path.join(cosyvoice_path, 'asset', 'zero_shot_prompt.wav'),
-                    os.path.join('CosyVoice', 'asset', 'zero_shot_prompt.wav'),
-                    './asset/zero_shot_prompt.wav'
-                ]
-                
-                found = False
-                for backup_path in backup_paths:
-                    if os.path.exists(backup_path):
-                        ref_audio = backup_path
-                        found = True
-                        logger.info(f"使用备用参考音频路径: {ref_audio}")
-                        break
-                
-                if not found:
-                    logger.error(f"找不到参考音频文件，请检查配置 TTS_REF_AUDIO 或确保文件存在")
-                    raise FileNotFoundError(f"参考音频文件不存在: {ref_audio}")
-            
-            # CosyVoice3的调用方式
-            # inference_zero_shot(text, system_prompt, ref_audio_path, stream=False)
-            system_prompt = "You are a helpful assistant.<|endofprompt|>希望你以后能够做的比我还好呦。"
-            
-            # 调用inference_zero_shot
-            logger.info(f"TTS合成: 文本长度={len(text)}, 参考音频={ref_audio}")
-            
-            results = list(tts_model.inference_zero_shot(
-                text, 
-                system_prompt, 
-                ref_audio,
-                stream=False
-            ))
+    if is_cosyvoice_model():
+        # CosyVoice3的调用方式
+        # inference_zero_shot(text, prompt_text, ref_audio_path, zero_shot_spk_id, stream)
+        # 已预计算的音色通过zero_shot_spk_id复用说话人特征，不再重新加载和处理参考音频
+        voice = voice or get_default_voice()
+        sample_rate = int(tts_model.sample_rate)
+        
+        logger.info(f"TTS合成: 文本长度={len(text)}, 音色={voice.spk_id}, 流式={stream}")
+        
+        # 每次合成借用该音色的独占副本：推理过程中会改写spk2info里的音色字典，
+        # 多个TTS线程、批内并发和流式合成同时使用同一音色时不能共用
+        with voice_registry.lease(voice) as leased:
+            if leased.precomputed:
+                results = tts_model.inference_zero_shot(
+                    text, leased.prompt_text, leased.ref_audio,
+                    zero_shot_spk_id=leased.spk_id, stream=stream
+                )
+            else:
+                results = tts_model.inference_zero_shot(text, leased.prompt_text, leased.ref_audio, stream=stream)
             
-            # 获取第一个结果
-            if results and len(results) > 0:
-                result = results[0]
+            for result in results:
                 audio_data = result.get('tts_speech')
-                sample_rate = tts_model.sample_rate
-                
                 if audio_data is None:
                     raise ValueError("CosyVoice返回结果中没有tts_speech字段")
-                
-                # 确保audio_data是numpy数组
-                if isinstance(audio_data, torch.Tensor):
-                    audio_data = audio_data.cpu().numpy()
-                
-                logger.info(f"TTS合成成功: 音频长度={len(audio_data)}, 采样率={sample_rate}")
-            else:
-                raise ValueError("CosyVoice未返回音频数据")
+                yield to_mono_float32(audio_data), sample_rate
+    elif callable(tts_model):
+        # 如果不是CosyVoice模型，尝试pipeline方式（modelscope pipeline，备用，不支持流式）
+        logger.warning(f"TTS模型类型 {type(tts_model).__name__} 不是CosyVoice模型，尝试使用pipeline方式调用")
+        output = tts_model(text)
+        
+        # 提取音频数据
+        if isinstance(output, dict):
+            audio_data = output.get('audio') or output.get('wav') or output.get('output_wav')
+            sample_rate = output.get('sample_rate', config.TTS_SAMPLE_RATE)
+        elif isinstance(output, (list, tuple)) and len(output) >= 2:
+            audio_data, sample_rate = output[0], output[1]
         else:
-            # 如果不是CosyVoice模型，尝试其他方式
-            logger.warning(f"TTS模型类型 {model_type} 不是CosyVoice模型，尝试其他调用方式")
-            
-            # 检查是否有__call__方法（pipeline方式）
-            if callable(tts_model):
-                logger.info("尝试使用pipeline方式调用TTS模型")
-                # modelscope pipeline的调用方式（备用）
-                output = tts_model(text)
-                
-                # 提取音频数据
-                if isinstance(output, dict):
-                    audio_data = output.get('audio') or output.get('wav') or output.get('output_wav')
-                    sample_rate = output.get('sample_rate', config.TTS_SAMPLE_RATE)
-                elif isinstance(output, (list, tuple)) and len(output) >= 2:
-                    audio_data, sample_rate = output[0], output[1]
-                else:
-                    audio_data = output
-                    sample_rate = config.TTS_SAMPLE_RATE
-            else:
-                # 无法识别的TTS模型类型
-                model_type = type(tts_model).__name__
-                raise RuntimeError(f"无法识别的TTS模型类型: {model_type}，请检查模型初始化")
-        
-        if audio_data is None:
-            raise ValueError("TTS输出中没有找到音频数据")
-        
-        # 确保是numpy数组
-        if isinstance(audio_data, torch.Tensor):
-            audio_data = audio_data.cpu().numpy()
-        elif not isinstance(audio_data, np.ndarray):
-            audio_data = np.array(audio_data)
-        
-        # 确保是单声道
-        if len(audio_data.shape) > 1:
-            if audio_data.shape[0] == 1 or audio_data.shape[1] == 1:
-                audio_data = audio_data.flatten()
-            else:
-                audio_data = audio_data.mean(axis=1) if audio_data.shape[1] < audio_data.shape[0] else audio_data.mean(axis=0)
+            audio_data = output
+            sample_rate = config.TTS_SAMPLE_RATE
+        yield to_mono_float32(audio_data), int(sample_rate)
+    else:
+        # 无法识别的TTS模型类型
+        raise RuntimeError(f"无法识别的TTS模型类型: {type(tts_model).__name__}，请检查模型初始化")
+
+def text_to_speech(text: str) -> Tuple[np.ndarray, int]:
+    """将文本转换为语音，返回完整音频数据（所有分段拼接）和采样率"""
+    with stage_timer("tts"):
+        return synthesize_speech(text)
+
+def synthesize_speech(text: str, voice: Optional[VoicePrompt] = None) -> Tuple[np.ndarray, int]:
+    """合成完整音频（不计时，批处理时由调用方统计各自的耗时）"""
+    try:
+        chunks = []
+        sample_rate = config.TTS_SAMPLE_RATE
+        for chunk, sample_rate in iter_tts_chunks(text, stream=False, voice=voice):
+            chunks.append(chunk)
+        if not chunks:
+            raise ValueError("TTS模型未返回音频数据")
         
-        # 确保数据类型正确
-        if audio_data.dtype != np.float32:
-            audio_data = audio_data.astype(np.float32)
+        audio_data = concat(chunks)
         
-        # 归一化到[-1, 1]
-        max_val = np.abs(audio_data).max()
-        if max_val > 1.0:
-            audio_data = audio_data / max_val
+        # 归一化到[-1, 1]（原地缩放，各分段是本次合成新产生的数据）
+        audio_data = normalize_peak_(audio_data)
         
+        logger.info(f"TTS合成成功: {len(chunks)}段, 音频长度={len(audio_data)}, 采样率={sample_rate}")
         return audio_data, int(sample_rate)
     except Exception as e:
         logger.error(f"TTS合成失败: {e}")
@@ -560,120 +1058,377 @@ def text_to_speech(text: str) -> Tuple[np.ndarray, int]:
         logger.error(traceback.format_exc())
         raise RuntimeError(f"TTS合成失败: {str(e)}")
 
+def stream_text_to_speech(text: str) -> Iterator[Tuple[np.ndarray, int]]:
+    """流式合成：逐段产出音频块，供分块响应使用（超出[-1, 1]的采样在编码时截断）"""
+    # 只累计合成耗时，不含等待消费方发送的时间
+    elapsed = 0.0
+    try:
+        start_time = time.perf_counter()
+        for item in iter_tts_chunks(text, stream=True):
+            elapsed += time.perf_counter() - start_time
+            yield item
+            start_time = time.perf_counter()
+        elapsed += time.perf_counter() - start_time
+    finally:
+        observe_stage("tts", elapsed)
+
+def stream_encoded_speech(text: str, audio_format: AudioFormat) -> Iterator[Tuple[bytes, int]]:
+    """
+    流式合成并逐块编码为输出格式，产出 (可以立即发送的字节, 输出采样率)
+    编码在TTS线程中紧跟着合成完成，不占用事件循环
+    """
+    speech = stream_text_to_speech(text)
+    encoder = None
+    elapsed = 0.0
+    try:
+        for chunk, sample_rate in speech:
+            start_time = time.perf_counter()
+            if encoder is None:
+                encoder = StreamEncoder(audio_format, sample_rate, resampler_pool.resample)
+            data = encoder.encode(chunk)
+            elapsed += time.perf_counter() - start_time
+            yield data, encoder.sample_rate
+        if encoder is not None:
+            start_time = time.perf_counter()
+            data = encoder.finish()
+            elapsed += time.perf_counter() - start_time
+            yield data, encoder.sample_rate
+    finally:
+        speech.close()
+        observe_stage("encode", elapsed)
+
+# 目前所有请求都使用默认音色（Config.TTS_REF_AUDIO），TTS批处理按音色分组
+DEFAULT_VOICE_KEY = "default"
+
+def synthesize_batch(jobs: List[Tuple[str, str]], deliver) -> None:
+    """
+    在TTS线程中合成同一音色的一批文本（音色只解析一次），每段合成完立即交付给对应的调用方
+    
+    CosyVoice的推理接口一次只接受一段文本，没有多文本批量推理；批内最多TTS_BATCH_CONCURRENCY段
+    同时合成，一段在LLM阶段生成语音token时另一段可以在flow/hift阶段生成波形。
+    额外的段在tts_batch_executor中合成，不占用调度器的TTS阶段名额，
+    TTS_BATCH_CONCURRENCY>1要求模型可以多线程同时调用（默认1，批内逐段合成）
+    """
+    def run(index: int, text: str, voice: Optional[VoicePrompt]):
+        try:
+            result = synthesize_speech(text, voice)
+        except Exception as e:
+            result = e
+        deliver(index, result)
+    
+    if not is_cosyvoice_model():
+        for index, (_, text) in enumerate(jobs):
+            run(index, text, None)
+        return
+    
+    voice = get_default_voice()
+    concurrency = min(config.TTS_BATCH_CONCURRENCY, len(jobs))
+    if concurrency <= 1:
+        for index, (_, text) in enumerate(jobs):
+            run(index, text, voice)
+        return
+    
+    # 按提交顺序取任务，先到的请求先完成（每段合成各自借用音色副本，见iter_tts_chunks）
+    pending = iter(enumerate(jobs))
+    lock = threading.Lock()
+    
+    def worker():
+        while True:
+            with lock:
+                job = next(pending, None)
+            if job is None:
+                return
+            index, (_, text) = job
+            run(index, text, voice)
+    
+    workers = [tts_batch_executor.submit(worker) for _ in range(1, concurrency)]
+    worker()
+    for future in workers:
+        future.result()
+
+# 批内并发合成使用的线程（TTS阶段线程本身也参与合成，这里只需要额外的并发数）
+tts_batch_executor = ThreadPoolExecutor(
+    max_workers=max(1, config.TTS_BATCH_CONCURRENCY - 1) * tts_stage_workers,
+    thread_name_prefix="tts-batch"
+)
+
+# TTS分组队列（TTS_BATCH_ENABLED，默认关闭）：整段合成（非流式）请求按音色分组排队，TTS线程空闲时一次取走一批；
+# TTS_BATCH_CONCURRENCY=1时批内逐段合成，不提高吞吐。分块流式合成（stream=true的音频接口）仍单独调度，不经过该队列
+tts_batcher = MicroBatcher(
+    "tts",
+    lambda jobs, deliver: run_stage("tts", synthesize_batch, jobs, deliver),
+    max_batch_size=config.TTS_BATCH_MAX_SIZE,
+    max_wait_ms=config.TTS_BATCH_MAX_WAIT_MS,
+    max_concurrent_batches=tts_stage_workers,
+    max_pending=config.SCHEDULER_MAX_QUEUE,
+    key=lambda job: job[0],
+    incremental=True
+) if config.TTS_BATCH_ENABLED else None
+
+def tts_output_sample_rate() -> int:
+    """整段合成输出的采样率（与iter_tts_chunks一致）"""
+    return int(tts_model.sample_rate) if is_cosyvoice_model() else config.TTS_SAMPLE_RATE
+
+def tts_cache_key(text: str, audio_format: str = "wav") -> Optional[str]:
+    """TTS输出缓存键；缓存未开启或默认音色尚未注册时返回None（不缓存）"""
+    if tts_cache is None or tts_model is None or tts_ref_audio is None:
+        return None
+    voice = voice_registry.peek(tts_ref_audio, config.TTS_PROMPT_TEXT)
+    if voice is None:
+        return None
+    model_id = config.TTS_MODEL_PATH or config.TTS_MODEL_ID
+    return tts_cache.key(text, voice.spk_id, model_id, tts_output_sample_rate(), audio_format)
+
+async def synthesize_audio(text: str, audio_format: AudioFormat = FORMATS["wav"]) -> Tuple[bytes, int]:
+    """
+    整段合成并编码为输出格式，返回 (编码后的字节, 采样率)
+    TTS输出缓存命中时直接返回缓存的字节，跳过合成和编码
+    """
+    key = tts_cache_key(text, audio_format.name)
+    if key is not None:
+        data = tts_cache.get_memory(key)
+        if data is None:
+            data = await run_stage("audio", tts_cache.get_disk, key) if tts_cache.disk_enabled else tts_cache.get_disk(key)
+        if data is not None:
+            return data, audio_format.output_sample_rate(tts_output_sample_rate())
+    
+    audio_data, sample_rate = await synthesize(text)
+    data, sample_rate = await run_stage("audio", encode_reply_audio, audio_data, sample_rate, audio_format)
+    if key is not None:
+        if tts_cache.disk_enabled:
+            await run_stage("audio", tts_cache.put, key, data)
+        else:
+            tts_cache.put(key, data)
+    return data, sample_rate
+
+async def synthesize(text: str) -> Tuple[np.ndarray, int]:
+    """接口中的整段TTS合成入口：开启TTS_BATCH_ENABLED时进入TTS分组队列，否则直接在TTS线程池中合成"""
+    if tts_batcher is None:
+        return await run_stage("tts", text_to_speech, text)
+    
+    await require_models("tts")
+    # 阶段耗时在调用方统计（包含排队），与直接调度时的口径一致
+    with stage_timer("tts"):
+        try:
+            return await tts_batcher.submit((DEFAULT_VOICE_KEY, text))
+        except QueueFullError as e:
+            logger.warning(str(e))
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+# ==================== 回复音频存储 ====================
+ARTIFACT_URL = "/api/audio/artifacts/{}"
+
+# 正在合成的延迟条目：同一条目的并发读取等待同一次合成；合成在独立任务中执行，发起读取的客户端断开也不会浪费
+artifact_synthesis: Dict[str, asyncio.Future] = {}
+
+async def save_reply_audio(data: bytes, sample_rate: int, audio_format: AudioFormat) -> Optional[str]:
+    """保存已合成的回复音频，返回audio_url；存储未开启时返回None"""
+    if artifact_store is None:
+        return None
+    if artifact_store.disk_enabled:
+        artifact = await run_stage("audio", artifact_store.put, data, audio_format.name, sample_rate)
+    else:
+        artifact = artifact_store.put(data, audio_format.name, sample_rate)
+    return ARTIFACT_URL.format(artifact.id)
+
+async def defer_reply_audio(text: str, audio_format: AudioFormat) -> Optional[str]:
+    """登记延迟合成的回复音频（客户端第一次获取时才合成），返回audio_url；存储未开启或TTS不可用时返回None"""
+    if artifact_store is None or model_manager.loaded("tts") is False:
+        return None
+    if artifact_store.disk_enabled:
+        artifact = await run_stage("audio", artifact_store.put_pending, text, audio_format.name)
+    else:
+        artifact = artifact_store.put_pending(text, audio_format.name)
+    return ARTIFACT_URL.format(artifact.id)
+
+async def load_artifact(artifact_id: str) -> Optional[AudioArtifact]:
+    """按ID读取回复音频（先查内存层，再在线程池中查磁盘层）"""
+    if not valid_artifact_id(artifact_id):
+        return None
+    artifact = artifact_store.get_memory(artifact_id)
+    if artifact is None and artifact_store.disk_enabled:
+        artifact = await run_stage("audio", artifact_store.get_disk, artifact_id)
+    return artifact
+
+async def synthesize_artifact(artifact: AudioArtifact) -> AudioArtifact:
+    """合成延迟条目的音频并保存（与接口的整段合成相同，经过TTS输出缓存）"""
+    await require_models("tts")
+    if tts_model is None:
+        raise HTTPException(status_code=503, detail="TTS模型未初始化")
+    data, sample_rate = await synthesize_audio(artifact.text, FORMATS[artifact.audio_format])
+    if artifact_store.disk_enabled:
+        return await run_stage("audio", artifact_store.fill, artifact, data, sample_rate)
+    return artifact_store.fill(artifact, data, sample_rate)
+
+async def realize_artifact(artifact: AudioArtifact) -> AudioArtifact:
+    """返回已有音频的条目；延迟条目在第一次读取时合成"""
+    if artifact.ready:
+        return artifact
+    task = artifact_synthesis.get(artifact.id)
+    if task is None:
+        task = asyncio.ensure_future(synthesize_artifact(artifact))
+        artifact_synthesis[artifact.id] = task
+
+        def forget(done: asyncio.Future):
+            artifact_synthesis.pop(artifact.id, None)
+            # 所有等待者都已断开时由这里取走异常（否则事件循环会记录未处理的异常）
+            if not done.cancelled() and done.exception() is not None:
+                logger.warning(f"回复音频合成失败: {done.exception()}")
+
+        task.add_done_callback(forget)
+    return await asyncio.shield(task)
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较：忽略W/前缀）"""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def load_tts_model() -> bool:
+    """加载TTS模型并预计算默认音色"""
+    if not init_tts_model():
+        logger.warning("TTS功能将不可用，但其他功能（VAD、ASR、AI对话）正常")
+        return False
+    init_voice_prompt()
+    return True
+
+def warmup_audio(seconds: float = 1.0, sample_rate: int = 16000) -> np.ndarray:
+    """预热用的合成音频：低幅度噪声叠加正弦波（固定随机种子）"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    return (0.1 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+def warmup_vad():
+    """VAD预热：批量推理一段合成音频"""
+    if vad_engine is not None:
+        vad_engine.frame_probs(warmup_audio(1.0, config.VAD_SAMPLE_RATE))
+
+def warmup_asr():
+    """ASR预热：完整走一遍分块识别（含is_final）"""
+    if asr_model is not None:
+        transcribe_audio(warmup_audio(asr_chunk_samples() * 2 / CANONICAL_SAMPLE_RATE), CANONICAL_SAMPLE_RATE)
+
+def warmup_asr_offline():
+    """离线ASR预热：识别一段合成音频"""
+    if asr_offline_model is not None:
+        transcribe_audio(warmup_audio(1.0), CANONICAL_SAMPLE_RATE, OFFLINE)
+
+def warmup_tts():
+    """TTS预热：用默认音色合成一句短文本"""
+    if tts_model is not None:
+        text_to_speech(config.MODEL_WARMUP_TEXT)
+
+# ASR是核心功能（加载失败时服务不算就绪）；离线ASR失败时上传接口退回流式识别，VAD失败时跳过检测，TTS失败时只返回文本
+model_manager.register("asr", init_asr_model, required=True, warmup=warmup_asr)
+if config.ASR_OFFLINE_ENABLED:
+    model_manager.register("asr_offline", init_asr_offline_model, warmup=warmup_asr_offline)
+model_manager.register("vad", init_vad_model, warmup=warmup_vad)
+model_manager.register("tts", load_tts_model, warmup=warmup_tts)
+
 # ==================== API接口 ====================
 @app.on_event("startup")
 async def startup_event():
-    """启动时初始化所有模型"""
+    """启动时创建LLM连接池，并在后台并行加载所有模型（不阻塞服务启动）"""
     logger.info("=" * 60)
     logger.info("正在初始化AI陪伴对话服务...")
     logger.info("=" * 60)
     
-    init_status = {}
+    # 创建LLM连接池
+    await llm_client.start()
     
-    # 初始化ASR
-    logger.info("\n[1/3] 初始化ASR语音识别模型...")
-    if init_asr_model():
-        init_status['ASR'] = "✓ 成功"
-        logger.info("✓ ASR模型加载成功")
-    else:
-        init_status['ASR'] = "✗ 失败"
-        logger.error("✗ ASR模型初始化失败 - 这是核心功能，服务可能无法正常工作")
-    
-    # 初始化VAD
-    logger.info("\n[2/3] 初始化VAD声音检测模型...")
-    if init_vad_model():
-        init_status['VAD'] = "✓ 成功"
-        logger.info("✓ VAD模型加载成功")
-    else:
-        init_status['VAD'] = "✗ 失败（可选）"
-        logger.warning("✗ VAD模型初始化失败 - 将跳过VAD检测（默认认为所有音频都有语音）")
-    
-    # 初始化TTS
-    logger.info("\n[3/3] 初始化TTS语音合成模型...")
-    if init_tts_model():
-        init_status['TTS'] = "✓ 成功"
-        logger.info("✓ TTS模型加载成功")
-    else:
-        init_status['TTS'] = "✗ 失败（可选）"
-        logger.warning("✗ TTS模型初始化失败 - TTS功能将不可用，但其他功能正常")
-    
-    # 显示初始化总结
-    logger.info("\n" + "=" * 60)
-    logger.info("模型初始化完成！")
-    logger.info("=" * 60)
-    logger.info("初始化状态:")
-    for module, status in init_status.items():
-        logger.info(f"  {module:6s}: {status}")
-    logger.info("=" * 60)
+    try:
+        if get_format(config.TTS_OUTPUT_FORMAT).name not in ENCODABLE_FORMATS:
+            logger.warning(f"当前libsndfile不支持编码{config.TTS_OUTPUT_FORMAT}，默认回复音频格式退回{FALLBACK_FORMAT}")
+    except UnsupportedOutputFormatError as e:
+        logger.warning(str(e))
     
-    # 检查关键功能
-    if asr_model is None:
-        logger.error("\n⚠️  警告：ASR模型未加载，语音识别功能将不可用！")
-    else:
-        logger.info("\n✓ 核心功能（ASR + AI对话）已就绪，服务可以正常使用")
+    # ASR、VAD、TTS同时加载，各接口只等待自己依赖的模型
+    model_manager.start()
+    if not config.MODEL_LAZY_LOAD:
+        logger.info("模型在后台并行加载中，加载状态见 /api/health/ready")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭推理线程池、模型加载线程和LLM连接池"""
+    scheduler.shutdown()
+    tts_batch_executor.shutdown(wait=False)
+    model_manager.shutdown()
+    for client in (asr_server, tts_server):
+        if client is not None:
+            client.close()
+    await llm_client.close()
 
 class ChatRequest(BaseModel):
     text: str
     conversation_history: Optional[list] = None
+    session_id: Optional[str] = None  # 服务端会话ID，设置后只需发送新的一句话
 
 class ChatResponse(BaseModel):
     text: str
     audio_url: Optional[str] = None
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    """文本对话接口（不包含ASR和TTS）"""
+async def chat_endpoint(request: ChatRequest, audio_format: AudioFormat = Depends(output_format)):
+    """
+    文本对话接口（不包含ASR，不等待TTS）
+    audio_url指向回复音频，客户端第一次获取时才合成，不获取就不产生合成开销
+    """
     try:
-        ai_reply = chat_with_ai(request.text, request.conversation_history)
-        return ChatResponse(text=ai_reply)
+        history = await load_history(request.session_id, request.conversation_history)
+        ai_reply = await chat_with_ai(request.text, history)
+        await remember_turn(request.session_id, request.text, ai_reply)
+        return ChatResponse(text=ai_reply, audio_url=await defer_reply_audio(ai_reply, audio_format))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"对话接口错误: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/audio/transcribe")
-async def transcribe_endpoint(audio: UploadFile = File(...)):
-    """音频转文本接口"""
+async def transcribe_endpoint(audio: UploadFile = File(...), asr_engine: Optional[str] = Form(None)):
+    """音频转文本接口（asr_engine指定识别引擎：offline/streaming，默认ASR_UPLOAD_ENGINE）"""
     try:
-        # 读取音频文件
-        audio_bytes = await audio.read()
-        audio_io = io.BytesIO(audio_bytes)
+        engine = await select_asr_engine(asr_engine)
         
-        # 使用soundfile读取音频
-        audio_data, sample_rate = sf.read(audio_io)
+        # 解码并统一为16000Hz单声道
+        audio_data, sample_rate = await decode_upload(audio)
         
-        # VAD检测
-        has_speech = detect_speech(audio_data, sample_rate)
-        if not has_speech:
-            return JSONResponse(content={"text": "", "has_speech": False})
+        # VAD检测，只保留语音区间
+        speech_audio = await run_stage("vad", extract_speech, audio_data, sample_rate)
+        if speech_audio is None:
+            count_early_exit("no_speech")
+            return JSONResponse(content={"text": "", "has_speech": False, "asr_engine": engine})
         
         # ASR识别
-        text = transcribe_audio(audio_data, sample_rate)
+        text = await transcribe(speech_audio, sample_rate, engine)
         
-        return JSONResponse(content={"text": text, "has_speech": True})
+        return JSONResponse(content={"text": text, "has_speech": True, "asr_engine": engine})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"转录接口错误: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/audio/tts")
-async def tts_endpoint(request: ChatRequest):
-    """文本转语音接口"""
+async def tts_endpoint(request: ChatRequest, stream: bool = False, audio_format: AudioFormat = Depends(output_format)):
+    """文本转语音接口（输出格式由format参数或Accept头决定，stream=true 时分块返回）"""
     try:
+        await require_models("tts")
         if tts_model is None:
             raise HTTPException(status_code=503, detail="TTS模型未初始化")
         
-        # 生成语音
-        audio_data, sample_rate = text_to_speech(request.text)
+        if stream:
+            return await streaming_tts_response(
+                request.text, {}, audio_format, filename="output", disposition="attachment"
+            )
         
-        # 转换为WAV格式
-        audio_io = io.BytesIO()
-        sf.write(audio_io, audio_data, sample_rate, format='WAV')
-        audio_io.seek(0)
+        # 生成语音并编码为输出格式（命中缓存时直接返回）
+        audio_bytes, sample_rate = await synthesize_audio(request.text, audio_format)
         
-        return StreamingResponse(
-            audio_io,
-            media_type="audio/wav",
-            headers={"Content-Disposition": "attachment; filename=output.wav"}
-        )
+        return audio_response(audio_bytes, sample_rate, audio_format, filename="output", disposition="attachment")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"TTS接口错误: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -681,18 +1436,25 @@ async def tts_endpoint(request: ChatRequest):
 @app.post("/api/complete")
 async def complete_endpoint(
     audio: UploadFile = File(...), 
-    conversation_history: Optional[str] = Form(None)
+    conversation_history: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    asr_engine: Optional[str] = Form(None),
+    audio_format: AudioFormat = Depends(output_format)
 ):
-    """完整流程：音频输入 -> VAD -> ASR -> AI对话 -> TTS -> 音频输出"""
+    """
+    完整流程：音频输入 -> VAD -> ASR -> AI对话 -> TTS
+    合成的回复音频保存在回复音频存储中，响应只返回audio_url，客户端按需获取
+    """
     try:
-        # 1. 读取音频
-        audio_bytes = await audio.read()
-        audio_io = io.BytesIO(audio_bytes)
-        audio_data, sample_rate = sf.read(audio_io)
-        
-        # 2. VAD检测
-        has_speech = detect_speech(audio_data, sample_rate)
-        if not has_speech:
+        engine = await select_asr_engine(asr_engine)
+        
+        # 1. 读取并解码音频（统一为16000Hz单声道）
+        audio_data, sample_rate = await decode_upload(audio)
+        
+        # 2. VAD检测，只保留语音区间
+        speech_audio = await run_stage("vad", extract_speech, audio_data, sample_rate)
+        if speech_audio is None:
+            count_early_exit("no_speech")
             return JSONResponse(content={
                 "text": "",
                 "ai_reply": "",
@@ -701,8 +1463,9 @@ async def complete_endpoint(
             })
         
         # 3. ASR识别
-        user_text = transcribe_audio(audio_data, sample_rate)
+        user_text = await transcribe(speech_audio, sample_rate, engine)
         if not user_text:
+            count_early_exit("empty_transcript")
             return JSONResponse(content={
                 "text": "",
                 "ai_reply": "",
@@ -717,14 +1480,25 @@ async def complete_endpoint(
                 history = json.loads(conversation_history)
             except:
                 logger.warning("对话历史格式错误，将忽略")
-        ai_reply = chat_with_ai(user_text, history)
+        history = await load_history(session_id, history)
+        ai_reply = await chat_with_ai(user_text, history)
+        await remember_turn(session_id, user_text, ai_reply)
         
-        # 5. TTS合成（可选）
+        # 5. TTS合成（可选，不等待模型加载），编码后保存，响应中返回audio_url
+        # TTS仍在加载时返回延迟合成的audio_url，客户端稍后获取时再合成
         audio_available = False
-        if tts_model is not None:
+        audio_url = None
+        message = "TTS功能不可用"
+        tts_loaded = model_manager.loaded("tts")
+        if tts_loaded is None:
+            audio_url = await defer_reply_audio(ai_reply, audio_format)
+            message = "TTS模型加载中" + ("，回复音频可稍后通过audio_url获取" if audio_url else "")
+        elif tts_loaded and tts_model is not None:
             try:
-                tts_audio_data, tts_sample_rate = text_to_speech(ai_reply)
+                tts_audio, tts_sample_rate = await synthesize_audio(ai_reply, audio_format)
+                audio_url = await save_reply_audio(tts_audio, tts_sample_rate, audio_format)
                 audio_available = True
+                message = "处理完成"
             except Exception as tts_error:
                 logger.error(f"TTS合成失败: {tts_error}")
                 audio_available = False
@@ -734,72 +1508,147 @@ async def complete_endpoint(
             "ai_reply": ai_reply,
             "has_speech": True,
             "audio_available": audio_available,
-            "message": "TTS功能不可用" if not audio_available else "处理完成"
+            "audio_url": audio_url,
+            "audio_format": audio_format.name if audio_url else None,
+            "message": message
         })
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"完整流程错误: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.api_route("/api/audio/artifacts/{artifact_id}", methods=["GET", "HEAD"])
+async def audio_artifact_endpoint(
+    artifact_id: str,
+    request: Request,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None)
+):
+    """
+    获取回复音频（/api/complete、/api/chat 返回的audio_url）
+    支持Range分段读取（206）和ETag条件请求（If-None-Match命中时返回304）；延迟合成的音频在第一次GET时合成，
+    尚未合成时HEAD返回202（不触发合成，避免HEAD探测占用TTS）
+    """
+    try:
+        artifact = await load_artifact(artifact_id) if artifact_store is not None else None
+        if artifact_store is not None:
+            artifact_store.record(artifact is not None)
+        if artifact is None:
+            raise HTTPException(status_code=404, detail="回复音频不存在或已过期")
+        if request.method == "HEAD" and not artifact.ready:
+            audio_format = FORMATS[artifact.audio_format]
+            return Response(status_code=202, headers={
+                "Content-Type": audio_format.media_type,
+                "X-Audio-Format": audio_format.name,
+                "Cache-Control": "no-store"
+            })
+        artifact = await realize_artifact(artifact)
+        
+        audio_format = FORMATS[artifact.audio_format]
+        headers = {
+            **audio_headers(audio_format, artifact.sample_rate, filename="reply"),
+            "ETag": artifact.etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": f"private, max-age={artifact.ttl()}"
+        }
+        # 格式在生成audio_url时已经确定，与请求的Accept无关
+        headers.pop("Vary", None)
+        if etag_matches(if_none_match, artifact.etag):
+            return Response(status_code=304, headers=headers)
+        
+        data = artifact.data
+        media_type = audio_format.content_type(artifact.sample_rate)
+        # If-Range与当前ETag不一致时忽略Range，返回完整内容
+        if range_header and (not if_range or if_range.strip() == artifact.etag):
+            try:
+                byte_range = parse_range(range_header, len(data))
+            except RangeNotSatisfiableError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+            if byte_range is not None:
+                first, last = byte_range
+                return Response(
+                    content=data[first:last + 1],
+                    status_code=206,
+                    media_type=media_type,
+                    headers={**headers, "Content-Range": f"bytes {first}-{last}/{len(data)}"}
+                )
+        return Response(content=data, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"回复音频接口错误: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/complete/audio")
 async def complete_with_audio_endpoint(
     audio: UploadFile = File(...), 
-    conversation_history: Optional[str] = Form(None)
+    conversation_history: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    asr_engine: Optional[str] = Form(None),
+    stream: bool = False,
+    audio_format: AudioFormat = Depends(output_format)
 ):
-    """完整流程并返回音频：音频输入 -> VAD -> ASR -> AI对话 -> TTS -> 返回音频文件"""
+    """完整流程并返回音频：音频输入 -> VAD -> ASR -> AI对话 -> TTS -> 返回音频文件（stream=true 时分块返回）"""
     try:
-        # 1. 读取音频
-        audio_bytes = await audio.read()
-        audio_io = io.BytesIO(audio_bytes)
-        audio_data, sample_rate = sf.read(audio_io)
-        
-        # 2. VAD检测
-        has_speech = detect_speech(audio_data, sample_rate)
-        if not has_speech:
+        engine = await select_asr_engine(asr_engine)
+        
+        # 1. 读取并解码音频（统一为16000Hz单声道）
+        audio_data, sample_rate = await decode_upload(audio)
+        
+        # 2. VAD检测，只保留语音区间
+        speech_audio = await run_stage("vad", extract_speech, audio_data, sample_rate)
+        if speech_audio is None:
+            count_early_exit("no_speech")
             return JSONResponse(content={
                 "error": "未检测到语音活动"
             })
         
         # 3. ASR识别
-        user_text = transcribe_audio(audio_data, sample_rate)
+        user_text = await transcribe(speech_audio, sample_rate, engine)
         if not user_text:
+            count_early_exit("empty_transcript")
             return JSONResponse(content={
                 "error": "未能识别出文本"
             })
         
-        # 4. AI对话
+        # 4. 回复需要TTS：在调用AI之前确认TTS可用，避免AI回复（和写入会话的这一轮）因TTS未就绪作废
+        await require_models("tts")
+        if tts_model is None:
+            return JSONResponse(content={
+                "error": "TTS模型未初始化",
+                "text": user_text
+            })
+        
+        # 5. AI对话
         history = None
         if conversation_history:
             try:
                 history = json.loads(conversation_history)
             except:
                 pass
-        ai_reply = chat_with_ai(user_text, history)
+        history = await load_history(session_id, history)
+        ai_reply = await chat_with_ai(user_text, history)
+        await remember_turn(session_id, user_text, ai_reply)
         
-        # 5. TTS合成
-        if tts_model is None:
-            return JSONResponse(content={
-                "error": "TTS模型未初始化",
-                "text": user_text,
-                "ai_reply": ai_reply
-            })
-        
-        tts_audio_data, tts_sample_rate = text_to_speech(ai_reply)
-        
-        # 转换为WAV
-        tts_audio_io = io.BytesIO()
-        sf.write(tts_audio_io, tts_audio_data, tts_sample_rate, format='WAV')
-        tts_audio_io.seek(0)
-        
-        return StreamingResponse(
-            tts_audio_io,
-            media_type="audio/wav",
-            headers={
+        if stream:
+            return await streaming_tts_response(ai_reply, {
                 "X-User-Text": quote(user_text, safe=''),
                 "X-AI-Reply": quote(ai_reply, safe='')
-            }
-        )
+            }, audio_format)
+        
+        # 合成并编码为输出格式
+        tts_audio, tts_sample_rate = await synthesize_audio(ai_reply, audio_format)
+        
+        return audio_response(tts_audio, tts_sample_rate, audio_format, {
+            "X-User-Text": quote(user_text, safe=''),
+            "X-AI-Reply": quote(ai_reply, safe='')
+        })
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"完整流程错误: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -809,23 +1658,30 @@ async def complete_with_audio_endpoint(
 @app.post("/api/chat/audio")
 async def chat_with_audio(
     audio: UploadFile = File(...),
-    conversation_history: Optional[str] = Form(None)
+    conversation_history: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    asr_engine: Optional[str] = Form(None),
+    stream: bool = False,
+    audio_format: AudioFormat = Depends(output_format)
 ):
     """
     统一接口：音频输入 -> VAD -> ASR -> AI对话 -> TTS -> 返回音频
     流程：用户音频 -> 语音识别 -> AI回复 -> 语音合成 -> 返回音频流
+    输出格式由format参数或Accept头决定（默认TTS_OUTPUT_FORMAT），stream=true 时边合成边分块返回
+    asr_engine指定识别引擎（offline/streaming），默认ASR_UPLOAD_ENGINE
     """
     try:
-        # 1. 读取音频
-        audio_bytes = await audio.read()
-        audio_io = io.BytesIO(audio_bytes)
-        audio_data, sample_rate = sf.read(audio_io)
+        engine = await select_asr_engine(asr_engine)
+        
+        # 1. 读取并解码音频（统一为16000Hz单声道）
+        audio_data, sample_rate = await decode_upload(audio)
         
         logger.info(f"收到音频输入: {len(audio_data)} 采样点, 采样率={sample_rate}Hz")
         
-        # 2. VAD检测
-        has_speech = detect_speech(audio_data, sample_rate)
-        if not has_speech:
+        # 2. VAD检测，只保留语音区间
+        speech_audio = await run_stage("vad", extract_speech, audio_data, sample_rate)
+        if speech_audio is None:
+            count_early_exit("no_speech")
             logger.warning("未检测到语音活动")
             return JSONResponse(
                 status_code=400,
@@ -833,14 +1689,16 @@ async def chat_with_audio(
             )
         
         # 3. ASR识别
-        if asr_model is None:
+        await require_models("asr")
+        if get_asr_engine(engine) is None:
             return JSONResponse(
                 status_code=503,
                 content={"error": "ASR模型未初始化"}
             )
         
-        user_text = transcribe_audio(audio_data, sample_rate)
+        user_text = await transcribe(speech_audio, sample_rate, engine)
         if not user_text or not user_text.strip():
+            count_early_exit("empty_transcript")
             logger.warning("未能识别出文本")
             return JSONResponse(
                 status_code=400,
@@ -849,48 +1707,48 @@ async def chat_with_audio(
         
         logger.info(f"ASR识别结果: {user_text}")
         
-        # 4. AI对话
+        # 4. 先确认TTS可用再调用AI
+        await require_models("tts")
+        if tts_model is None:
+            return JSONResponse(
+                status_code=503,
+                content={
+                    "error": "TTS模型未初始化",
+                    "user_text": user_text
+                }
+            )
+        
+        # 5. AI对话
         history = None
         if conversation_history:
             try:
                 history = json.loads(conversation_history)
             except Exception as e:
                 logger.warning(f"对话历史格式错误: {e}")
+        history = await load_history(session_id, history)
         
-        ai_reply = chat_with_ai(user_text, history)
+        ai_reply = await chat_with_ai(user_text, history)
+        await remember_turn(session_id, user_text, ai_reply)
         logger.info(f"AI回复: {ai_reply[:100]}...")
         
-        # 5. TTS合成
-        if tts_model is None:
-            return JSONResponse(
-                status_code=503,
-                content={
-                    "error": "TTS模型未初始化",
-                    "user_text": user_text,
-                    "ai_reply": ai_reply
-                }
-            )
-        
-        tts_audio_data, tts_sample_rate = text_to_speech(ai_reply)
+        if stream:
+            return await streaming_tts_response(ai_reply, {
+                "X-User-Text": quote(user_text, safe=''),
+                "X-AI-Reply": quote(ai_reply, safe='')
+            }, audio_format, filename="ai_reply")
         
-        # 6. 转换为WAV格式并返回音频流
-        tts_audio_io = io.BytesIO()
-        sf.write(tts_audio_io, tts_audio_data, tts_sample_rate, format='WAV')
-        tts_audio_io.seek(0)
+        # 6. 合成并编码为输出格式返回
+        tts_audio, tts_sample_rate = await synthesize_audio(ai_reply, audio_format)
         
-        logger.info(f"返回音频: {len(tts_audio_io.getvalue())} bytes, 采样率={tts_sample_rate}Hz")
+        logger.info(f"返回音频: {len(tts_audio)} bytes, 格式={audio_format.name}, 采样率={tts_sample_rate}Hz")
         
-        return StreamingResponse(
-            tts_audio_io,
-            media_type="audio/wav",
-            headers={
-                "X-User-Text": quote(user_text, safe=''),
-                "X-AI-Reply": quote(ai_reply, safe=''),
-                "X-Audio-Sample-Rate": str(tts_sample_rate),
-                "Content-Disposition": "inline; filename=ai_reply.wav"
-            }
-        )
+        return audio_response(tts_audio, tts_sample_rate, audio_format, {
+            "X-User-Text": quote(user_text, safe=''),
+            "X-AI-Reply": quote(ai_reply, safe='')
+        }, filename="ai_reply")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"音频对话接口错误: {e}")
         import traceback
@@ -900,11 +1758,14 @@ async def chat_with_audio(
 
 @app.post("/api/chat/text")
 async def chat_with_text(
-    request: ChatRequest
+    request: ChatRequest,
+    stream: bool = False,
+    audio_format: AudioFormat = Depends(output_format)
 ):
     """
     统一接口：文本输入 -> AI对话 -> TTS -> 返回音频
     流程：用户文本 -> AI回复 -> 语音合成 -> 返回音频流
+    输出格式由format参数或Accept头决定（默认TTS_OUTPUT_FORMAT），stream=true 时边合成边分块返回
     """
     try:
         if not request.text or not request.text.strip():
@@ -912,29 +1773,33 @@ async def chat_with_text(
         
         logger.info(f"收到文本输入: {request.text[:100]}...")
         
-        # 1. AI对话
-        ai_reply = chat_with_ai(request.text, request.conversation_history)
-        logger.info(f"AI回复: {ai_reply[:100]}...")
-        
-        # 2. TTS合成
+        # 1. 先确认TTS可用再调用AI
+        await require_models("tts")
         if tts_model is None:
             return JSONResponse(
                 status_code=503,
                 content={
                     "error": "TTS模型未初始化",
-                    "user_text": request.text,
-                    "ai_reply": ai_reply
+                    "user_text": request.text
                 }
             )
         
-        tts_audio_data, tts_sample_rate = text_to_speech(ai_reply)
+        # 2. AI对话
+        history = await load_history(request.session_id, request.conversation_history)
+        ai_reply = await chat_with_ai(request.text, history)
+        await remember_turn(request.session_id, request.text, ai_reply)
+        logger.info(f"AI回复: {ai_reply[:100]}...")
         
-        # 3. 转换为WAV格式并返回音频流
-        tts_audio_io = io.BytesIO()
-        sf.write(tts_audio_io, tts_audio_data, tts_sample_rate, format='WAV')
-        tts_audio_io.seek(0)
+        if stream:
+            return await streaming_tts_response(ai_reply, {
+                "X-User-Text": quote(request.text, safe=''),
+                "X-AI-Reply": quote(ai_reply, safe='')
+            }, audio_format, filename="ai_reply")
+        
+        # 3. 合成并编码为输出格式返回
+        tts_audio, tts_sample_rate = await synthesize_audio(ai_reply, audio_format)
         
-        logger.info(f"返回音频: {len(tts_audio_io.getvalue())} bytes, 采样率={tts_sample_rate}Hz")
+        logger.info(f"返回音频: {len(tts_audio)} bytes, 格式={audio_format.name}, 采样率={tts_sample_rate}Hz")
         
         # 编码响应头
         encoded_user_text = quote(request.text, safe='')
@@ -943,16 +1808,10 @@ async def chat_with_text(
         logger.info(f"响应头编码 - X-User-Text长度: {len(encoded_user_text)}, X-AI-Reply长度: {len(encoded_ai_reply)}")
         logger.debug(f"响应头编码 - X-User-Text: {encoded_user_text[:100]}..., X-AI-Reply: {encoded_ai_reply[:100]}...")
         
-        return StreamingResponse(
-            tts_audio_io,
-            media_type="audio/wav",
-            headers={
-                "X-User-Text": encoded_user_text,
-                "X-AI-Reply": encoded_ai_reply,
-                "X-Audio-Sample-Rate": str(tts_sample_rate),
-                "Content-Disposition": "inline; filename=ai_reply.wav"
-            }
-        )
+        return audio_response(tts_audio, tts_sample_rate, audio_format, {
+            "X-User-Text": encoded_user_text,
+            "X-AI-Reply": encoded_ai_reply
+        }, filename="ai_reply")
             
     except HTTPException:
         raise
@@ -963,16 +1822,362 @@ async def chat_with_text(
         raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
 
 
+async def stream_reply_events(user_text: str, conversation_history: list = None,
+                              audio_format: AudioFormat = FORMATS["wav"]) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    流式AI对话并逐句合成，产出 (事件名, 数据)
+    LLM还在输出后续token时，已完成的句子就开始合成，首段音频不必等待完整回复
+    
+    事件：
+    - sentence: {"index", "text", "audio"(按audio_format编码的字节), "sample_rate", "format"}
+    - done: {"ai_reply", "sentences"}
+    - error: {"error", "text"}；LLM回复中途中断时为{"error"}，随后不再产出done，这一轮不应写入对话历史
+    """
+    sentence_queue: asyncio.Queue = asyncio.Queue()
+    reply_parts = []
+    
+    async def produce_sentences():
+        """读取LLM流，按句放入队列，结束时放入None"""
+        splitter = SentenceSplitter(config.STREAM_MIN_SENTENCE_CHARS)
+        try:
+            async for delta in stream_chat_with_ai(user_text, conversation_history):
+                reply_parts.append(delta)
+                for sentence in splitter.feed(delta):
+                    await sentence_queue.put(sentence)
+            for sentence in splitter.flush():
+                await sentence_queue.put(sentence)
+        finally:
+            await sentence_queue.put(None)
+    
+    producer = asyncio.create_task(produce_sentences())
+    index = 0
+    try:
+        while True:
+            sentence = await sentence_queue.get()
+            if sentence is None:
+                break
+            try:
+                tts_audio, tts_sample_rate = await synthesize_audio(sentence, audio_format)
+            except Exception as e:
+                logger.error(f"流式TTS合成失败: {e}")
+                yield "error", {"error": str(e), "text": sentence}
+                continue
+            yield "sentence", {
+                "index": index,
+                "text": sentence,
+                "audio": tts_audio,
+                "sample_rate": tts_sample_rate,
+                "format": audio_format.name
+            }
+            index += 1
+        try:
+            await producer
+        except LLMStreamInterrupted as e:
+            # 已合成的句子照常发出，但残缺的回复不能当作完整的一轮
+            yield "error", {"error": str(e)}
+            return
+        ai_reply = "".join(reply_parts).strip()
+        logger.info(f"流式AI回复完成: {index}句, {ai_reply[:100]}...")
+        yield "done", {"ai_reply": ai_reply, "sentences": index}
+    except Exception as e:
+        logger.error(f"流式对话错误: {e}")
+        yield "error", {"error": f"处理失败: {str(e)}"}
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+def sse_event(event: str, data: dict) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/text/stream")
+async def chat_with_text_stream(
+    request: ChatRequest,
+    fmt: Optional[str] = Query(None, alias="format", description="每句音频的格式：wav/wav-float/opus/mp3/pcm")
+):
+    """
+    流式接口：文本输入 -> 流式AI对话 -> 逐句TTS -> SSE推送
+    每句音频的格式由format参数决定（默认TTS_OUTPUT_FORMAT，Accept头用于协商SSE本身）
+    
+    事件：
+    - sentence: {"index", "text", "audio"(base64编码的音频), "sample_rate", "format"}
+    - done: {"ai_reply", "sentences"}
+    - error: {"error", "text"}
+    """
+    if not request.text or not request.text.strip():
+        raise HTTPException(status_code=400, detail="文本内容不能为空")
+    
+    await require_models("tts")
+    if tts_model is None:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "TTS模型未初始化", "user_text": request.text}
+        )
+    
+    audio_format = output_format(fmt, None)
+    logger.info(f"收到流式文本输入: {request.text[:100]}...")
+    history = await load_history(request.session_id, request.conversation_history)
+    
+    async def event_stream():
+        async for event, data in stream_reply_events(request.text, history, audio_format):
+            if event == "sentence":
+                data = {**data, "audio": base64.b64encode(data["audio"]).decode("ascii")}
+            elif event == "done":
+                await remember_turn(request.session_id, request.text, data["ai_reply"])
+            yield sse_event(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-User-Text": quote(request.text, safe='')
+        }
+    )
+
+@app.post("/api/sessions")
+async def create_session():
+    """创建服务端会话，之后的对话请求带上返回的session_id即可，不必再发送conversation_history"""
+    return {"session_id": await session_store.create()}
+
+@app.get("/api/sessions/{session_id}")
+async def get_session(session_id: str):
+    """查看会话：摘要、未折叠的对话和估算的token数"""
+    data = await session_store.get(session_id) if valid_session_id(session_id) else None
+    if data is None:
+        raise HTTPException(status_code=404, detail="会话不存在或已过期")
+    history = await session_store.history(session_id)
+    return {
+        "session_id": session_id,
+        "summary": data["summary"],
+        "turns": data["turns"],
+        "history_tokens": sum(message_tokens(message) for message in history),
+        "prompt_history_tokens": sum(message_tokens(message) for message in fit_history(history, config.SESSION_HISTORY_TOKEN_BUDGET))
+    }
+
+@app.delete("/api/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """删除会话（清空服务端保存的对话历史）"""
+    if valid_session_id(session_id):
+        await session_store.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+@app.websocket("/ws/voice")
+async def voice_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    实时语音会话（全双工）：客户端持续发送16000Hz单声道16位PCM（二进制消息），
+    服务端边收边做VAD和分块ASR，检测到说话结束立即请求AI并逐句返回合成音频
+    
+    查询参数session_id：使用服务端会话保存对话历史（断线重连后继续），不设置时历史只在本连接内有效
+    
+    客户端文本消息（JSON）：
+    - {"type": "end"}: 主动结束当前这句话（不等静音检测）
+    - {"type": "reset"}: 丢弃当前语音和对话历史（包括服务端会话）
+    - {"type": "history", "conversation_history": [...]}: 设置对话历史（未使用服务端会话时）
+    
+    服务端消息（JSON）：
+    - ready: {"sample_rate", "encoding"}
+    - speech_start / speech_discard
+    - partial: {"text"}  中间识别结果（累计）
+    - final: {"text"}    整句识别结果，随后开始AI回复
+    - sentence: {"index", "text", "sample_rate"}，紧跟一条二进制消息（该句的WAV音频）
+    - done: {"ai_reply", "sentences"}
+    - interrupted: 回复过程中用户再次开始说话，剩余回复被取消
+    - error: {"error"}
+    """
+    await websocket.accept()
+    
+    if session_id is not None and not valid_session_id(session_id):
+        await websocket.send_json({"type": "error", "error": "session_id格式错误"})
+        await websocket.close(code=1008)
+        return
+    
+    try:
+        await model_manager.wait_for("asr", "vad")
+    except ModelNotReadyError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1013)
+        return
+    if asr_model is None:
+        await websocket.send_json({"type": "error", "error": "ASR模型未初始化"})
+        await websocket.close(code=1011)
+        return
+    
+    session = VoiceSession(
+        VADStream(vad_engine) if vad_engine is not None else None,
+        frame_size=getattr(vad_engine, "frame_size", 512),
+        sample_rate=CANONICAL_SAMPLE_RATE,
+        asr_chunk_samples=asr_chunk_samples(),
+        threshold=config.VAD_THRESHOLD,
+        min_speech_ms=config.VAD_MIN_SPEECH_MS,
+        end_silence_ms=config.VOICE_WS_END_SILENCE_MS,
+        speech_pad_ms=config.VAD_SPEECH_PAD_MS,
+        max_utterance_seconds=config.VOICE_WS_MAX_UTTERANCE_SECONDS
+    )
+    history = []
+    reply_task: Optional[asyncio.Task] = None
+    send_lock = asyncio.Lock()  # 回复任务和接收循环都会发送，sentence的JSON和音频必须连续
+    
+    async def send_json(data: dict):
+        async with send_lock:
+            await websocket.send_json(data)
+    
+    async def reply(user_text: str):
+        """流式AI回复并逐句发送音频，完成后写入对话历史"""
+        try:
+            context = await session_store.history(session_id) if session_id else list(history)
+            async for event, data in stream_reply_events(user_text, context):
+                if event == "sentence":
+                    async with send_lock:
+                        await websocket.send_json({"type": "sentence", "index": data["index"], "text": data["text"], "sample_rate": data["sample_rate"]})
+                        await websocket.send_bytes(data["audio"])
+                elif event == "done":
+                    if session_id:
+                        await remember_turn(session_id, user_text, data["ai_reply"])
+                    else:
+                        history.append({"role": "user", "content": user_text})
+                        history.append({"role": "assistant", "content": data["ai_reply"]})
+                    await send_json({"type": "done", **data})
+                else:
+                    await send_json({"type": "error", **data})
+        except Exception as e:
+            # 连接已断开等，回复作废
+            logger.warning(f"实时会话回复中止: {e}")
+    
+    async def handle(events):
+        nonlocal reply_task
+        # 每个事件带着所属的一句话：同一批事件中上一句的剩余分块和结束不会用到下一句的ASR缓存
+        for event, audio, utterance in events:
+            if event == "speech_start":
+                if reply_task is not None and not reply_task.done():
+                    # 用户打断：取消尚未发送完的回复
+                    reply_task.cancel()
+                    await send_json({"type": "interrupted"})
+                await send_json({"type": "speech_start"})
+            elif event == "speech_discard":
+                await send_json({"type": "speech_discard"})
+            elif event == "asr_chunk":
+                text = await run_stage("asr", recognize_stream_chunk, audio, utterance.asr_cache, False)
+                if text:
+                    utterance.partial_text += text
+                    await send_json({"type": "partial", "text": utterance.partial_text})
+            elif event == "speech_end":
+                text = await run_stage("asr", recognize_stream_chunk, audio, utterance.asr_cache, True)
+                user_text = (utterance.partial_text + text).strip()
+                await send_json({"type": "final", "text": user_text})
+                if not user_text:
+                    count_early_exit("empty_transcript")
+                    continue
+                logger.info(f"实时会话识别结果: {user_text}")
+                reply_task = asyncio.create_task(reply(user_text))
+    
+    await send_json({"type": "ready", "sample_rate": CANONICAL_SAMPLE_RATE, "encoding": "pcm_s16le"})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                audio = pcm16_to_float(message["bytes"])
+                events = await run_stage("vad", session.feed, audio)
+                await handle(events)
+                continue
+            
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                await send_json({"type": "error", "error": "无法解析的控制消息"})
+                continue
+            kind = control.get("type")
+            if kind == "end":
+                await handle(session.finish())
+            elif kind == "reset":
+                if reply_task is not None and not reply_task.done():
+                    reply_task.cancel()
+                session.reset()
+                history.clear()
+                if session_id:
+                    await session_store.delete(session_id)
+            elif kind == "history":
+                history[:] = control.get("conversation_history") or []
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as e:
+        # 排队已满等
+        logger.warning(f"实时会话中止: {e.detail}")
+        await send_json({"type": "error", "error": e.detail})
+        await websocket.close(code=1013)
+    except Exception as e:
+        logger.error(f"实时会话错误: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+    finally:
+        if reply_task is not None and not reply_task.done():
+            reply_task.cancel()
+
 @app.get("/api/health")
 async def health_check():
     """健康检查接口"""
     return {
         "status": "ok",
+        "ready": model_manager.ready,
         "asr_loaded": asr_model is not None,
+        "asr_offline_loaded": asr_offline_model is not None,
+        "asr_punc_loaded": asr_punc_model is not None,
+        "asr_upload_engine": config.ASR_UPLOAD_ENGINE,
         "vad_loaded": vad_model is not None,
-        "tts_loaded": tts_model is not None
+        "inference_backends": inference_backends,
+        "tts_loaded": tts_model is not None,
+        "models": model_manager.status(),
+        "worker": worker_info(),
+        "model_servers": {"asr": asr_server.stats(), "tts": tts_server.stats()} if config.MODEL_SERVER_ENABLED else None,
+        "voices": voice_registry.stats(),
+        "scheduler": scheduler.stats(),
+        "asr_batch": asr_batcher.stats() if asr_batcher is not None else None,
+        "asr_offline_batch": asr_offline_batcher.stats() if asr_offline_batcher is not None else None,
+        "tts_batch": tts_batcher.stats() if tts_batcher is not None else None,
+        "tts_cache": tts_cache.stats() if tts_cache is not None else None,
+        "audio_artifacts": artifact_store.stats() if artifact_store is not None else None,
+        "sessions": session_store.stats(),
+        "upload_formats": decodable_formats(config.SUPPORTED_AUDIO_FORMATS),
+        "output_formats": ENCODABLE_FORMATS,
+        "latency": metrics.rolling_latency.summary()
     }
 
+@app.get("/api/health/live")
+async def liveness_check():
+    """存活检查：进程能处理请求即返回200（模型可能仍在加载）"""
+    return {"status": "ok"}
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """就绪检查：模型加载结束且ASR可用时返回200，否则503；附带每个模型的状态和加载耗时"""
+    ready = model_manager.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "lazy": model_manager.lazy, "models": model_manager.status()}
+    )
+
+@app.get("/api/scheduler")
+async def scheduler_stats():
+    """推理调度统计：各阶段排队深度、等待时间、拒绝次数"""
+    return scheduler.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus指标：各阶段耗时直方图、请求耗时、提前退出计数、模型加载与排队状态"""
+    metrics.MODEL_LOADED.set(int(asr_model is not None), model="asr")
+    metrics.MODEL_LOADED.set(int(asr_offline_model is not None), model="asr_offline")
+    metrics.MODEL_LOADED.set(int(vad_model is not None), model="vad")
+    metrics.MODEL_LOADED.set(int(tts_model is not None), model="tts")
+    for name, state in model_manager.status().items():
+        if state["duration_s"] is not None:
+            metrics.MODEL_LOAD_SECONDS.set(state["duration_s"], model=name)
+    for stage, stats in scheduler.stats().items():
+        metrics.QUEUE_DEPTH.set(stats["queue_depth"], stage=stage)
+        metrics.STAGE_RUNNING.set(stats["running"], stage=stage)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -981,12 +2186,20 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/api/health": "健康检查",
+            "/api/health/live": "存活检查",
+            "/api/health/ready": "就绪检查（各模型加载状态，未就绪返回503）",
+            "/api/scheduler": "推理调度统计（排队深度、等待时间）",
+            "/metrics": "Prometheus指标（各阶段耗时、请求耗时、提前退出计数）",
             "/api/chat/audio": "音频输入接口（音频->文本->AI->音频）",
             "/api/chat/text": "文本输入接口（文本->AI->音频）",
-            "/api/chat": "文本对话（仅返回文本，不包含TTS）",
+            "/api/chat/text/stream": "流式文本输入接口（文本->流式AI->逐句音频，SSE）",
+            "/ws/voice": "实时语音会话（WebSocket，边说边识别，说完立即回复）",
+            "/api/sessions": "服务端会话（创建/查看/删除，对话请求带session_id时只需发送新的一句话）",
+            "/api/chat": "文本对话（返回文本和audio_url，获取audio_url时才合成）",
             "/api/audio/transcribe": "音频转文本",
             "/api/audio/tts": "文本转语音",
-            "/api/complete": "完整流程（音频->文本->AI->文本）",
+            "/api/complete": "完整流程（音频->文本->AI->文本，回复音频通过audio_url获取）",
+            "/api/audio/artifacts/{id}": "获取回复音频（audio_url，支持Range和ETag）",
             "/api/complete/audio": "完整流程（音频->文本->AI->音频）"
         },
         "recommended": {
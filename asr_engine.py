@@ -0,0 +1,282 @@
+"""
+ASR识别引擎
+同一接口下的两种识别方式，输入都是16000Hz float32单声道音频：
+- 流式（streaming）：流式Paraformer按600ms分块识别，分块之间传递cache，用于实时语音会话
+- 离线（offline）：非流式Paraformer一次识别整段音频（可接标点模型），用于上传的完整录音，
+  不做分块和look-back，速度和准确率都优于把完整录音按流式方式分块识别
+模型可以是funasr.AutoModel（torch后端），也可以是FunASROnnxModel包装的funasr_onnx模型（onnx后端）
+"""
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OFFLINE = "offline"
+STREAMING = "streaming"
+ENGINE_NAMES = (OFFLINE, STREAMING)
+
+# 16000Hz下每60ms的采样点数（流式Paraformer的chunk_size以60ms为单位）
+SAMPLES_PER_60MS = 960
+
+# 中文字符之间的空格（非流式Paraformer按token输出时以空格分隔）
+_CJK_SPACE = re.compile(r"(?<=[\u3400-\u9fff])\s+(?=[\u3400-\u9fff])")
+
+
+class UnknownASREngineError(ValueError):
+    """请求了不存在的识别引擎（接口返回400）"""
+
+
+def engine_name(name: str) -> str:
+    key = name.strip().lower()
+    if key not in ENGINE_NAMES:
+        raise UnknownASREngineError(f"不支持的识别引擎: {name}（支持 {', '.join(ENGINE_NAMES)}）")
+    return key
+
+
+def model_supports_batch(model) -> bool:
+    """
+    模型能否一次调用识别多段音频
+    流式Paraformer依赖逐块传递的cache，FunASR只支持batch_size=1，这类模型不合批
+    """
+    inner = getattr(model, "model", None)  # funasr.AutoModel内部的模型实例
+    if inner is not None:
+        return "Streaming" not in type(inner).__name__
+    return not getattr(model, "streaming", True)
+
+
+def result_text(res) -> str:
+    return (res[0].get('text', '') or '') if res else ''
+
+
+class ASREngine(ABC):
+    """
+    识别引擎接口
+
+    transcribe识别一整段音频；transcribe_batch一次识别多段，单段失败时返回对应的异常，
+    默认逐段调用transcribe，支持批量推理的引擎重写它
+    """
+
+    name = "base"
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def supports_batch(self) -> bool:
+        return False
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray) -> str:
+        ...
+
+    def transcribe_batch(self, batch: Sequence[np.ndarray]) -> List[Union[str, Exception]]:
+        results = []
+        for audio in batch:
+            try:
+                results.append(self.transcribe(audio))
+            except Exception as e:
+                logger.error(f"ASR识别失败: {e}")
+                results.append(e)
+        return results
+
+
+class StreamingParaformerEngine(ASREngine):
+    """
+    流式Paraformer：整段音频也按分块识别（与实时会话的识别方式一致）
+
+    ASR_MODEL_NAME配置成非流式模型时模型不依赖cache，整段一次识别并支持合批
+    """
+
+    name = STREAMING
+
+    def __init__(self, model, chunk_size: Sequence[int] = (0, 10, 5),
+                 encoder_chunk_look_back: int = 4, decoder_chunk_look_back: int = 1):
+        super().__init__(model)
+        self.chunk_size = list(chunk_size)
+        self.encoder_chunk_look_back = encoder_chunk_look_back
+        self.decoder_chunk_look_back = decoder_chunk_look_back
+
+    @property
+    def supports_batch(self) -> bool:
+        return model_supports_batch(self.model)
+
+    @property
+    def chunk_samples(self) -> int:
+        """每个分块的采样点数（chunk_size[1] * 60ms）"""
+        return self.chunk_size[1] * SAMPLES_PER_60MS
+
+    def recognize_chunk(self, speech_chunk: np.ndarray, cache: dict, is_final: bool) -> str:
+        """
+        识别一个分块，返回该分块新增的文本
+        cache在同一段语音的各分块之间共享，is_final=True时输出尾部剩余的文字
+        """
+        res = self.model.generate(
+            input=speech_chunk,
+            cache=cache,
+            is_final=is_final,
+            chunk_size=self.chunk_size,
+            encoder_chunk_look_back=self.encoder_chunk_look_back,
+            decoder_chunk_look_back=self.decoder_chunk_look_back
+        )
+        return result_text(res)
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        if self.supports_batch:
+            return result_text(self.model.generate(input=audio)).strip()
+
+        chunk_stride = self.chunk_samples
+        total_chunk_num = int((len(audio) - 1) / chunk_stride + 1)
+        logger.debug(f"ASR处理: 音频长度={len(audio)}采样点, chunk_stride={chunk_stride}, 总chunk数={total_chunk_num}")
+
+        cache = {}
+        full_text = ""
+        for i in range(total_chunk_num):
+            speech_chunk = audio[i * chunk_stride:(i + 1) * chunk_stride]
+            full_text += self.recognize_chunk(speech_chunk, cache, i == total_chunk_num - 1)
+        return full_text.strip()
+
+    def transcribe_batch(self, batch: Sequence[np.ndarray]) -> List[Union[str, Exception]]:
+        if len(batch) > 1 and self.supports_batch:
+            res = self.model.generate(input=list(batch), batch_size=len(batch))
+            return [(r.get('text', '') or '').strip() for r in res]
+        return super().transcribe_batch(batch)
+
+
+class OfflineParaformerEngine(ASREngine):
+    """
+    非流式Paraformer：整段音频一次识别，支持合批；punc_model不为None时给识别结果加标点
+
+    funasr.AutoModel只在带VAD模型时才自动调用标点模型，这里单独调用
+    """
+
+    name = OFFLINE
+
+    def __init__(self, model, punc_model=None):
+        super().__init__(model)
+        self.punc_model = punc_model
+
+    @property
+    def supports_batch(self) -> bool:
+        return True
+
+    def postprocess(self, text: str) -> str:
+        """去掉中文字符之间的空格，按需加标点"""
+        text = _CJK_SPACE.sub("", (text or "").strip())
+        if text and self.punc_model is not None:
+            try:
+                text = result_text(self.punc_model.generate(input=text)).strip() or text
+            except Exception as e:
+                logger.warning(f"标点恢复失败，返回无标点文本: {e}")
+        return text
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        return self.postprocess(result_text(self.model.generate(input=audio)))
+
+    def transcribe_batch(self, batch: Sequence[np.ndarray]) -> List[Union[str, Exception]]:
+        if len(batch) == 1:
+            return super().transcribe_batch(batch)
+        res = self.model.generate(input=list(batch), batch_size=len(batch))
+        return [self.postprocess(r.get('text', '')) for r in res]
+
+
+# ==================== ONNX推理后端 ====================
+def _preds_text(res: dict) -> str:
+    """funasr_onnx的识别结果：{"preds": (文本, 分词)}"""
+    preds = res.get("preds") if res else None
+    if not preds:
+        return ""
+    return preds if isinstance(preds, str) else (preds[0] or "")
+
+
+class FunASROnnxModel:
+    """
+    funasr_onnx模型的适配层，提供与funasr.AutoModel相同的generate接口，识别引擎不需要区分推理后端
+
+    - 非流式：一次调用提取多段音频的特征并批量推理（funasr_onnx的__call__把列表当作文件路径）；
+      静音或噪声导致推理失败时逐段重新识别，失败的段返回空文本
+    - 流式：按分块调用，cache由调用方在同一段语音的各分块之间传递；
+      ONNX导出的流式模型不支持encoder/decoder look-back参数，忽略这两个参数
+    """
+
+    def __init__(self, runner, streaming: bool):
+        self.runner = runner
+        self.streaming = streaming
+
+    def generate(self, input, cache: Optional[dict] = None, is_final: bool = False, **kwargs) -> List[dict]:
+        if self.streaming:
+            res = self.runner(audio_in=input, param_dict={"cache": {} if cache is None else cache, "is_final": is_final})
+            return [{"text": "".join(_preds_text(r) for r in res)}]
+        batch = input if isinstance(input, list) else [input]
+        return [{"text": text} for text in self._recognize(batch)]
+
+    def _recognize(self, batch: List[np.ndarray]) -> List[str]:
+        from funasr_onnx.utils.postprocess_utils import sentence_postprocess
+
+        runner = self.runner
+        try:
+            feats, feats_len = runner.extract_feat(batch)
+            outputs = runner.infer(feats, feats_len)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.warning(f"ONNX ASR推理失败（静音或噪声），返回空文本: {e}")
+                return [""]
+            return [self._recognize([audio])[0] for audio in batch]
+        preds = runner.decode(outputs[0], outputs[1])
+        return [sentence_postprocess(pred)[0] for pred in preds]
+
+
+class FunASROnnxPunc:
+    """funasr_onnx标点模型（CT-Transformer）的适配层，generate(input=文本)与funasr.AutoModel一致"""
+
+    def __init__(self, runner):
+        self.runner = runner
+
+    def generate(self, input: str, **kwargs) -> List[dict]:
+        return [{"text": self.runner(input)[0]}]
+
+
+def is_streaming_model_dir(model_dir: str) -> bool:
+    """模型目录的config.yaml中模型类名包含Streaming时为流式模型（导出前后的目录都适用）"""
+    try:
+        with open(os.path.join(model_dir, "config.yaml"), encoding="utf-8") as f:
+            match = re.search(r"^model:\s*(\S+)", f.read(), re.MULTILINE)
+    except OSError:
+        return False
+    return bool(match) and "Streaming" in match.group(1)
+
+
+def _require_funasr_onnx():
+    try:
+        import funasr_onnx
+    except ImportError as e:
+        raise ImportError("ASR使用onnx推理后端需要安装funasr-onnx（pip install funasr-onnx）") from e
+    return funasr_onnx
+
+
+def load_onnx_asr_model(model_dir: str, quantize: bool, intra_op_threads: int,
+                        batch_size: int = 1, chunk_size: Sequence[int] = (0, 10, 5)) -> FunASROnnxModel:
+    """
+    用funasr_onnx加载ONNX模型（quantize=True时加载int8量化的model_quant.onnx）
+    目录中没有ONNX文件时funasr_onnx会用funasr从同一目录的PyTorch模型导出（需要安装funasr）
+    """
+    _require_funasr_onnx()
+    streaming = is_streaming_model_dir(model_dir)
+    if streaming:
+        from funasr_onnx.paraformer_online_bin import Paraformer as OnlineParaformer
+        runner = OnlineParaformer(model_dir, chunk_size=list(chunk_size), quantize=quantize,
+                                  intra_op_num_threads=intra_op_threads)
+    else:
+        from funasr_onnx import Paraformer
+        runner = Paraformer(model_dir, batch_size=batch_size, quantize=quantize, intra_op_num_threads=intra_op_threads)
+    return FunASROnnxModel(runner, streaming)
+
+
+def load_onnx_punc_model(model_dir: str, quantize: bool, intra_op_threads: int) -> FunASROnnxPunc:
+    """用funasr_onnx加载标点模型"""
+    funasr_onnx = _require_funasr_onnx()
+    return FunASROnnxPunc(funasr_onnx.CT_Transformer(model_dir, quantize=quantize, intra_op_num_threads=intra_op_threads))
@@ -0,0 +1,328 @@
+"""
+回复音频存储
+对话接口合成的回复音频（编码后的字节）按随机ID保存一段时间，接口只返回audio_url，
+客户端需要时再按URL获取（支持Range分段读取和ETag条件请求），不需要时不下载。
+内存中是按字节预算淘汰的LRU，可选的磁盘层按总大小淘汰最久未使用的文件；所有条目在TTL后过期。
+
+条目也可以先只记录文本（延迟合成），第一次读取时才合成，客户端不取就不产生合成开销
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 条目ID：URL安全的随机字符串（音频是对话内容，ID不可猜测）
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# 磁盘层清理过期文件的最短间隔（秒）
+DISK_SWEEP_INTERVAL = 60
+
+
+class RangeNotSatisfiableError(ValueError):
+    """Range请求的范围超出音频长度（接口返回416）"""
+
+
+def valid_artifact_id(artifact_id: str) -> bool:
+    return bool(artifact_id and _ID_PATTERN.match(artifact_id))
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析Range头，返回 (起始, 结束) 字节位置（包含结束位置）；没有Range头、
+    不是bytes单位或请求多个范围时返回None（按RFC 9110可以忽略Range返回完整内容）
+
+    Raises:
+        RangeNotSatisfiableError: 范围的起始位置超出内容长度
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N：最后N个字节
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiableError(header)
+        return max(0, size - length), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or (end and int(end) < first):
+        raise RangeNotSatisfiableError(header)
+    return first, last
+
+
+class AudioArtifact:
+    """
+    一条回复音频
+
+    data为编码后的字节；延迟合成的条目data为None，只有text（合成后由store.fill补上）
+    """
+
+    def __init__(self, artifact_id: str, audio_format: str, expires_at: float, data: Optional[bytes] = None,
+                 sample_rate: Optional[int] = None, text: Optional[str] = None, etag: Optional[str] = None):
+        self.id = artifact_id
+        self.audio_format = audio_format
+        self.expires_at = expires_at
+        self.data = data
+        self.sample_rate = sample_rate
+        self.text = text
+        self.etag = etag or (self.content_etag(data) if data is not None else None)
+
+    @staticmethod
+    def content_etag(data: bytes) -> str:
+        """强ETag：内容哈希（同一段音频无论存了几次ETag都相同）"""
+        return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+    @property
+    def ready(self) -> bool:
+        return self.data is not None
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else 0
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) >= self.expires_at
+
+    def ttl(self) -> int:
+        """剩余有效秒数"""
+        return max(0, int(self.expires_at - time.time()))
+
+    def meta(self) -> dict:
+        """磁盘层保存的元数据（不含音频字节）"""
+        return {"format": self.audio_format, "expires_at": self.expires_at, "sample_rate": self.sample_rate,
+                "text": None if self.ready else self.text, "etag": self.etag}
+
+
+class AudioArtifactStore:
+    """
+    两级回复音频存储（线程安全）
+
+    Args:
+        ttl_seconds: 条目的有效期
+        max_bytes: 内存层的字节预算，为0时不使用内存层（只有延迟合成条目的文本留在内存中）
+        disk_dir: 磁盘层目录，为None时不使用磁盘层；多个工作进程共用同一目录时，
+            任一进程保存的音频都可以由其他进程返回
+        disk_max_bytes: 磁盘层的总大小上限
+    """
+
+    def __init__(self, ttl_seconds: float, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir if disk_dir and disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, AudioArtifact]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        self._last_sweep = 0.0
+
+        self.created = 0
+        self.served = 0
+        self.expired = 0
+        self.not_found = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @property
+    def disk_enabled(self) -> bool:
+        return self.disk_dir is not None
+
+    def _new(self, audio_format: str, **kwargs) -> AudioArtifact:
+        return AudioArtifact(secrets.token_urlsafe(18), audio_format, time.time() + self.ttl_seconds, **kwargs)
+
+    def put(self, data: bytes, audio_format: str, sample_rate: int) -> AudioArtifact:
+        """保存一段编码好的音频（开启磁盘层时是阻塞IO，应在线程池中调用）"""
+        artifact = self._new(audio_format, data=data, sample_rate=sample_rate)
+        self._store(artifact)
+        return artifact
+
+    def put_pending(self, text: str, audio_format: str) -> AudioArtifact:
+        """登记一条延迟合成的音频，第一次读取时再合成（开启磁盘层时是阻塞IO）"""
+        artifact = self._new(audio_format, text=text)
+        self._store(artifact)
+        return artifact
+
+    def fill(self, artifact: AudioArtifact, data: bytes, sample_rate: int) -> AudioArtifact:
+        """延迟合成的条目合成完成，保存音频（开启磁盘层时是阻塞IO）"""
+        ready = AudioArtifact(artifact.id, artifact.audio_format, artifact.expires_at, data=data, sample_rate=sample_rate)
+        self._store(ready)
+        return ready
+
+    def _store(self, artifact: AudioArtifact):
+        with self._lock:
+            self.created += 0 if artifact.id in self._entries else 1
+        self._put_memory(artifact)
+        if self.disk_dir:
+            self._put_disk(artifact)
+
+    def get_memory(self, artifact_id: str) -> Optional[AudioArtifact]:
+        """只查内存层（不做IO，可以在事件循环中直接调用）"""
+        with self._lock:
+            artifact = self._entries.get(artifact_id)
+            if artifact is None:
+                return None
+            if artifact.expired():
+                self._remove_memory(artifact_id)
+                self.expired += 1
+                return None
+            self._entries.move_to_end(artifact_id)
+            return artifact
+
+    def get_disk(self, artifact_id: str) -> Optional[AudioArtifact]:
+        """查磁盘层，命中时放回内存层（阻塞IO，应在线程池中调用）"""
+        if not self.disk_dir:
+            return None
+        meta_path, data_path = self._paths(artifact_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            data = None
+            if meta.get("text") is None:
+                with open(data_path, "rb") as f:
+                    data = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"回复音频读取失败: {e}")
+            return None
+
+        artifact = AudioArtifact(artifact_id, meta["format"], meta["expires_at"], data=data,
+                                 sample_rate=meta.get("sample_rate"), text=meta.get("text"), etag=meta.get("etag"))
+        if artifact.expired():
+            with self._lock:
+                self.expired += 1
+            self._remove_disk(artifact_id)
+            return None
+        self._put_memory(artifact)
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[AudioArtifact]:
+        """先查内存层再查磁盘层"""
+        artifact = self.get_memory(artifact_id)
+        return artifact if artifact is not None else self.get_disk(artifact_id)
+
+    def record(self, found: bool):
+        """接口按ID读取一次的统计"""
+        with self._lock:
+            if found:
+                self.served += 1
+            else:
+                self.not_found += 1
+
+    def _put_memory(self, artifact: AudioArtifact):
+        if artifact.size > self.max_bytes:
+            with self._lock:
+                self._remove_memory(artifact.id)
+            return
+        now = time.time()
+        with self._lock:
+            self._remove_memory(artifact.id)
+            self._entries[artifact.id] = artifact
+            self._bytes += artifact.size
+            # 先丢掉已过期的，再按最久未使用淘汰有音频的条目；
+            # 延迟合成的条目只有文本，不占预算，一直保留到过期（磁盘层关闭时这是唯一的记录）
+            for key in [key for key, entry in self._entries.items() if entry.expired(now)]:
+                self._remove_memory(key)
+                self.expired += 1
+            if self._bytes > self.max_bytes:
+                for key in [key for key, entry in self._entries.items() if entry.ready]:
+                    self._remove_memory(key)
+                    if self._bytes <= self.max_bytes:
+                        break
+
+    def _remove_memory(self, artifact_id: str):
+        artifact = self._entries.pop(artifact_id, None)
+        if artifact is not None:
+            self._bytes -= artifact.size
+
+    def _paths(self, artifact_id: str) -> Tuple[str, str]:
+        return (os.path.join(self.disk_dir, f"{artifact_id}.json"),
+                os.path.join(self.disk_dir, f"{artifact_id}.bin"))
+
+    def _disk_files(self):
+        """磁盘层的音频文件 (ID, 大小, 修改时间)"""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                artifact_id = entry.name[:-5]
+                data_path = os.path.join(self.disk_dir, f"{artifact_id}.bin")
+                size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+                files.append((artifact_id, size + entry.stat().st_size, entry.stat().st_mtime))
+        return files
+
+    def _put_disk(self, artifact: AudioArtifact):
+        if artifact.size > self.disk_max_bytes:
+            return
+        meta_path, data_path = self._paths(artifact.id)
+        meta = json.dumps(artifact.meta(), ensure_ascii=False).encode("utf-8")
+        with self._disk_lock:
+            try:
+                # 先写音频再写元数据：读取方以元数据是否存在判断条目是否存在
+                if artifact.ready:
+                    self._write(data_path, artifact.data)
+                self._write(meta_path, meta)
+                self._disk_bytes += artifact.size + len(meta)
+                now = time.time()
+                if self._disk_bytes > self.disk_max_bytes or now - self._last_sweep > DISK_SWEEP_INTERVAL:
+                    self._last_sweep = now
+                    self._sweep_disk(now)
+            except OSError as e:
+                logger.warning(f"回复音频写入磁盘失败: {e}")
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_disk(self, artifact_id: str):
+        for path in self._paths(artifact_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _sweep_disk(self, now: float):
+        """删除过期的条目，总大小仍超过上限时按最近写入时间删除，直到降到上限的90%"""
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9
+        for artifact_id, size, mtime in files:
+            if mtime + self.ttl_seconds > now and total <= target:
+                continue
+            self._remove_disk(artifact_id)
+            total -= size
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes if self.disk_dir else None,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else None,
+                "ttl_seconds": self.ttl_seconds,
+                "created": self.created,
+                "served": self.served,
+                "expired": self.expired,
+                "not_found": self.not_found
+            }
@@ -0,0 +1,100 @@
+"""
+热路径上的音频缓冲区
+解码、VAD、ASR、TTS后处理之间统一传递一维、C连续的float32单声道数组（numpy数组，和采样率一起以元组传递）：
+- 已经符合约定的数组原样传递，不做类型转换和复制；切片、取声道和转tensor都是视图
+- 每个阶段最多产生一份新数据（重采样结果、拼接后的语音区间、合成的整段音频），
+  后续处理（如归一化）在这份数据上原地进行
+- 不在热路径上使用float64，也不为求峰值、缩放等操作分配与整段音频等长的临时数组
+"""
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+
+def is_canonical(audio: np.ndarray) -> bool:
+    """是否已经是一维、C连续的float32数组"""
+    return audio.ndim == 1 and audio.dtype == np.float32 and audio.flags.c_contiguous
+
+
+def first_channel(audio: np.ndarray) -> np.ndarray:
+    """多声道音频取第一个声道（视图），单声道原样返回"""
+    return audio[:, 0] if audio.ndim > 1 else audio
+
+
+def as_mono_float32(data) -> np.ndarray:
+    """
+    将音频（ndarray/tensor/list）转换为一维C连续float32，已经符合约定时不复制
+    CPU上的tensor与返回的数组共享内存；多声道取各声道的平均值（直接以float32累加，只分配一次）
+    """
+    if data is None:
+        raise ValueError("没有音频数据")
+    if isinstance(data, torch.Tensor):
+        data = data.detach().cpu().numpy()
+    elif not isinstance(data, np.ndarray):
+        data = np.asarray(data, dtype=np.float32)
+
+    if data.ndim > 1:
+        if data.shape[0] == 1 or data.shape[1] == 1:
+            data = data.reshape(-1)
+        else:
+            # 声道数远小于采样点数，较短的维度是声道
+            axis = 1 if data.shape[1] < data.shape[0] else 0
+            data = data.mean(axis=axis, dtype=np.float32)
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+def as_tensor(audio: np.ndarray) -> torch.Tensor:
+    """转换为float32 tensor，符合约定的数组与tensor共享内存"""
+    return torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+
+
+def peak(audio: np.ndarray) -> float:
+    """峰值绝对值（max/min各扫描一遍，不分配np.abs的临时数组）"""
+    if len(audio) == 0:
+        return 0.0
+    return float(max(audio.max(), -audio.min()))
+
+
+def normalize_peak_(audio: np.ndarray, limit: float = 1.0) -> np.ndarray:
+    """峰值超过limit时原地缩放到limit以内，返回同一个数组（只读数组先复制一次）"""
+    max_val = peak(audio)
+    if max_val > limit:
+        if not audio.flags.writeable:
+            audio = audio.copy()
+        audio *= np.float32(limit / max_val)
+    return audio
+
+
+def concat(chunks: Sequence[np.ndarray]) -> np.ndarray:
+    """拼接多段音频：只有一段时原样返回，否则分配一次并逐段写入"""
+    if len(chunks) == 1:
+        return chunks[0]
+    out = np.empty(sum(len(chunk) for chunk in chunks), dtype=np.float32)
+    offset = 0
+    for chunk in chunks:
+        out[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    return out
+
+
+def gather_segments(audio: np.ndarray, segments: Iterable[Tuple[int, int]]) -> np.ndarray:
+    """按 (起点, 终点) 下标取出各区间并拼接，只有一个区间时返回视图"""
+    views: List[np.ndarray] = [audio[start:end] for start, end in segments]
+    if not views:
+        return audio[:0]
+    return concat(views)
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """16位小端PCM转float32：转换时分配一次，缩放原地进行"""
+    audio = np.frombuffer(data, dtype="<i2", count=len(data) // 2).astype(np.float32)
+    audio *= np.float32(1.0 / 32768.0)
+    return audio
+
+
+def float32_to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """float32（[-1, 1]，超出部分截断）转16位小端PCM数组：截断时复制一次，缩放原地进行"""
+    scaled = np.clip(audio, -1.0, 1.0, dtype=np.float32)
+    scaled *= np.float32(32767.0)
+    return scaled.astype("<i2")
@@ -0,0 +1,255 @@
+"""
+回复音频的输出格式
+按请求的format参数或Accept头选择输出格式：WAV（16位PCM）、WAV（32位浮点）、Ogg/Opus、MP3、裸PCM，
+整段编码和分块流式编码共用同一套格式定义。编码是阻塞操作，由调用方放到线程池中执行；
+Opus只支持8/12/16/24/48kHz，其他采样率先重采样到支持的采样率。
+MP3（libsndfile 1.1起）和Opus取决于libsndfile的编译选项，当前环境不能编码的格式不参与协商
+"""
+import io
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from audio_stream import WAVE_FORMAT_IEEE_FLOAT, float_to_pcm16, wav_stream_header
+
+logger = logging.getLogger(__name__)
+
+# 重采样函数：(音频, 源采样率, 目标采样率) -> 音频
+Resampler = Callable[[np.ndarray, int, int], np.ndarray]
+
+
+class UnsupportedOutputFormatError(ValueError):
+    """请求了不支持的输出格式（接口返回400）"""
+
+
+class AudioFormat:
+    """一种输出格式：响应的Content-Type、文件扩展名和libsndfile的格式/子类型（裸PCM不经过libsndfile）"""
+
+    def __init__(self, name: str, media_type: str, extension: str, sf_format: Optional[str] = None,
+                 sf_subtype: Optional[str] = None, sample_rates: Optional[Sequence[int]] = None):
+        self.name = name
+        self.media_type = media_type
+        self.extension = extension
+        self.sf_format = sf_format
+        self.sf_subtype = sf_subtype
+        self.sample_rates = tuple(sample_rates) if sample_rates else None
+
+    def output_sample_rate(self, sample_rate: int) -> int:
+        """编码时使用的采样率：格式不支持原采样率时取不低于它的最小支持值"""
+        if self.sample_rates is None or sample_rate in self.sample_rates:
+            return sample_rate
+        higher = [rate for rate in self.sample_rates if rate >= sample_rate]
+        return min(higher) if higher else max(self.sample_rates)
+
+    def content_type(self, sample_rate: int) -> str:
+        if self.name == "pcm":
+            return f"audio/L16; rate={sample_rate}; channels=1"
+        return self.media_type
+
+    def filename(self, stem: str) -> str:
+        return f"{stem}.{self.extension}"
+
+
+FORMATS: Dict[str, AudioFormat] = {
+    "wav": AudioFormat("wav", "audio/wav", "wav", "WAV", "PCM_16"),
+    "wav-float": AudioFormat("wav-float", "audio/wav", "wav", "WAV", "FLOAT"),
+    "opus": AudioFormat("opus", "audio/ogg; codecs=opus", "ogg", "OGG", "OPUS",
+                        sample_rates=(8000, 12000, 16000, 24000, 48000)),
+    "mp3": AudioFormat("mp3", "audio/mpeg", "mp3", "MP3", "MPEG_LAYER_III"),
+    "pcm": AudioFormat("pcm", "audio/L16", "pcm"),
+}
+
+def can_encode(audio_format: AudioFormat) -> bool:
+    """当前libsndfile能否编码该格式（裸PCM不经过libsndfile）"""
+    if audio_format.sf_format is None:
+        return True
+    try:
+        return (audio_format.sf_format in sf.available_formats()
+                and audio_format.sf_subtype in sf.available_subtypes(audio_format.sf_format))
+    except Exception:
+        return False
+
+
+# 当前环境实际能编码的格式名
+ENCODABLE_FORMATS: List[str] = [name for name, audio_format in FORMATS.items() if can_encode(audio_format)]
+
+# 格式不可用时的退回格式（WAV由libsndfile内置支持）
+FALLBACK_FORMAT = "wav"
+
+# format参数的别名
+FORMAT_ALIASES = {"ogg": "opus", "wav16": "wav", "pcm16": "pcm", "mpeg": "mp3"}
+
+# Accept头中的媒体类型 -> 格式（32位浮点WAV只能通过format参数选择）
+ACCEPT_TYPES = {
+    "audio/wav": "wav", "audio/wave": "wav", "audio/x-wav": "wav", "audio/vnd.wave": "wav",
+    "audio/ogg": "opus", "audio/opus": "opus",
+    "audio/mpeg": "mp3", "audio/mp3": "mp3",
+    "audio/l16": "pcm", "audio/pcm": "pcm",
+}
+
+
+def get_format(name: str) -> AudioFormat:
+    key = name.strip().lower()
+    key = FORMAT_ALIASES.get(key, key)
+    if key not in FORMATS:
+        raise UnsupportedOutputFormatError(f"不支持的输出格式: {name}（支持 {', '.join(FORMATS)}）")
+    return FORMATS[key]
+
+
+def parse_accept(accept: str) -> List[Tuple[str, float]]:
+    """解析Accept头，返回按q值从高到低排列的 (媒体类型, q)，q相同时保持原顺序"""
+    entries = []
+    for part in accept.split(","):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        if not media_type:
+            continue
+        quality = 1.0
+        for field in fields[1:]:
+            if field.lower().startswith("q="):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        entries.append((media_type, quality))
+    return sorted(entries, key=lambda entry: -entry[1])
+
+
+def negotiate_format(format_name: Optional[str], accept: Optional[str], default: str) -> AudioFormat:
+    """
+    选择输出格式：format参数优先，其次是Accept头中q值最高的、当前环境能编码的音频类型，
+    Accept为空、是通配符或不含可用的音频类型时使用默认格式（默认格式不能编码时退回WAV）
+
+    Raises:
+        UnsupportedOutputFormatError: format参数不是已知格式，或当前环境不能编码该格式
+    """
+    if format_name:
+        audio_format = get_format(format_name)
+        if audio_format.name not in ENCODABLE_FORMATS:
+            raise UnsupportedOutputFormatError(
+                f"当前环境的libsndfile不支持编码{audio_format.name}格式（可用 {', '.join(ENCODABLE_FORMATS)}）"
+            )
+        return audio_format
+    for media_type, quality in parse_accept(accept or ""):
+        if quality <= 0:
+            continue
+        if media_type in ("*/*", "audio/*"):
+            break
+        if ACCEPT_TYPES.get(media_type) in ENCODABLE_FORMATS:
+            return FORMATS[ACCEPT_TYPES[media_type]]
+    audio_format = get_format(default)
+    if audio_format.name not in ENCODABLE_FORMATS:
+        return FORMATS[FALLBACK_FORMAT]
+    return audio_format
+
+
+def encode_audio(audio_data: np.ndarray, sample_rate: int, audio_format: AudioFormat,
+                 resample: Resampler) -> Tuple[bytes, int]:
+    """整段编码，返回 (编码后的字节, 实际采样率)"""
+    output_rate = audio_format.output_sample_rate(sample_rate)
+    if output_rate != sample_rate:
+        audio_data = resample(audio_data, sample_rate, output_rate)
+    if audio_format.sf_format is None:
+        return float_to_pcm16(audio_data), output_rate
+    audio_io = io.BytesIO()
+    sf.write(audio_io, audio_data, output_rate, format=audio_format.sf_format, subtype=audio_format.sf_subtype)
+    return audio_io.getvalue(), output_rate
+
+
+class _StreamSink:
+    """
+    libsndfile的写入目标：只保留尚未取走的字节
+    编码器关闭时可能回到文件开头改写（如MP3的LAME信息帧），已经发送的部分无法修改，直接丢弃
+    """
+
+    def __init__(self):
+        self._sent = 0  # 已取走的字节数（绝对偏移）
+        self._pending = bytearray()
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        start = self._position - self._sent
+        self._position += len(data)
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        end = start + len(data)
+        if end > len(self._pending):
+            self._pending.extend(b"\0" * (end - len(self._pending)))
+        self._pending[start:end] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += self._sent + len(self._pending)
+        self._position = offset
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        return b""
+
+    def take(self) -> bytes:
+        data = bytes(self._pending)
+        self._sent += len(self._pending)
+        self._pending.clear()
+        return data
+
+
+class StreamEncoder:
+    """
+    分块流式编码：每送入一块float32音频返回可以立即发送的字节，结束时调用finish取出剩余字节
+    WAV输出长度未定的文件头（见audio_stream），Opus/MP3由libsndfile增量编码
+    （Ogg页约每秒输出一次，MP3按帧输出）
+
+    MP3编码器先写一个全零的占位帧，关闭时才回填Xing/Info信息；流式输出时占位帧已经发出，
+    保持为一个静音帧，其余帧是完整的MP3流（没有信息帧时播放器按码率估算时长）
+    """
+
+    def __init__(self, audio_format: AudioFormat, sample_rate: int, resample: Resampler):
+        self.audio_format = audio_format
+        self.input_rate = sample_rate
+        self.sample_rate = audio_format.output_sample_rate(sample_rate)
+        self.resample = resample
+        self._header_sent = False
+        self._sink = None
+        self._file = None
+        if audio_format.sf_format is not None and audio_format.sf_format != "WAV":
+            self._sink = _StreamSink()
+            self._file = sf.SoundFile(self._sink, mode="w", samplerate=self.sample_rate, channels=1,
+                                      format=audio_format.sf_format, subtype=audio_format.sf_subtype)
+
+    def encode(self, chunk: np.ndarray) -> bytes:
+        if self.sample_rate != self.input_rate:
+            # 逐块重采样，块边界处有轻微失真（只在格式不支持模型采样率时发生）
+            chunk = self.resample(chunk, self.input_rate, self.sample_rate)
+        if self._file is not None:
+            self._file.write(chunk)
+            return self._sink.take()
+
+        if self.audio_format.sf_subtype == "FLOAT":
+            data = np.asarray(chunk, dtype="<f4").tobytes()
+        else:
+            data = float_to_pcm16(chunk)
+        if self.audio_format.sf_format == "WAV" and not self._header_sent:
+            self._header_sent = True
+            if self.audio_format.sf_subtype == "FLOAT":
+                header = wav_stream_header(self.sample_rate, bits_per_sample=32, format_tag=WAVE_FORMAT_IEEE_FLOAT)
+            else:
+                header = wav_stream_header(self.sample_rate)
+            return header + data
+        return data
+
+    def finish(self) -> bytes:
+        if self._file is None:
+            return b""
+        self._file.close()
+        self._file = None
+        return self._sink.take()
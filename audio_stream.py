@@ -0,0 +1,33 @@
+"""
+分块音频输出
+流式WAV：文件头中的长度字段写为0xFFFFFFFF（长度未知），之后直接追加16位PCM数据块
+"""
+import struct
+
+import numpy as np
+
+from audio_buffer import float32_to_pcm16
+
+# 长度未知时RIFF/data块使用的长度值，浏览器和常见播放器都会读到流结束为止
+UNKNOWN_LENGTH = 0xFFFFFFFF
+
+# fmt块中的格式编号
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+
+def wav_stream_header(sample_rate: int, channels: int = 1, bits_per_sample: int = 16,
+                      format_tag: int = WAVE_FORMAT_PCM) -> bytes:
+    """生成长度未定的WAV文件头（默认16位PCM，format_tag=WAVE_FORMAT_IEEE_FLOAT时为32位浮点）"""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b"RIFF" + struct.pack("<I", UNKNOWN_LENGTH) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, format_tag, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b"data" + struct.pack("<I", UNKNOWN_LENGTH)
+    )
+
+
+def float_to_pcm16(audio_data: np.ndarray) -> bytes:
+    """float32音频（[-1, 1]，超出部分截断）转换为小端16位PCM字节"""
+    return float32_to_pcm16(audio_data).tobytes()
@@ -0,0 +1,269 @@
+"""
+上传音频的流式解码与大小限制
+上传的压缩音频（Ogg/Opus、FLAC、MP3、WAV）由libsndfile逐块解码，每块只取单声道float32写入结果数组，
+不在内存中保留完整的上传字节和多声道解码结果；libsndfile不支持的容器（WebM/Matroska、MP4/M4A）
+在安装了ffmpeg时通过管道流式解码，由ffmpeg直接输出16000Hz单声道float32。
+UploadLimitMiddleware在接收请求体的过程中累计字节数，超过上限立即返回413，不必等整个上传结束；
+压缩音频解码后可能比上传大上百倍，解码时另按时长限制：分配数组前检查文件头中的帧数，
+解码过程中检查已输出的采样数，超过上限立即停止（接口返回413）
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from typing import BinaryIO, List, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖：ffmpeg可执行文件（WebM/MP4容器需要）
+FFMPEG_PATH = shutil.which("ffmpeg")
+
+# 只能由ffmpeg解码的容器
+FFMPEG_CONTAINERS = ("webm", "mp4")
+
+# 每次解码/读取的块大小
+DECODE_BLOCK_FRAMES = 16384
+PIPE_CHUNK_BYTES = 64 * 1024
+
+
+class UnsupportedAudioError(ValueError):
+    """上传的音频格式不受支持或无法解码（接口返回415）"""
+
+
+class AudioTooLongError(ValueError):
+    """解码后的音频超过时长上限（接口返回413）"""
+
+    def __init__(self, max_seconds: float):
+        super().__init__(f"上传的音频超过时长上限（{max_seconds:g}秒）")
+        self.max_seconds = max_seconds
+
+
+def max_samples(max_seconds: float, sample_rate: int) -> Optional[int]:
+    """时长上限对应的采样数，max_seconds<=0表示不限制"""
+    return int(max_seconds * sample_rate) if max_seconds > 0 else None
+
+
+def sniff_container(head: bytes) -> str:
+    """根据文件头判断容器格式：webm/mp4/ogg/flac/wav/mp3，无法判断时返回unknown"""
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head.startswith(b"RIFF") or head.startswith(b"RF64"):
+        return "wav"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return "unknown"
+
+
+def check_extension(filename: Optional[str], supported: Sequence[str]):
+    """文件名带扩展名时检查是否在支持列表中（浏览器上传的Blob可能没有扩展名，此时按内容判断）"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension and extension not in supported:
+        raise UnsupportedAudioError(f"不支持的音频格式: {extension}（支持 {', '.join(supported)}）")
+
+
+def decode_with_soundfile(source: BinaryIO, max_seconds: float = 0) -> Tuple[np.ndarray, int]:
+    """
+    libsndfile逐块解码，每块只取第一个声道，返回 (float32单声道, 原始采样率)
+    帧数已知时直接写入预先分配的数组，不保留块列表，也不需要最后再拼接一次
+
+    Raises:
+        AudioTooLongError: 文件头中的帧数或实际解码出的帧数超过max_seconds（帧数由客户端控制，分配前先检查）
+    """
+    with sf.SoundFile(source) as f:
+        sample_rate = f.samplerate
+        limit = max_samples(max_seconds, sample_rate)
+        if limit is not None and f.frames > limit:
+            raise AudioTooLongError(max_seconds)
+        audio = np.empty(max(f.frames, 0), dtype=np.float32)
+        filled = 0
+        decoded = 0
+        overflow: List[np.ndarray] = []  # 帧数是估计值（如部分MP3）时多出来的部分
+        for block in f.blocks(blocksize=DECODE_BLOCK_FRAMES, dtype="float32", always_2d=True):
+            decoded += len(block)
+            if limit is not None and decoded > limit:
+                raise AudioTooLongError(max_seconds)
+            count = min(len(block), len(audio) - filled)
+            audio[filled:filled + count] = block[:count, 0]
+            filled += count
+            if count < len(block):
+                overflow.append(np.ascontiguousarray(block[count:, 0]))
+    if overflow:
+        return np.concatenate([audio[:filled]] + overflow), sample_rate
+    return audio[:filled], sample_rate
+
+
+def decode_with_ffmpeg(source: BinaryIO, target_sr: int, max_seconds: float = 0) -> np.ndarray:
+    """
+    ffmpeg管道解码：上传内容分块写入stdin，从stdout读取重采样好的单声道float32
+
+    Raises:
+        AudioTooLongError: 输出超过max_seconds，此时立即结束ffmpeg
+    """
+    process = subprocess.Popen(
+        [FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "f32le", "-ac", "1", "-ar", str(target_sr), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+    def feed():
+        try:
+            while True:
+                chunk = source.read(PIPE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                process.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            pass  # ffmpeg提前退出，错误信息从stderr读取
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    # stderr由单独的线程读取，避免管道写满导致ffmpeg阻塞
+    stderr_chunks: List[bytes] = []
+    feeder = threading.Thread(target=feed, daemon=True)
+    drainer = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    feeder.start()
+    drainer.start()
+
+    limit = max_samples(max_seconds, target_sr)
+    max_bytes = limit * 4 if limit is not None else None
+    output = bytearray()
+    too_long = False
+    while True:
+        chunk = process.stdout.read(PIPE_CHUNK_BYTES)
+        if not chunk:
+            break
+        output.extend(chunk)
+        if max_bytes is not None and len(output) > max_bytes:
+            too_long = True
+            process.kill()
+            break
+    process.wait()
+    feeder.join()
+    drainer.join()
+    if too_long:
+        raise AudioTooLongError(max_seconds)
+    if process.returncode != 0:
+        message = b"".join(stderr_chunks).decode("utf-8", "replace").strip()
+        raise UnsupportedAudioError(f"ffmpeg无法解码上传的音频: {message or process.returncode}")
+    # 按整数个采样截取，frombuffer不复制数据
+    usable = len(output) - len(output) % 4
+    return np.frombuffer(output, dtype=np.float32, count=usable // 4)
+
+
+def decode_audio_file(source: BinaryIO, target_sr: int, max_seconds: float = 0) -> Tuple[np.ndarray, int]:
+    """
+    解码上传的音频文件对象（需要支持seek），返回 (float32单声道, 采样率)
+    ffmpeg解码时直接输出target_sr，libsndfile解码时返回原始采样率，由调用方重采样
+    max_seconds>0时解码后的时长超过上限即停止并抛出AudioTooLongError
+    """
+    head = source.read(16)
+    source.seek(0)
+    container = sniff_container(head)
+
+    if container not in FFMPEG_CONTAINERS:
+        try:
+            return decode_with_soundfile(source, max_seconds)
+        except sf.LibsndfileError as e:
+            if FFMPEG_PATH is None:
+                raise UnsupportedAudioError(f"无法解码上传的音频: {e.error_string}")
+            logger.info(f"libsndfile无法解码（{e.error_string}），改用ffmpeg")
+            source.seek(0)
+
+    if FFMPEG_PATH is None:
+        raise UnsupportedAudioError(f"解码{container}格式需要安装ffmpeg，或上传Ogg/Opus、FLAC、MP3、WAV")
+    return decode_with_ffmpeg(source, target_sr, max_seconds), target_sr
+
+
+def decodable_formats(supported: Sequence[str]) -> List[str]:
+    """当前环境实际能解码的扩展名（没有ffmpeg时去掉WebM和MP4类容器）"""
+    if FFMPEG_PATH is not None:
+        return list(supported)
+    return [ext for ext in supported if ext not in (".webm", ".m4a", ".mp4")]
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI中间件：限制multipart上传的请求体大小
+    Content-Length超过上限时直接返回413；分块上传（没有Content-Length）时边接收边计数，
+    超过上限后对处理函数模拟客户端断开，丢弃它的响应并返回413
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _applies(self, scope) -> bool:
+        if scope["type"] != "http":
+            return False
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                return value.lower().startswith(b"multipart/form-data")
+        return False
+
+    async def _reject(self, send):
+        body = json.dumps(
+            {"detail": f"上传的音频超过大小限制（{self.max_bytes // (1024 * 1024)}MB）"},
+            ensure_ascii=False
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(send)
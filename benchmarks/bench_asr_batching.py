@@ -0,0 +1,106 @@
+"""
+ASR微批处理基准测试
+同样的并发识别请求，分别在逐段识别和微批处理两种方式下运行，对比吞吐量和p50/p95延迟
+
+假模型默认模拟非流式模型（每次调用固定开销 + 一批音频并行计算）；
+真实模型需要设置支持批量推理的ASR_MODEL_NAME（如paraformer-zh），流式模型不会合批
+
+用法: python benchmarks/bench_asr_batching.py [--concurrency 1 4 8] [--requests 64] [--models fake|real]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+
+def load_app(args):
+    import app
+
+    if args.models == "fake":
+        from fake_models import FakeASR
+        app.asr_model = FakeASR(rtf=args.asr_rtf, streaming=False, call_overhead=args.call_overhead_ms / 1000)
+    else:
+        app.init_asr_model()
+    if not app.asr_supports_batch():
+        print("警告: 当前ASR模型不支持批量推理，微批处理不会生效")
+    return app
+
+
+def make_utterance(seconds: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * 16000)) * 0.05).astype(np.float32)
+
+
+async def run_load(app, utterances, concurrency: int) -> dict:
+    """以固定并发数发出所有识别请求，返回吞吐量和延迟分位数"""
+    latencies = []
+    queue = list(utterances)
+
+    async def worker():
+        while queue:
+            audio = queue.pop()
+            start = time.perf_counter()
+            await app.transcribe(audio, 16000)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p95": float(np.percentile(latencies_ms, 95))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR微批处理基准测试")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=3.0, help="每段音频时长")
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--asr-rtf", type=float, default=0.02, help="假ASR模型的实时率")
+    parser.add_argument("--call-overhead-ms", type=float, default=30.0, help="假ASR模型每次调用的固定开销")
+    args = parser.parse_args()
+
+    app = load_app(args)
+    logging.getLogger().setLevel(logging.WARNING)
+    batcher = app.asr_batcher
+    if batcher is None:
+        from micro_batcher import MicroBatcher
+        batcher = MicroBatcher(
+            "asr", lambda batch: app.run_stage("asr", app.recognize_batch, batch),
+            max_batch_size=app.config.ASR_BATCH_MAX_SIZE, max_wait_ms=app.config.ASR_BATCH_MAX_WAIT_MS,
+            max_concurrent_batches=app.config.SCHEDULER_ASR_WORKERS, max_pending=args.requests
+        )
+    utterances = [make_utterance(args.seconds, i) for i in range(args.requests)]
+
+    print(f"音频 {args.seconds}秒 x {args.requests}段，批大小上限 {batcher.max_batch_size}，"
+          f"组批等待 {batcher.max_wait * 1000:.1f}ms")
+    print(f"{'并发':>4} | {'方式':<6} | {'吞吐(段/秒)':>10} | {'p50(ms)':>9} | {'p95(ms)':>9}")
+    print("-" * 52)
+
+    # 调度器的信号量绑定事件循环，所有测试在同一个事件循环中运行
+    async def run_all():
+        for concurrency in args.concurrency:
+            for label, current in (("逐段", None), ("微批", batcher)):
+                app.asr_batcher = current
+                result = await run_load(app, utterances, concurrency)
+                print(f"{concurrency:>4} | {label:<6} | {result['throughput']:>10.1f} | "
+                      f"{result['p50']:>9.1f} | {result['p95']:>9.1f}")
+
+    asyncio.run(run_all())
+    print(f"\n微批统计: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
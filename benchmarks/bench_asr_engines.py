@@ -0,0 +1,105 @@
+"""
+ASR识别引擎基准测试
+同一组录音（voice.wav整段循环拼接1/4/8次）分别用流式引擎（600ms分块 + look-back）和
+离线引擎（非流式Paraformer一次识别整段）识别，对比实时率（RTF = 识别耗时 / 音频时长）；
+真实模型时同时按参考文本（TTS_PROMPT_TEXT）计算字错误率（CER）
+
+假模型模拟两种识别方式的调用模式：流式引擎每个分块调用一次模型（每次固定开销 + 按时长计算），
+离线引擎整段调用一次；真实模型需要安装funasr并能加载ASR_MODEL_NAME和ASR_OFFLINE_MODEL_NAME
+
+用法: python benchmarks/bench_asr_engines.py [--repeats 1 4 8] [--runs 3] [--models fake|real]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import soundfile as sf
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from asr_engine import ENGINE_NAMES
+
+# 比较时忽略标点和空白
+_IGNORED = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def load_app(args):
+    import app
+
+    if args.models == "fake":
+        from fake_models import FakeASR
+        overhead = args.call_overhead_ms / 1000
+        app.asr_model = FakeASR(rtf=args.streaming_rtf, call_overhead=overhead)
+        app.asr_offline_model = FakeASR(rtf=args.offline_rtf, streaming=False, call_overhead=overhead)
+    else:
+        app.init_asr_model()
+        app.init_asr_offline_model()
+    return app
+
+
+def reference_text(prompt_text: str) -> str:
+    """参考音频对应的文本（去掉CosyVoice提示词前缀）"""
+    return prompt_text.split("<|endofprompt|>")[-1]
+
+
+def char_error_rate(reference: str, hypothesis: str) -> float:
+    """字错误率：忽略标点和空白后的编辑距离 / 参考文本字数"""
+    ref = _IGNORED.sub("", reference.lower())
+    hyp = _IGNORED.sub("", hypothesis.lower())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_char in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_char in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_char != hyp_char))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR识别引擎基准测试")
+    parser.add_argument("--repeats", type=int, nargs="+", default=[1, 4, 8], help="voice.wav循环拼接的次数")
+    parser.add_argument("--runs", type=int, default=3, help="每个引擎每段录音识别的次数")
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--streaming-rtf", type=float, default=0.05, help="假流式模型的实时率")
+    parser.add_argument("--offline-rtf", type=float, default=0.02, help="假离线模型的实时率")
+    parser.add_argument("--call-overhead-ms", type=float, default=15.0, help="假模型每次调用的固定开销")
+    args = parser.parse_args()
+
+    app = load_app(args)
+    logging.getLogger().setLevel(logging.WARNING)
+    engines = [name for name in ENGINE_NAMES if app.get_asr_engine(name) is not None]
+
+    voice, sample_rate = sf.read(app.config.TTS_REF_AUDIO, dtype="float32", always_2d=True)
+    clip = app.resample_audio(voice[:, 0], sample_rate, app.CANONICAL_SAMPLE_RATE)
+    reference = reference_text(app.config.TTS_PROMPT_TEXT)
+
+    print(f"录音: {app.config.TTS_REF_AUDIO}（{len(clip) / app.CANONICAL_SAMPLE_RATE:.1f}秒），引擎: {', '.join(engines)}")
+    print(f"{'时长(s)':>7} | {'引擎':<9} | {'耗时(ms)':>9} | {'RTF':>7} | {'CER':>6} | 识别结果")
+    print("-" * 80)
+    for repeat in args.repeats:
+        audio = np.tile(clip, repeat)
+        duration = len(audio) / app.CANONICAL_SAMPLE_RATE
+        for engine in engines:
+            app.transcribe_audio(audio[:app.CANONICAL_SAMPLE_RATE], app.CANONICAL_SAMPLE_RATE, engine)  # 预热
+            elapsed = []
+            text = ""
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                text = app.transcribe_audio(audio, app.CANONICAL_SAMPLE_RATE, engine)
+                elapsed.append(time.perf_counter() - start)
+            seconds = float(np.mean(elapsed))
+            cer = f"{char_error_rate(reference * repeat, text):>6.1%}" if args.models == "real" else f"{'-':>6}"
+            preview = text if len(text) <= 24 else text[:24] + "…"
+            print(f"{duration:>7.1f} | {engine:<9} | {seconds * 1000:>9.1f} | {seconds / duration:>7.4f} | {cer} | {preview}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+回复音频存储（audio_url）基准测试
+在进程内启动服务（假模型 + 本地LLM桩服务），比较客户端拿到回复音频的几种方式：
+- complete+tts：/api/complete 后再调用 /api/audio/tts 合成一遍（没有audio_url时的做法）
+- complete+url：/api/complete 后按返回的audio_url获取（复用已合成的音频）
+- chat：/api/chat 只要文本，不获取audio_url（延迟合成，不产生TTS开销）
+- chat+url：/api/chat 后按audio_url获取（第一次获取时才合成）
+统计每种方式的端到端延迟和TTS实际合成次数；TTS输出缓存默认关闭，以免重复合成被缓存掩盖。
+
+另外检查audio_url的HTTP语义：HEAD、Range（206/416）、If-None-Match（304）、If-Range、
+延迟条目的HEAD不触发合成（202）、同一延迟条目的并发获取只合成一次、过期后404
+
+用法:
+    python benchmarks/bench_audio_artifacts.py
+    python benchmarks/bench_audio_artifacts.py --requests 20 --disk
+"""
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import percentiles, setup_app, start_server
+from bench_workers import free_port
+from stub_llm import StubServer
+
+FLOWS = ["complete+tts", "complete+url", "chat", "chat+url"]
+
+
+def count_synthesis(app_module) -> list:
+    """统计假TTS模型的合成次数（返回可变计数器）"""
+    counter = [0]
+    inference = app_module.tts_model.inference_zero_shot
+
+    def counted(*args, **kwargs):
+        counter[0] += 1
+        return inference(*args, **kwargs)
+
+    app_module.tts_model.inference_zero_shot = counted
+    return counter
+
+
+async def run_flow(client, flow: str, wav: bytes) -> int:
+    """执行一次流程，返回拿到的音频字节数"""
+    if flow.startswith("complete"):
+        resp = await client.post("/api/complete", files={"audio": ("voice.wav", wav, "audio/wav")})
+        resp.raise_for_status()
+        body = resp.json()
+        if flow == "complete+tts":
+            audio = await client.post("/api/audio/tts", json={"text": body["ai_reply"]})
+        else:
+            audio = await client.get(body["audio_url"])
+        audio.raise_for_status()
+        return len(audio.content)
+
+    resp = await client.post("/api/chat", json={"text": "今天有点累，想听你说说话"})
+    resp.raise_for_status()
+    if flow == "chat":
+        return 0
+    audio = await client.get(resp.json()["audio_url"])
+    audio.raise_for_status()
+    return len(audio.content)
+
+
+async def measure(base_url: str, flow: str, requests: int, wav: bytes, counter: list) -> dict:
+    import httpx
+
+    latencies = []
+    before = counter[0]
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            await run_flow(client, flow, wav)
+            latencies.append(time.perf_counter() - start)
+    return {"flow": flow, "latency": percentiles(latencies), "synthesis": (counter[0] - before) / requests}
+
+
+async def check_http(base_url: str, app_module, counter: list) -> list:
+    """audio_url的HTTP语义检查，返回 (检查项, 是否通过, 说明)"""
+    import httpx
+
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        url = (await client.post("/api/chat", json={"text": "你好呀"})).json()["audio_url"]
+        full = await client.get(url)
+        data, etag = full.content, full.headers["etag"]
+        results.append(("GET 200", full.status_code == 200 and full.headers["accept-ranges"] == "bytes",
+                        f"{len(data)}字节 {full.headers['content-type']}"))
+
+        head = await client.head(url)
+        results.append(("HEAD", head.status_code == 200 and head.headers["content-length"] == str(len(data))
+                        and not head.content, f"Content-Length {head.headers.get('content-length')}"))
+
+        part = await client.get(url, headers={"Range": "bytes=100-199"})
+        results.append(("Range bytes=100-199", part.status_code == 206 and part.content == data[100:200]
+                        and part.headers["content-range"] == f"bytes 100-199/{len(data)}",
+                        f"{part.status_code} {part.headers.get('content-range')}"))
+
+        tail = await client.get(url, headers={"Range": "bytes=-50"})
+        results.append(("Range bytes=-50", tail.status_code == 206 and tail.content == data[-50:],
+                        f"{tail.status_code} {tail.headers.get('content-range')}"))
+
+        bad = await client.get(url, headers={"Range": f"bytes={len(data)}-"})
+        results.append(("Range超出长度", bad.status_code == 416, f"{bad.status_code} {bad.headers.get('content-range')}"))
+
+        cached = await client.get(url, headers={"If-None-Match": etag})
+        results.append(("If-None-Match", cached.status_code == 304 and not cached.content, str(cached.status_code)))
+
+        stale = await client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        results.append(("If-Range不一致", stale.status_code == 200 and stale.content == data, str(stale.status_code)))
+
+        # 延迟条目的并发获取只合成一次
+        url_pending = (await client.post("/api/chat", json={"text": "给我讲个简短的笑话吧"})).json()["audio_url"]
+        before = counter[0]
+        probe = await client.head(url_pending)
+        results.append(("HEAD延迟条目", probe.status_code == 202 and counter[0] == before,
+                        f"{probe.status_code}，合成 {counter[0] - before} 次"))
+        fetched = await asyncio.gather(*(client.get(url_pending) for _ in range(4)))
+        results.append(("并发获取延迟条目", all(r.content == fetched[0].content for r in fetched) and counter[0] - before == 1,
+                        f"合成 {counter[0] - before} 次"))
+
+        missing = await client.get("/api/audio/artifacts/" + "x" * 24)
+        results.append(("不存在的ID", missing.status_code == 404, str(missing.status_code)))
+
+        # 有效期1秒的条目（内存层和磁盘层都按条目的过期时间判断）
+        store = app_module.artifact_store
+        ttl, store.ttl_seconds = store.ttl_seconds, 1
+        url_short = (await client.post("/api/chat", json={"text": "你好呀"})).json()["audio_url"]
+        store.ttl_seconds = ttl
+        fresh = await client.get(url_short)
+        await asyncio.sleep(1.1)
+        expired = await client.get(url_short)
+        results.append(("过期", fresh.status_code == 200 and expired.status_code == 404,
+                        f"{fresh.status_code} -> {expired.status_code}"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回复音频存储（audio_url）基准测试")
+    parser.add_argument("--requests", type=int, default=10, help="每种方式的请求数（顺序发送）")
+    parser.add_argument("--tts-rtf", type=float, default=0.3)
+    parser.add_argument("--asr-rtf", type=float, default=0.05)
+    parser.add_argument("--llm-delay-ms", type=float, default=100.0)
+    parser.add_argument("--disk", action="store_true", help="开启回复音频存储的磁盘层（临时目录）")
+    parser.add_argument("--tts-cache", action="store_true", help="开启TTS输出缓存（默认关闭）")
+    args = parser.parse_args()
+
+    disk_dir = tempfile.mkdtemp(prefix="bench_artifacts_") if args.disk else ""
+    os.environ["AUDIO_ARTIFACT_DIR"] = disk_dir
+    os.environ["TTS_CACHE_ENABLED"] = str(args.tts_cache)
+    import soundfile as sf
+    voice, sample_rate = sf.read(os.path.join(ROOT_DIR, "voice.wav"), dtype="float32")
+    buffer = io.BytesIO()
+    sf.write(buffer, voice, sample_rate, format="WAV", subtype="PCM_16")
+    wav = buffer.getvalue()
+
+    llm_port = free_port()
+    try:
+        with StubServer(llm_port, args.llm_delay_ms) as stub:
+            app_module = setup_app(SimpleNamespace(models="fake", asr_rtf=args.asr_rtf, tts_rtf=args.tts_rtf),
+                                   stub.url)
+            counter = count_synthesis(app_module)
+            port = free_port()
+            server, thread = start_server(app_module, port)
+            base_url = f"http://127.0.0.1:{port}"
+
+            print(f"TTS RTF {args.tts_rtf}，LLM延迟 {args.llm_delay_ms:.0f}ms，"
+                  f"磁盘层 {'开启' if args.disk else '关闭'}，TTS输出缓存 {'开启' if args.tts_cache else '关闭'}")
+            print(f"{'方式':<14} | {'p50(ms)':>9} | {'p95(ms)':>9} | 每次合成次数")
+            print("-" * 52)
+            for flow in FLOWS:
+                r = asyncio.run(measure(base_url, flow, args.requests, wav, counter))
+                print(f"{r['flow']:<14} | {r['latency']['p50']:>9.1f} | {r['latency']['p95']:>9.1f} | {r['synthesis']:.2f}")
+
+            print("\nHTTP语义检查")
+            for name, ok, detail in asyncio.run(check_http(base_url, app_module, counter)):
+                print(f"  {'通过' if ok else '失败'}  {name:<16} {detail}")
+            print(f"\n存储统计: {app_module.artifact_store.stats()}")
+            server.should_exit = True
+            thread.join()
+    finally:
+        if disk_dir:
+            shutil.rmtree(disk_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
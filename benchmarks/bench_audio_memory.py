@@ -0,0 +1,161 @@
+"""
+音频热路径内存基准测试
+对60秒的输入分别运行各阶段的旧实现和audio_buffer约定下的新实现，对比峰值内存（tracemalloc，
+统计numpy的分配；torch的分配不计入，重采样和模型推理两种实现相同）和耗时：
+- 上传解码：sf.read默认解码为float64多声道再取声道、转float32 / 逐块解码为float32单声道
+- VAD区间拼接：np.concatenate复制所有语音区间 / 预分配一次写入，只有一个区间时返回视图
+- TTS后处理：逐段flatten、astype，拼接后np.abs求峰值、除法归一化 / 共享模型输出内存，原地归一化
+- PCM16编码：clip、乘法、astype各分配一次 / 截断时复制一次，缩放原地进行
+- WebSocket PCM解码：astype后除法 / astype后原地缩放
+
+用法: python benchmarks/bench_audio_memory.py [--duration 60] [--repeat 5]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+import torch
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from audio_buffer import as_mono_float32, concat, float32_to_pcm16, gather_segments, normalize_peak_, pcm16_to_float32
+from audio_upload import decode_audio_file
+from resampler import ResamplerPool
+
+UPLOAD_SAMPLE_RATE = 48000
+VAD_SAMPLE_RATE = 16000
+TTS_SAMPLE_RATE = 24000
+
+resampler_pool = ResamplerPool()
+
+
+# ==================== 旧实现 ====================
+def legacy_decode(data: bytes) -> np.ndarray:
+    audio, _ = sf.read(io.BytesIO(data))
+    if len(audio.shape) > 1:
+        audio = audio[:, 0]
+    return audio.astype(np.float32)
+
+
+def legacy_gather(audio: np.ndarray, segments) -> np.ndarray:
+    return np.concatenate([audio[start:end] for start, end in segments])
+
+
+def legacy_to_mono(audio_data) -> np.ndarray:
+    if isinstance(audio_data, torch.Tensor):
+        audio_data = audio_data.cpu().numpy()
+    if len(audio_data.shape) > 1:
+        audio_data = audio_data.flatten()
+    if audio_data.dtype != np.float32:
+        audio_data = audio_data.astype(np.float32)
+    return audio_data
+
+
+def legacy_tts_post(outputs) -> np.ndarray:
+    chunks = [legacy_to_mono(output) for output in outputs]
+    audio = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+    max_val = np.abs(audio).max()
+    if max_val > 1.0:
+        audio = audio / max_val
+    return audio
+
+
+def legacy_pcm16(audio: np.ndarray) -> bytes:
+    pcm = np.clip(audio, -1.0, 1.0) * 32767.0
+    return pcm.astype("<i2").tobytes()
+
+
+def legacy_pcm_to_float(data: bytes) -> np.ndarray:
+    return np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+# ==================== 新实现 ====================
+def buffer_decode(data: bytes) -> np.ndarray:
+    audio, _ = decode_audio_file(io.BytesIO(data), VAD_SAMPLE_RATE)
+    return audio
+
+
+def buffer_tts_post(outputs) -> np.ndarray:
+    return normalize_peak_(concat([as_mono_float32(output) for output in outputs]))
+
+
+def buffer_pcm16(audio: np.ndarray) -> bytes:
+    return float32_to_pcm16(audio).tobytes()
+
+
+# ==================== 测试数据 ====================
+def make_voice(duration: float, sample_rate: int) -> np.ndarray:
+    voice, voice_rate = sf.read(os.path.join(ROOT_DIR, "voice.wav"), dtype="float32", always_2d=True)
+    voice = resampler_pool.resample(voice[:, 0], voice_rate, sample_rate)
+    repeats = int(np.ceil(duration * sample_rate / len(voice)))
+    return np.tile(voice, repeats)[:int(duration * sample_rate)]
+
+
+def make_cases(duration: float):
+    """返回 [(阶段, 输入说明, 旧实现, 新实现)]，每个实现是无参函数"""
+    upload = make_voice(duration, UPLOAD_SAMPLE_RATE)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.stack([upload, upload], axis=1), UPLOAD_SAMPLE_RATE, format="WAV", subtype="PCM_16")
+    upload_wav = buffer.getvalue()
+
+    speech = make_voice(duration, VAD_SAMPLE_RATE)
+    one_segment = [(VAD_SAMPLE_RATE // 2, len(speech) - VAD_SAMPLE_RATE // 2)]
+    # 每2秒一个1.5秒的语音区间
+    many_segments = [(start, start + VAD_SAMPLE_RATE * 3 // 2) for start in range(0, len(speech), VAD_SAMPLE_RATE * 2)]
+
+    # CosyVoice按句输出 [1, 采样点] 的tensor，峰值略超过1时需要归一化
+    reply = make_voice(duration, TTS_SAMPLE_RATE) * 1.2
+    sentences = [torch.from_numpy(part.copy()).unsqueeze(0) for part in np.array_split(reply, 8)]
+
+    pcm = float32_to_pcm16(speech).tobytes()
+
+    return [
+        ("上传解码", "48kHz双声道WAV", lambda: legacy_decode(upload_wav), lambda: buffer_decode(upload_wav)),
+        ("VAD区间拼接", "1个区间", lambda: legacy_gather(speech, one_segment), lambda: gather_segments(speech, one_segment)),
+        ("VAD区间拼接", f"{len(many_segments)}个区间", lambda: legacy_gather(speech, many_segments),
+         lambda: gather_segments(speech, many_segments)),
+        ("TTS后处理", f"24kHz {len(sentences)}段", lambda: legacy_tts_post(sentences), lambda: buffer_tts_post(sentences)),
+        ("PCM16编码", "24kHz", lambda: legacy_pcm16(reply), lambda: buffer_pcm16(reply)),
+        ("PCM解码", "16kHz", lambda: legacy_pcm_to_float(pcm), lambda: pcm16_to_float32(pcm)),
+    ]
+
+
+def measure(func, repeat: int):
+    """返回 (平均耗时ms, 峰值内存MB)"""
+    func()  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频热路径内存基准测试")
+    parser.add_argument("--duration", type=float, default=60.0, help="输入音频时长（秒）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"输入: {args.duration}秒（16kHz float32单声道 = {args.duration * VAD_SAMPLE_RATE * 4 / 1024 / 1024:.2f}MB）")
+    print(f"{'阶段':<10} | {'输入':<14} | {'旧峰值(MB)':>10} | {'新峰值(MB)':>10} | {'旧(ms)':>8} | {'新(ms)':>8}")
+    print("-" * 76)
+    for stage, label, legacy, current in make_cases(args.duration):
+        legacy_ms, legacy_peak = measure(legacy, args.repeat)
+        current_ms, current_peak = measure(current, args.repeat)
+        print(f"{stage:<10} | {label:<14} | {legacy_peak:>10.2f} | {current_peak:>10.2f} | "
+              f"{legacy_ms:>8.2f} | {current_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+推理后端基准测试（torch / onnx / onnx-int8）
+每个后端在独立的子进程中加载（VAD_BACKEND/ASR_BACKEND环境变量），互不影响内存统计：
+- 加载耗时、加载后的RSS增量、峰值RSS
+- VAD：voice.wav循环拼接到指定时长后整段计算的耗时，以及流式按96ms分块计算的每块耗时
+- ASR：同一段音频的识别耗时和实时率（RTF）
+- 一致性：以torch后端为基准，VAD比较每帧概率的最大误差和按VAD_THRESHOLD判定的一致率，
+  ASR比较识别结果之间的字错误率（CER）；--check时超出容差或基准后端被跳过都以非零状态退出
+
+ASR的onnx后端需要安装funasr-onnx并能加载ONNX模型（或安装funasr从PyTorch模型导出），
+加载失败的后端标记为跳过
+
+用法:
+    python benchmarks/bench_inference_backends.py                       # VAD，三种后端
+    python benchmarks/bench_inference_backends.py --components vad asr_offline --check
+    python benchmarks/bench_inference_backends.py --threads 1 --duration 120
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+COMPONENTS = ["vad", "asr", "asr_offline"]
+STREAM_CHUNK_FRAMES = 3  # 流式VAD每次喂入的帧数（3 x 512采样点 = 96ms）
+
+
+def rss_mb():
+    """当前RSS和峰值RSS（MB）"""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+        return rss, rss
+
+
+def load_clip(app, duration: float) -> np.ndarray:
+    import soundfile as sf
+    voice, sample_rate = sf.read(app.config.TTS_REF_AUDIO, dtype="float32", always_2d=True)
+    clip = app.resample_audio(voice[:, 0], sample_rate, app.CANONICAL_SAMPLE_RATE)
+    samples = int(duration * app.CANONICAL_SAMPLE_RATE)
+    return np.tile(clip, int(np.ceil(samples / len(clip))))[:samples]
+
+
+def timed(func, runs: int):
+    """预热一次后运行runs次，返回 (平均耗时ms, 最后一次的结果)"""
+    result = func()
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    return (time.perf_counter() - start) / runs * 1000, result
+
+
+# ==================== 子进程 ====================
+def run_worker(args):
+    """在当前进程中加载一个后端并测量，结果以JSON输出到最后一行"""
+    import logging
+
+    import app
+    from vad_engine import VADStream
+
+    logging.getLogger().setLevel(logging.WARNING)
+    audio = load_clip(app, args.duration)
+    result = {"component": args.worker, "backend": args.backend}
+
+    rss_before, _ = rss_mb()
+    start = time.perf_counter()
+    if args.worker == "vad":
+        loaded = app.init_vad_model()
+    elif args.worker == "asr":
+        loaded = app.init_asr_model()
+    else:
+        loaded = app.init_asr_offline_model()
+    result["load_s"] = time.perf_counter() - start
+    result["loaded_backend"] = app.inference_backends.get(args.worker)
+    if not loaded or result["loaded_backend"] != args.backend:
+        result["skipped"] = "模型加载失败" if not loaded else f"退回了{result['loaded_backend']}后端"
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    result["load_rss_mb"] = rss_mb()[0] - rss_before
+
+    if args.worker == "vad":
+        engine = app.vad_engine
+        result["latency_ms"], probs = timed(lambda: engine.frame_probs(audio), args.runs)
+        np.save(args.output, probs)
+
+        chunk = STREAM_CHUNK_FRAMES * engine.frame_size
+        stream = VADStream(engine)
+        chunks = [audio[i:i + chunk] for i in range(0, len(audio) - chunk + 1, chunk)]
+        start = time.perf_counter()
+        for piece in chunks:
+            stream.feed(piece)
+        result["stream_chunk_ms"] = (time.perf_counter() - start) / len(chunks) * 1000
+    else:
+        engine = app.STREAMING if args.worker == "asr" else app.OFFLINE
+        result["latency_ms"], text = timed(
+            lambda: app.transcribe_audio(audio, app.CANONICAL_SAMPLE_RATE, engine), args.runs
+        )
+        result["rtf"] = result["latency_ms"] / 1000 / args.duration
+        result["text"] = text
+
+    result["peak_rss_mb"] = rss_mb()[1]
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def spawn_worker(component: str, backend: str, args, output: str) -> dict:
+    env = dict(os.environ, VAD_BACKEND=backend if component == "vad" else "torch",
+               ASR_BACKEND=backend if component != "vad" else "torch", PYTHONPATH=ROOT_DIR)
+    if args.threads is not None:
+        env["ONNX_INTRA_OP_THREADS"] = str(args.threads)
+    if args.cache_dir:
+        env["ONNX_CACHE_DIR"] = args.cache_dir
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", component, "--backend", backend,
+           "--duration", str(args.duration), "--runs", str(args.runs), "--output", output]
+    proc = subprocess.run(cmd, env=env, cwd=ROOT_DIR, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["无输出"]
+        return {"component": component, "backend": backend, "skipped": f"子进程失败: {tail[0]}"}
+    return json.loads(lines[-1])
+
+
+# ==================== 汇总 ====================
+def vad_parity(reference: np.ndarray, probs: np.ndarray, threshold: float):
+    """(最大概率误差, 语音/非语音判定一致率)"""
+    count = min(len(reference), len(probs))
+    diff = float(np.abs(reference[:count] - probs[:count]).max())
+    agreement = float(((reference[:count] >= threshold) == (probs[:count] >= threshold)).mean())
+    return diff, agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推理后端基准测试")
+    parser.add_argument("--components", nargs="+", choices=COMPONENTS, default=["vad"])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--duration", type=float, default=60.0, help="测试音频时长（voice.wav循环拼接）")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX_INTRA_OP_THREADS（默认使用配置）")
+    parser.add_argument("--cache-dir", default=None, help="int8量化模型的保存目录（默认ONNX_CACHE_DIR）")
+    parser.add_argument("--check", action="store_true", help="一致性超出容差或基准后端被跳过时以非零状态退出")
+    parser.add_argument("--min-agreement", type=float, default=0.99, help="VAD判定一致率下限")
+    parser.add_argument("--max-cer", type=float, default=0.05, help="ASR识别结果与torch后端的CER上限")
+    # 子进程参数
+    parser.add_argument("--worker", choices=COMPONENTS, help=argparse.SUPPRESS)
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    from bench_asr_engines import char_error_rate
+    from config import Config
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for component in args.components:
+            print(f"\n[{component}] {args.duration:.0f}秒音频，每个后端运行{args.runs}次")
+            print(f"{'后端':<10} | {'加载(s)':>7} | {'加载RSS(MB)':>11} | {'峰值RSS(MB)':>11} | "
+                  f"{'耗时(ms)':>9} | {'流式/RTF':>9} | 一致性")
+            print("-" * 96)
+            reference = None
+            for backend in args.backends:
+                output = os.path.join(tmp_dir, f"{component}_{backend}.npy")
+                result = spawn_worker(component, backend, args, output)
+                if "skipped" in result:
+                    print(f"{backend:<10} | 跳过: {result['skipped']}")
+                    if reference is None:
+                        # 基准后端（默认torch）不可用时，后面的后端只会互相比较，一致性检查不能算通过
+                        failures.append(f"{component}/{backend}: 基准后端跳过（{result['skipped']}）")
+                    continue
+
+                if component == "vad":
+                    probs = np.load(output)
+                    second = f"{result['stream_chunk_ms']:>7.3f}ms"
+                    if reference is None:
+                        reference, parity = probs, "基准"
+                    else:
+                        diff, agreement = vad_parity(reference, probs, Config.VAD_THRESHOLD)
+                        parity = f"最大误差 {diff:.2e}，判定一致 {agreement:.2%}"
+                        if agreement < args.min_agreement:
+                            failures.append(f"{component}/{backend}: 判定一致率 {agreement:.2%}")
+                else:
+                    second = f"{result['rtf']:>9.4f}"
+                    if reference is None:
+                        reference, parity = result["text"], "基准"
+                    else:
+                        cer = char_error_rate(reference, result["text"])
+                        parity = f"与基准CER {cer:.2%}"
+                        if cer > args.max_cer:
+                            failures.append(f"{component}/{backend}: CER {cer:.2%}")
+
+                print(f"{backend:<10} | {result['load_s']:>7.2f} | {result['load_rss_mb']:>11.1f} | "
+                      f"{result['peak_rss_mb']:>11.1f} | {result['latency_ms']:>9.1f} | {second:>9} | {parity}")
+
+    if failures:
+        print("\n一致性检查未通过:\n  " + "\n  ".join(failures))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
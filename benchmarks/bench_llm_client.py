@@ -0,0 +1,79 @@
+"""
+LLM客户端负载测试
+在本地OpenAI兼容桩服务上，对比旧实现（每次requests.post新建连接）与LLMClient连接池
+在高并发对话下的p50/p99延迟
+
+用法: python benchmarks/bench_llm_client.py [--concurrency 50] [--requests 500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient
+from stub_llm import StubServer
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "你好"}], "stream": False}
+
+
+async def run_load(call, concurrency: int, total: int) -> np.ndarray:
+    """以固定并发发送total个请求，返回每个请求的延迟（毫秒）"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return np.array(latencies)
+
+
+def report(name: str, latencies: np.ndarray, elapsed: float):
+    print(f"{name:<28} p50={np.percentile(latencies, 50):8.1f}ms  p99={np.percentile(latencies, 99):8.1f}ms  "
+          f"吞吐={len(latencies) / elapsed:7.1f} req/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="LLM客户端负载测试")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--delay-ms", type=float, default=50.0, help="桩服务的模拟推理延迟")
+    args = parser.parse_args()
+
+    with StubServer(args.port, args.delay_ms) as stub:
+        # 旧实现：每次调用requests.post（无Session），在线程中执行
+        def legacy_post():
+            requests.post(stub.url, json=PAYLOAD, headers={"Authorization": "Bearer stub"}, timeout=30).json()
+
+        async def legacy_call():
+            await asyncio.to_thread(legacy_post)
+
+        start = time.perf_counter()
+        latencies = await run_load(legacy_call, args.concurrency, args.requests)
+        report("requests.post（无连接池）", latencies, time.perf_counter() - start)
+
+        client = LLMClient(stub.url, "stub", max_connections=args.concurrency)
+        await client.start()
+
+        async def pooled_call():
+            (await client.post(PAYLOAD)).json()
+
+        await run_load(pooled_call, args.concurrency, args.concurrency)  # 预热连接池
+        start = time.perf_counter()
+        latencies = await run_load(pooled_call, args.concurrency, args.requests)
+        report("LLMClient（连接池）", latencies, time.perf_counter() - start)
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
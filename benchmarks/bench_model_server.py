@@ -0,0 +1,335 @@
+"""
+模型服务进程（拆分部署）基准测试
+同一组假模型分别以两种方式部署，测量上传识别接口（/api/audio/transcribe）的延迟：
+- inproc：单进程部署，VAD/ASR/TTS都在API进程中
+- split：MODEL_SERVER_ENABLED=True，ASR和TTS在各自的服务进程池中，API进程只有VAD和调度
+每种部署先测空闲时的识别延迟，再在后台持续发送TTS请求时测一次，比较TTS负载对识别延迟的影响。
+假模型的推理以纯Python循环占用CPU（持有GIL），模拟CosyVoice中计算密集的部分；
+拆分部署的收益来自多核并行，单核机器上两种部署的进程/线程仍然分时使用同一个核。
+
+split部署加上--crash时，压测后杀掉一个TTS服务进程，统计TTS恢复所需的时间和期间识别接口的失败数。
+另外单独测量把一段音频交给其他进程的开销：pickle后经socket发送 vs 写入共享内存只发送段名。
+
+用法:
+    python benchmarks/bench_model_server.py
+    python benchmarks/bench_model_server.py --tts-workers 2 --tts-load 4 --crash
+    python benchmarks/bench_model_server.py --deploy split --transfer-seconds 10 60 300
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import percentiles
+from bench_workers import free_port
+
+DEPLOYS = ["inproc", "split"]
+OPTIONS_ENV = "BENCH_MODEL_SERVER_OPTIONS"
+
+
+# ==================== 服务进程 ====================
+def fake_loaders(app, options: dict) -> dict:
+    """各模型的假加载函数（推理占用CPU）"""
+    from fake_models import EnergyVAD, FakeASR, FakeCosyVoice
+
+    def load_asr():
+        app.asr_model = FakeASR(rtf=options["asr_rtf"], cpu_bound=True)
+        return True
+
+    def load_asr_offline():
+        app.asr_offline_model = FakeASR(rtf=options["asr_rtf"], streaming=False, cpu_bound=True)
+        return True
+
+    def load_vad():
+        app.vad_model = app.vad_engine = EnergyVAD()
+        return True
+
+    def load_tts():
+        app.tts_model = FakeCosyVoice(rtf=options["tts_rtf"], cpu_bound=True)
+        return app.init_voice_prompt() or True
+
+    return {"asr": load_asr, "asr_offline": load_asr_offline, "vad": load_vad, "tts": load_tts}
+
+
+def use_fake_models(app, names):
+    loaders = fake_loaders(app, json.loads(os.environ[OPTIONS_ENV]))
+    for name in names:
+        if name in app.model_manager.models:
+            app.model_manager.models[name].loader = loaders[name]
+
+
+def setup_server(app, role):
+    """模型服务进程的初始化函数（ModelServerPool的setup）：加载假模型"""
+    use_fake_models(app, list(app.model_manager.models))
+
+
+def serve(args):
+    """以指定方式部署并在args.port上服务，直到收到SIGTERM"""
+    split = args.serve == "split"
+    socket_dir = tempfile.mkdtemp(prefix="bench_model_server_")
+    os.environ.update({
+        OPTIONS_ENV: json.dumps({"asr_rtf": args.asr_rtf, "tts_rtf": args.tts_rtf}),
+        "MODEL_SERVER_ENABLED": str(split),
+        "MODEL_SERVER_DIR": socket_dir,
+        "ASR_SERVER_WORKERS": str(args.asr_workers),
+        "TTS_SERVER_WORKERS": str(args.tts_workers),
+        "TTS_CACHE_ENABLED": "False",
+        "MODEL_WARMUP": "False",
+    })
+    pools = []
+    if split:
+        from model_server import ASR, TTS, ModelServerPool
+        pools = [ModelServerPool(ASR, args.asr_workers, socket_dir, setup="bench_model_server:setup_server"),
+                 ModelServerPool(TTS, args.tts_workers, socket_dir, setup="bench_model_server:setup_server")]
+        for pool in pools:
+            pool.start()
+
+    import uvicorn
+    import app
+
+    use_fake_models(app, ["vad"] if split else list(app.model_manager.models))
+    server = uvicorn.Server(uvicorn.Config(app.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    try:
+        server.run()
+    finally:
+        for pool in pools:
+            pool.stop()
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+# ==================== 测量 ====================
+def wait_ready(base: str, proc: subprocess.Popen, timeout: float):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务进程退出（状态 {proc.returncode}）")
+        try:
+            if httpx.get(f"{base}/api/health/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{timeout}秒内服务未就绪")
+
+
+async def measure_transcribe(client, wav: bytes, count: int) -> dict:
+    """依次发送count个识别请求"""
+    latencies, failures = [], 0
+    for _ in range(count):
+        start = time.perf_counter()
+        resp = await client.post("/api/audio/transcribe", files={"audio": ("voice.wav", wav, "audio/wav")})
+        if resp.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures += 1
+    return dict(percentiles(latencies), failures=failures)
+
+
+async def tts_load(client, stop: asyncio.Event, counter: dict):
+    """持续发送TTS请求直到stop"""
+    texts = ["你好，今天天气怎么样", "给我讲个简短的笑话吧", "晚安，明天见"]
+    index = 0
+    while not stop.is_set():
+        resp = await client.post("/api/audio/tts", json={"text": texts[index % len(texts)]})
+        counter["ok" if resp.status_code == 200 else "failed"] += 1
+        index += 1
+
+
+async def crash_tts_server(client, wav: bytes) -> dict:
+    """杀掉一个TTS服务进程，测量TTS恢复时间；期间持续发送识别请求，统计失败数"""
+    health = (await client.get("/api/health")).json()
+    pid = health["model_servers"]["tts"]["endpoints"][0]["pid"]
+    os.kill(pid, signal.SIGKILL)
+    killed_at = time.perf_counter()
+
+    recovered_at, tts_failures, asr = None, 0, {"ok": 0, "failed": 0}
+    while recovered_at is None and time.perf_counter() - killed_at < 60:
+        resp = await client.post("/api/audio/tts", json={"text": "你好"})
+        if resp.status_code == 200:
+            recovered_at = time.perf_counter()
+            break
+        tts_failures += 1
+        resp = await client.post("/api/audio/transcribe", files={"audio": ("voice.wav", wav, "audio/wav")})
+        asr["ok" if resp.status_code == 200 else "failed"] += 1
+        await asyncio.sleep(0.2)
+    return {
+        "recovery_s": round(recovered_at - killed_at, 2) if recovered_at else None,
+        "tts_failures": tts_failures,
+        "asr_ok": asr["ok"],
+        "asr_failed": asr["failed"],
+    }
+
+
+async def drive(base: str, args, wav: bytes, crash: bool) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+        await measure_transcribe(client, wav, 2)  # 预热
+        result = {"idle": await measure_transcribe(client, wav, args.requests)}
+
+        stop, counter = asyncio.Event(), {"ok": 0, "failed": 0}
+        load = [asyncio.ensure_future(tts_load(client, stop, counter)) for _ in range(args.tts_load)]
+        await asyncio.sleep(1.0)
+        result["loaded"] = await measure_transcribe(client, wav, args.requests)
+        stop.set()
+        await asyncio.gather(*load)
+        result["tts_requests"] = counter
+
+        if crash:
+            result["crash"] = await crash_tts_server(client, wav)
+    return result
+
+
+def run_deploy(deploy: str, args, wav: bytes) -> dict:
+    port = free_port()
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", deploy, "--port", str(port),
+           "--asr-rtf", str(args.asr_rtf), "--tts-rtf", str(args.tts_rtf),
+           "--asr-workers", str(args.asr_workers), "--tts-workers", str(args.tts_workers)]
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, env=dict(os.environ, PYTHONPATH=ROOT_DIR), cwd=ROOT_DIR,
+                            stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        try:
+            wait_ready(base, proc, args.timeout)
+        except (RuntimeError, TimeoutError):
+            log.seek(0)
+            print(log.read().decode(errors="replace")[-2000:], file=sys.stderr)
+            raise
+        return asyncio.run(drive(base, args, wav, args.crash and deploy == "split"))
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+
+
+# ==================== 进程间传递音频 ====================
+def echo_server(conn):
+    """传输测试的对端：收到音频（数组或共享内存描述）后返回采样点之和"""
+    from model_server import _close_shm, import_audio
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            return
+        if isinstance(message, dict):
+            shm, views = import_audio(message)
+            total = float(views[0].sum())
+            del views
+            _close_shm(shm)
+        else:
+            total = float(message.sum())
+        conn.send(total)
+
+
+def measure_transfer(seconds_list, runs: int) -> list:
+    """pickle发送 vs 共享内存：发送一段音频并等到对端读完的往返耗时"""
+    from multiprocessing import get_context
+    from model_server import _close_shm, export_audio
+
+    context = get_context("spawn")
+    parent, child = context.Pipe()
+    peer = context.Process(target=echo_server, args=(child,))
+    peer.start()
+    results = []
+    try:
+        for seconds in seconds_list:
+            audio = np.random.default_rng(0).standard_normal(int(seconds * 16000)).astype(np.float32)
+            timings = {}
+            for method in ("pickle", "shm"):
+                elapsed = []
+                for _ in range(runs + 1):
+                    start = time.perf_counter()
+                    if method == "pickle":
+                        parent.send(audio)
+                        parent.recv()
+                    else:
+                        shm, ref = export_audio([audio])
+                        parent.send(ref)
+                        parent.recv()
+                        _close_shm(shm, unlink=True)
+                    elapsed.append(time.perf_counter() - start)
+                timings[method] = float(np.median(elapsed[1:])) * 1000
+            results.append({"seconds": seconds, "mb": audio.nbytes / 1024 / 1024, **timings})
+    finally:
+        parent.send(None)
+        peer.join(10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型服务进程（拆分部署）基准测试")
+    parser.add_argument("--deploy", nargs="+", choices=DEPLOYS, default=DEPLOYS)
+    parser.add_argument("--asr-rtf", type=float, default=0.05, help="假ASR模型的实时率（占用CPU）")
+    parser.add_argument("--tts-rtf", type=float, default=0.3, help="假TTS模型的实时率（占用CPU）")
+    parser.add_argument("--asr-workers", type=int, default=1, help="split部署的ASR服务进程数")
+    parser.add_argument("--tts-workers", type=int, default=1, help="split部署的TTS服务进程数")
+    parser.add_argument("--tts-load", type=int, default=2, help="后台持续发送TTS请求的并发数")
+    parser.add_argument("--requests", type=int, default=20, help="每轮测量的识别请求数")
+    parser.add_argument("--crash", action="store_true", help="split部署压测后杀掉一个TTS服务进程")
+    parser.add_argument("--transfer-seconds", type=float, nargs="*", default=[10, 60],
+                        help="进程间传递音频测试的音频时长，为空时跳过")
+    parser.add_argument("--transfer-runs", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120, help="等待服务就绪的最长时间")
+    # 服务进程参数
+    parser.add_argument("--serve", choices=DEPLOYS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    import soundfile as sf
+    voice, sample_rate = sf.read(os.path.join(ROOT_DIR, "voice.wav"), dtype="float32")
+    buffer = io.BytesIO()
+    sf.write(buffer, voice, sample_rate, format="WAV", subtype="PCM_16")
+    wav = buffer.getvalue()
+
+    print(f"CPU核数 {os.cpu_count()}，TTS负载并发 {args.tts_load}，"
+          f"split部署 ASR {args.asr_workers} / TTS {args.tts_workers} 个服务进程")
+    print(f"{'部署':<8} | {'空闲p50':>8} | {'空闲p95':>8} | {'TTS负载p50':>10} | {'TTS负载p95':>10} | {'TTS完成':>7} | 失败")
+    print("-" * 78)
+    crash = None
+    for deploy in args.deploy:
+        r = run_deploy(deploy, args, wav)
+        idle, loaded = r["idle"], r["loaded"]
+        failures = idle["failures"] + loaded["failures"] + r["tts_requests"]["failed"]
+        print(f"{deploy:<8} | {idle.get('p50', 0):>8.1f} | {idle.get('p95', 0):>8.1f} | "
+              f"{loaded.get('p50', 0):>12.1f} | {loaded.get('p95', 0):>12.1f} | {r['tts_requests']['ok']:>9} | {failures}")
+        crash = r.get("crash", crash)
+    print("\n识别延迟单位ms（/api/audio/transcribe，voice.wav）")
+
+    if crash is not None:
+        recovery = f"{crash['recovery_s']}秒" if crash["recovery_s"] is not None else "60秒内未恢复"
+        print(f"\n杀掉TTS服务进程: TTS恢复用时 {recovery}（期间失败 {crash['tts_failures']} 次），"
+              f"同期识别请求 成功 {crash['asr_ok']} / 失败 {crash['asr_failed']}")
+
+    if args.transfer_seconds:
+        print(f"\n进程间传递音频（往返，中位数）")
+        print(f"{'时长(s)':>8} | {'大小(MB)':>8} | {'pickle(ms)':>10} | {'共享内存(ms)':>12}")
+        for r in measure_transfer(args.transfer_seconds, args.transfer_runs):
+            print(f"{r['seconds']:>8.0f} | {r['mb']:>8.2f} | {r['pickle']:>10.2f} | {r['shm']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+回复音频输出格式基准测试
+把一段24kHz的回复音频（由仓库中的voice.wav重采样得到）分别编码为各输出格式，
+对比响应大小、整段编码耗时，以及流式编码时客户端最早能解码出音频之前需要合成的音频时长
+
+用法: python benchmarks/bench_output_format.py [--duration 8] [--chunk-ms 200] [--repeat 5]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from audio_output import FORMATS, StreamEncoder, encode_audio
+from resampler import ResamplerPool
+
+REPLY_SAMPLE_RATE = 24000
+
+resampler_pool = ResamplerPool()
+
+
+def make_reply(duration: float) -> np.ndarray:
+    voice, sample_rate = sf.read(os.path.join(ROOT_DIR, "voice.wav"), dtype="float32", always_2d=True)
+    voice = resampler_pool.resample(voice[:, 0], sample_rate, REPLY_SAMPLE_RATE)
+    repeats = int(np.ceil(duration * REPLY_SAMPLE_RATE / len(voice)))
+    return np.tile(voice, repeats)[:int(duration * REPLY_SAMPLE_RATE)]
+
+
+def decodable_samples(data: bytes, audio_format) -> int:
+    """已输出的字节中能解码出的采样数（裸PCM按字节数计算）"""
+    if audio_format.sf_format is None:
+        return len(data) // 2
+    try:
+        audio, _ = sf.read(io.BytesIO(data), dtype="float32")
+        return len(audio)
+    except (sf.LibsndfileError, RuntimeError):
+        return 0
+
+
+def first_audio_delay_ms(audio: np.ndarray, audio_format, chunk_samples: int) -> float:
+    """流式编码时，已输出的字节中第一次能解码出音频之前送入编码器的音频时长（毫秒）"""
+    encoder = StreamEncoder(audio_format, REPLY_SAMPLE_RATE, resampler_pool.resample)
+    output = b""
+    fed = 0
+    for start in range(0, len(audio), chunk_samples):
+        chunk = audio[start:start + chunk_samples]
+        fed += len(chunk)
+        output += encoder.encode(chunk)
+        if decodable_samples(output, audio_format) > 0:
+            break
+    encoder.finish()
+    return fed / REPLY_SAMPLE_RATE * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回复音频输出格式基准测试")
+    parser.add_argument("--duration", type=float, default=8.0, help="回复音频时长（秒）")
+    parser.add_argument("--chunk-ms", type=float, default=200.0, help="流式合成每块的时长")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    audio = make_reply(args.duration)
+    chunk_samples = int(args.chunk_ms / 1000 * REPLY_SAMPLE_RATE)
+    print(f"回复音频: {args.duration}秒 {REPLY_SAMPLE_RATE}Hz，流式块 {args.chunk_ms:.0f}ms")
+    print(f"{'格式':<10} | {'大小(KB)':>9} | {'相对WAV':>7} | {'码率(kbps)':>10} | {'编码(ms)':>9} | {'流式首段可解码(ms)':>16}")
+    print("-" * 80)
+
+    wav_size = None
+    for name, audio_format in FORMATS.items():
+        data, _ = encode_audio(audio, REPLY_SAMPLE_RATE, audio_format, resampler_pool.resample)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            encode_audio(audio, REPLY_SAMPLE_RATE, audio_format, resampler_pool.resample)
+        elapsed = (time.perf_counter() - start) / args.repeat * 1000
+        wav_size = wav_size or len(data)
+        delay = first_audio_delay_ms(audio, audio_format, chunk_samples)
+        print(f"{name:<10} | {len(data) / 1024:>9.1f} | {len(data) / wav_size:>6.0%} | "
+              f"{len(data) * 8 / args.duration / 1000:>10.1f} | {elapsed:>9.1f} | {delay:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
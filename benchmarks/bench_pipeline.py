@@ -0,0 +1,310 @@
+"""
+全流程延迟基准测试
+在进程内启动服务（本地OpenAI兼容桩服务代替LLM），按指定并发压测
+/api/chat/text、/api/chat/audio、/api/audio/transcribe、/api/audio/tts，
+统计各接口与各阶段（解码、重采样、VAD、ASR、LLM、TTS、编码）的p50/p95/p99、吞吐和峰值RSS，
+结果保存为JSON，便于跨提交对比
+
+用法:
+    python benchmarks/bench_pipeline.py                        # 假模型，CPU即可运行
+    python benchmarks/bench_pipeline.py --models real          # 加载真实模型
+    python benchmarks/bench_pipeline.py --compare results/old.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stub_llm import StubServer
+
+ENDPOINTS = ["chat_text", "chat_audio", "transcribe", "tts"]
+STAGES = ["decode", "resample", "vad", "asr", "llm", "tts", "encode"]
+
+# 每个阶段的耗时（秒），由插桩的包装函数写入
+stage_times = defaultdict(list)
+
+
+def percentiles(values) -> dict:
+    """p50/p95/p99（毫秒）"""
+    if not values:
+        return {"count": 0}
+    ms = np.array(values) * 1000
+    return {
+        "count": len(values),
+        "mean": round(float(ms.mean()), 2),
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2)
+    }
+
+
+def peak_rss_mb():
+    """进程峰值RSS（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def timed(stage: str, func, skip=None):
+    """同步函数插桩：记录每次调用耗时（skip(*args)为真的调用不记录）"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if skip is not None and skip(*args):
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stage_times[stage].append(time.perf_counter() - start)
+    return wrapper
+
+
+def timed_async(stage: str, func):
+    """异步函数插桩"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            stage_times[stage].append(time.perf_counter() - start)
+    return wrapper
+
+
+def setup_app(args, llm_url: str):
+    """导入app，加载（假）模型并为各阶段插桩"""
+    os.environ["AI_API_URL"] = llm_url
+    import app
+
+    if args.models == "fake":
+        from fake_models import EnergyVAD, FakeASR, FakeCosyVoice
+        app.vad_model = app.vad_engine = EnergyVAD()
+        app.asr_model = FakeASR(rtf=args.asr_rtf)
+        app.asr_offline_model = FakeASR(rtf=args.asr_rtf, streaming=False)
+        app.tts_model = FakeCosyVoice(rtf=args.tts_rtf)
+    else:
+        app.init_asr_model()
+        if app.config.ASR_OFFLINE_ENABLED:
+            app.init_asr_offline_model()
+        app.init_vad_model()
+        app.init_tts_model()
+    app.init_voice_prompt()
+
+    # 处理函数通过模块全局名调用，替换模块属性即可插桩
+    app.prepare_audio = timed("decode", app.prepare_audio)
+    # 采样率相同时resample直接返回，不计入重采样阶段
+    app.resampler_pool.resample = timed(
+        "resample", app.resampler_pool.resample,
+        skip=lambda audio, src_rate, dst_rate=16000: src_rate == dst_rate
+    )
+    app.extract_speech = timed("vad", app.extract_speech)
+    # 上传接口的识别经transcribe进入ASR微批处理（recognize_batch）或直接调度（transcribe_audio），
+    # 与服务自身的asr阶段指标一样包含组批等待
+    app.transcribe = timed_async("asr", app.transcribe)
+    app.chat_with_ai = timed_async("llm", app.chat_with_ai)
+    # 整段合成经TTS分组队列（synthesize_batch）或直接调度（text_to_speech）都调用synthesize_speech
+    app.synthesize_speech = timed("tts", app.synthesize_speech)
+    app.encode_reply_audio = timed("encode", app.encode_reply_audio)
+    return app
+
+
+def start_server(app_module, port: int):
+    """在后台线程运行uvicorn（跳过startup事件，模型已在setup_app中加载）"""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+
+def build_requests(fixtures: list) -> dict:
+    """每个接口的请求构造函数：返回httpx.AsyncClient.post的参数"""
+    texts = ["你好呀", "今天有点累，想听你说说话", "给我讲个简短的笑话吧"]
+
+    def chat_text(i):
+        return "/api/chat/text", {"json": {"text": texts[i % len(texts)]}}
+
+    def chat_audio(i):
+        name, data = fixtures[i % len(fixtures)]
+        return "/api/chat/audio", {"files": {"audio": (name, data, "audio/wav")}}
+
+    def transcribe(i):
+        name, data = fixtures[i % len(fixtures)]
+        return "/api/audio/transcribe", {"files": {"audio": (name, data, "audio/wav")}}
+
+    def tts(i):
+        return "/api/audio/tts", {"json": {"text": texts[i % len(texts)]}}
+
+    return {"chat_text": chat_text, "chat_audio": chat_audio, "transcribe": transcribe, "tts": tts}
+
+
+async def run_endpoint(base_url: str, build, total: int, concurrency: int) -> dict:
+    """以固定并发压测一个接口"""
+    import httpx
+
+    latencies, errors = [], defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def one(i):
+            path, kwargs = build(i)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, **kwargs)
+                    await response.aread()
+                    if response.status_code != 200:
+                        errors[str(response.status_code)] += 1
+                        return
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies)
+    }
+
+
+def print_report(result: dict):
+    print(f"\n{'接口':<12} {'成功/总数':>10} {'吞吐(req/s)':>12} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10}")
+    for name, r in result["endpoints"].items():
+        lat = r["latency_ms"]
+        print(f"{name:<12} {r['ok']:>5}/{r['requests']:<4} {r['throughput_rps']:>12.2f} "
+              f"{lat.get('p50', 0):>10.1f} {lat.get('p95', 0):>10.1f} {lat.get('p99', 0):>10.1f}")
+    print(f"\n{'阶段':<12} {'次数':>8} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10}")
+    for name, r in result["stages"].items():
+        if r["count"]:
+            print(f"{name:<12} {r['count']:>8} {r['p50']:>10.1f} {r['p95']:>10.1f} {r['p99']:>10.1f}")
+    print(f"\n峰值RSS: {result['peak_rss_mb']} MB")
+
+
+def print_comparison(result: dict, baseline: dict):
+    """与基线结果对比p50/p99（比值 >1 表示变慢）"""
+    print(f"\n对比基线 {baseline['meta'].get('commit')}（当前/基线）:")
+    for section, key in (("endpoints", "latency_ms"), ("stages", None)):
+        for name, current in result[section].items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            cur_lat = current[key] if key else current
+            old_lat = old[key] if key else old
+            if not cur_lat.get("count") or not old_lat.get("count"):
+                continue
+            ratios = [f"{p}={cur_lat[p] / old_lat[p]:.2f}x" for p in ("p50", "p99") if old_lat.get(p)]
+            print(f"  {section[:-1]:<8} {name:<12} " + "  ".join(ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全流程延迟基准测试")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40, help="每个接口的请求数")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--asr-rtf", type=float, default=0.05, help="假ASR模型的实时率")
+    parser.add_argument("--tts-rtf", type=float, default=0.1, help="假TTS模型的实时率")
+    parser.add_argument("--llm-delay-ms", type=float, default=200.0, help="LLM桩服务的响应延迟")
+    parser.add_argument("--port", type=int, default=18100)
+    parser.add_argument("--llm-port", type=int, default=18101)
+    parser.add_argument("--output", default=None, help="结果JSON路径（默认 benchmarks/results/<时间>_<提交>.json）")
+    parser.add_argument("--compare", default=None, help="用于对比的基线结果JSON")
+    parser.add_argument("--tts-cache", action="store_true",
+                        help="开启TTS输出缓存（只用内存层）；默认关闭，否则重复的文本测到的是缓存命中而不是合成和编码")
+    args = parser.parse_args()
+
+    # 在导入app之前设置：缓存配置在模块加载时读取
+    os.environ["TTS_CACHE_ENABLED"] = str(args.tts_cache)
+    os.environ["TTS_CACHE_DIR"] = ""
+
+    fixtures = []
+    for name in ("voice.wav", "test_output.wav"):
+        with open(os.path.join(ROOT_DIR, name), "rb") as f:
+            fixtures.append((name, f.read()))
+
+    with StubServer(args.llm_port, args.llm_delay_ms) as stub:
+        app_module = setup_app(args, stub.url)
+        server, thread = start_server(app_module, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+        builders = build_requests(fixtures)
+
+        endpoints = {}
+        for name in args.endpoints:
+            # 预热一次，避免首次调用的初始化开销计入结果
+            asyncio.run(run_endpoint(base_url, builders[name], 1, 1))
+        stage_times.clear()
+        for name in args.endpoints:
+            print(f"压测 {name}: {args.requests} 个请求, 并发 {args.concurrency} ...")
+            endpoints[name] = asyncio.run(run_endpoint(base_url, builders[name], args.requests, args.concurrency))
+
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "models": args.models,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "llm_delay_ms": args.llm_delay_ms,
+            "tts_cache": args.tts_cache,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "endpoints": endpoints,
+        "stages": {stage: percentiles(stage_times.get(stage, [])) for stage in STAGES},
+        "peak_rss_mb": peak_rss_mb()
+    }
+    print_report(result)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{time.strftime('%Y%m%d_%H%M%S')}_{result['meta']['commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
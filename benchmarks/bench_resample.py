@@ -0,0 +1,61 @@
+"""
+重采样性能基准测试
+对比每次新建Resample（旧实现）与ResamplerPool缓存在常见采样率 -> 16kHz上的耗时
+
+用法: python benchmarks/bench_resample.py [--duration 10] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torchaudio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resampler import ResamplerPool, CANONICAL_SAMPLE_RATE
+
+
+def timeit(func, repeat: int) -> float:
+    """返回平均耗时（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def legacy_resample(audio: np.ndarray, src_rate: int) -> np.ndarray:
+    """旧实现：每次请求新建Resample，VAD和ASR各重采样一次"""
+    for _ in range(2):
+        audio_tensor = torch.from_numpy(audio).float()
+        resampler = torchaudio.transforms.Resample(src_rate, CANONICAL_SAMPLE_RATE)
+        result = resampler(audio_tensor).numpy()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重采样缓存基准测试")
+    parser.add_argument("--duration", type=float, default=10.0, help="测试音频时长（秒）")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    pool = ResamplerPool()
+    rng = np.random.default_rng(0)
+
+    print(f"{'采样率':>8} {'新建卷积核(ms)':>14} {'旧实现/请求(ms)':>16} {'缓存/请求(ms)':>14} {'加速比':>8}")
+    for src_rate in (44100, 48000, 22050):
+        audio = (rng.standard_normal(int(args.duration * src_rate)) * 0.1).astype(np.float32)
+        build_time = timeit(lambda: torchaudio.transforms.Resample(src_rate, CANONICAL_SAMPLE_RATE), args.repeat)
+        pool.resample(audio, src_rate)  # 预热缓存
+        legacy_time = timeit(lambda: legacy_resample(audio, src_rate), args.repeat)
+        cached_time = timeit(lambda: pool.resample(audio, src_rate), args.repeat)
+        print(f"{src_rate:>8d} {build_time * 1000:>14.2f} {legacy_time * 1000:>16.2f} {cached_time * 1000:>14.2f} "
+              f"{legacy_time / cached_time:>7.1f}x")
+    print(f"缓存统计: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
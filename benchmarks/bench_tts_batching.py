@@ -0,0 +1,115 @@
+"""
+TTS分组队列基准测试
+同样的并发整段合成请求，分别直接调度（每个请求单独占用TTS线程）和经过分组队列，对比吞吐量和p50/p95延迟；
+--batch-concurrency为1时批内逐段合成，吞吐不会高于直接调度
+
+假模型把合成耗时分成LLM和flow/hift两个各自串行的阶段（见fake_models.FakeCosyVoice），
+可以多线程同时调用：--batch-concurrency大于1时的加速来自两段分处不同阶段重叠执行，
+只有真实的CosyVoice同样可以多线程调用时才成立；
+真实模型需要安装CosyVoice并能加载 TTS_MODEL_ID
+
+用法: python benchmarks/bench_tts_batching.py [--concurrency 1 4 8] [--requests 32] [--models fake|real]
+                                             [--batch-concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+TEXTS = [
+    "今天过得怎么样呀？",
+    "我一直在这里陪着你。",
+    "早点休息，明天又是新的一天。",
+    "听起来你今天有点累了，要不要和我说说？",
+]
+
+
+def load_app(args):
+    # 分组队列默认关闭，基准测试总是创建它用于对比
+    os.environ.setdefault("TTS_BATCH_ENABLED", "True")
+    if args.batch_concurrency is not None:
+        os.environ["TTS_BATCH_CONCURRENCY"] = str(args.batch_concurrency)
+    import app
+
+    if args.models == "fake":
+        from fake_models import FakeCosyVoice
+        app.tts_model = FakeCosyVoice(rtf=args.tts_rtf)
+    else:
+        app.init_tts_model()
+    app.init_voice_prompt()
+    return app
+
+
+async def run_load(app, texts, concurrency: int) -> dict:
+    """以固定并发数发出所有合成请求，返回吞吐量和延迟分位数"""
+    latencies = []
+    queue = list(texts)
+
+    async def worker():
+        while queue:
+            text = queue.pop()
+            start = time.perf_counter()
+            await app.synthesize(text)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p95": float(np.percentile(latencies_ms, 95))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS分组队列基准测试")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--tts-rtf", type=float, default=0.1, help="假TTS模型的实时率")
+    parser.add_argument("--batch-concurrency", type=int, default=None,
+                        help="批内同时合成的段数（TTS_BATCH_CONCURRENCY，默认使用配置）")
+    args = parser.parse_args()
+
+    app = load_app(args)
+    logging.getLogger().setLevel(logging.WARNING)
+    batcher = app.tts_batcher
+    if batcher is None:
+        print("TTS_BATCH_ENABLED=False，只测试直接调度")
+    texts = [TEXTS[i % len(TEXTS)] for i in range(args.requests)]
+
+    print(f"{args.requests}段文本，批内并发 {app.config.TTS_BATCH_CONCURRENCY}，"
+          f"TTS线程数 {app.config.SCHEDULER_TTS_WORKERS}")
+    if args.models == "fake" and app.config.TTS_BATCH_CONCURRENCY > 1:
+        print("注意: 假模型的LLM与flow阶段各自加锁、可以多线程同时调用，批内并发的加速依赖这一假设；"
+              "真实CosyVoice需确认线程安全后才能把TTS_BATCH_CONCURRENCY设为大于1")
+    print(f"{'并发':>4} | {'方式':<6} | {'吞吐(段/秒)':>10} | {'p50(ms)':>9} | {'p95(ms)':>9}")
+    print("-" * 52)
+
+    # 调度器的信号量绑定事件循环，所有测试在同一个事件循环中运行
+    async def run_all():
+        modes = [("直接", None)] + ([("批处理", batcher)] if batcher is not None else [])
+        for concurrency in args.concurrency:
+            for label, current in modes:
+                app.tts_batcher = current
+                result = await run_load(app, texts, concurrency)
+                print(f"{concurrency:>4} | {label:<6} | {result['throughput']:>10.1f} | "
+                      f"{result['p50']:>9.1f} | {result['p95']:>9.1f}")
+
+    asyncio.run(run_all())
+    if batcher is not None:
+        print(f"\n批处理统计: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+上传音频解码基准测试
+同一段48kHz录音分别编码为WAV（前端旧做法）、Ogg/Opus、FLAC、MP3，对比上传大小，
+以及旧实现（整个文件读入内存后sf.read）和流式解码（从上传的临时文件逐块解码为单声道）的
+解码耗时和峰值内存（tracemalloc，包含请求持有的上传字节；torch的分配不计入，两种方式的重采样相同）
+
+用法: python benchmarks/bench_upload_decode.py [--duration 10] [--channels 1] [--repeat 5]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from audio_upload import decode_audio_file
+from resampler import ResamplerPool, CANONICAL_SAMPLE_RATE
+
+RECORD_SAMPLE_RATE = 48000
+
+# (名称, 格式, 子类型, 压缩参数)
+ENCODINGS = [
+    ("WAV", "WAV", "PCM_16", None),
+    ("Ogg/Opus", "OGG", "OPUS", 0.9),
+    ("FLAC", "FLAC", "PCM_16", None),
+    ("MP3", "MP3", "MPEG_LAYER_III", 0.9),
+]
+
+resampler_pool = ResamplerPool()
+
+
+def make_recording(duration: float, channels: int) -> np.ndarray:
+    """用仓库中的voice.wav拼出指定时长的48kHz录音"""
+    voice, sample_rate = sf.read(os.path.join(ROOT_DIR, "voice.wav"), dtype="float32", always_2d=True)
+    voice = resampler_pool.resample(voice[:, 0], sample_rate, RECORD_SAMPLE_RATE)
+    repeats = int(np.ceil(duration * RECORD_SAMPLE_RATE / len(voice)))
+    audio = np.tile(voice, repeats)[:int(duration * RECORD_SAMPLE_RATE)]
+    return np.repeat(audio[:, None], channels, axis=1)
+
+
+def encode(audio: np.ndarray, audio_format: str, subtype: str, compression) -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, RECORD_SAMPLE_RATE, format=audio_format, subtype=subtype, compression_level=compression)
+    return buffer.getvalue()
+
+
+def legacy_decode(data: bytes) -> np.ndarray:
+    """旧实现：await audio.read()读入完整字节，sf.read解码全部声道后取第一个声道"""
+    upload = bytearray(data)  # 请求持有的完整上传字节（await audio.read()返回的副本）
+    audio, sample_rate = sf.read(io.BytesIO(upload), dtype="float32")
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+    return resampler_pool.resample(audio, sample_rate, CANONICAL_SAMPLE_RATE)
+
+
+def streaming_decode(data: bytes) -> np.ndarray:
+    """新实现：Starlette把上传内容放在SpooledTemporaryFile中（超过1MB落盘），直接从它逐块解码"""
+    upload = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    upload.write(data)
+    upload.seek(0)
+    audio, sample_rate = decode_audio_file(upload, CANONICAL_SAMPLE_RATE)
+    return resampler_pool.resample(audio, sample_rate, CANONICAL_SAMPLE_RATE)
+
+
+def measure(func, data: bytes, repeat: int):
+    """返回 (平均耗时ms, 峰值内存MB)"""
+    func(data)  # 预热（创建重采样器）
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传音频解码基准测试")
+    parser.add_argument("--duration", type=float, default=10.0, help="录音时长（秒）")
+    parser.add_argument("--channels", type=int, default=1, help="录音声道数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    recording = make_recording(args.duration, args.channels)
+    print(f"录音: {args.duration}秒 {RECORD_SAMPLE_RATE}Hz {args.channels}声道")
+    print(f"{'格式':<9} | {'上传大小(KB)':>11} | {'压缩比':>6} | {'方式':<4} | {'解码(ms)':>9} | {'峰值内存(MB)':>12}")
+    print("-" * 70)
+
+    wav_size = None
+    for name, audio_format, subtype, compression in ENCODINGS:
+        data = encode(recording, audio_format, subtype, compression)
+        wav_size = wav_size or len(data)
+        for label, func in (("旧", legacy_decode), ("流式", streaming_decode)):
+            elapsed, peak = measure(func, data, args.repeat)
+            print(f"{name:<9} | {len(data) / 1024:>11.1f} | {wav_size / len(data):>5.1f}x | {label:<4} | "
+                  f"{elapsed:>9.1f} | {peak:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
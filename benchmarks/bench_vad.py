@@ -0,0 +1,93 @@
+"""
+VAD性能基准测试
+对比旧的逐帧循环实现与批量VAD引擎在长音频上的耗时
+
+用法: python benchmarks/bench_vad.py [--durations 10 30 60] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from vad_engine import BatchVAD
+
+
+def load_vad_model():
+    """加载silero-vad（与app.py相同的torch.hub方式，失败时尝试pip包）"""
+    try:
+        model, _ = torch.hub.load(repo_or_dir='snakers4/silero-vad', model='silero_vad', force_reload=False, onnx=False)
+    except Exception:
+        from silero_vad import load_silero_vad
+        model = load_silero_vad(onnx=False)
+    return model
+
+
+def load_fixture(duration: float) -> np.ndarray:
+    """读取voice.wav并循环拼接到指定时长（16000Hz单声道）"""
+    audio, sample_rate = sf.read(Config.TTS_REF_AUDIO, dtype='float32')
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+    audio = torchaudio.functional.resample(torch.from_numpy(audio), sample_rate, 16000).numpy()
+    repeats = int(np.ceil(duration * 16000 / len(audio)))
+    return np.tile(audio, repeats)[:int(duration * 16000)]
+
+
+def legacy_frame_loop(model, audio: np.ndarray) -> np.ndarray:
+    """旧实现：Python循环逐帧补齐、前向、.item()同步"""
+    frame_size = 512
+    audio_tensor = torch.from_numpy(audio).float()
+    num_frames = (audio_tensor.shape[0] + frame_size - 1) // frame_size
+    model.reset_states()
+    probs = []
+    for i in range(num_frames):
+        frame = audio_tensor[i * frame_size:(i + 1) * frame_size]
+        if frame.shape[0] < frame_size:
+            frame = torch.cat([frame, torch.zeros(frame_size - frame.shape[0])])
+        probs.append(model(frame.unsqueeze(0), 16000).item())
+    model.reset_states()
+    return np.array(probs, dtype=np.float32)
+
+
+def timeit(func, repeat: int) -> float:
+    """返回多次运行中的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD批量推理基准测试")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 30, 60, 120])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    model = load_vad_model()
+    engine = BatchVAD(model, 16000, Config.VAD_BLOCK_FRAMES)
+
+    print(f"{'时长(s)':>8} {'帧数':>8} {'逐帧循环(ms)':>14} {'批量引擎(ms)':>14} {'加速比':>8} {'最大误差':>10}")
+    for duration in args.durations:
+        audio = load_fixture(duration)
+        legacy = legacy_frame_loop(model, audio)
+        batched = engine.frame_probs(audio)
+        max_diff = float(np.abs(legacy - batched).max())
+
+        legacy_time = timeit(lambda: legacy_frame_loop(model, audio), args.repeat)
+        batched_time = timeit(lambda: engine.frame_probs(audio), args.repeat)
+        print(f"{duration:>8.0f} {len(batched):>8d} {legacy_time * 1000:>14.1f} {batched_time * 1000:>14.1f} "
+              f"{legacy_time / batched_time:>7.1f}x {max_diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
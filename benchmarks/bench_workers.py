@@ -0,0 +1,229 @@
+"""
+多进程部署内存基准测试
+分别以两种方式启动1/2/4个工作进程的服务，压测后统计主进程和每个工作进程的内存：
+- preload：主进程加载模型后fork工作进程，模型内存写时复制共享（WORKERS_PRELOAD=True）
+- per-worker：每个工作进程启动后各自加载模型（相当于启动N个独立进程）
+
+每个进程读取 /proc/<pid>/smaps_rollup：RSS（包含共享页）、USS（私有页，即该进程独占的内存）、
+PSS（共享页按共享进程数平摊）；所有进程的PSS之和就是整个服务实际占用的物理内存
+
+假模型带有指定大小的模拟权重（推理时逐页读取），真实模型需要能加载ASR/VAD/TTS
+
+用法:
+    python benchmarks/bench_workers.py                                # 假模型，1/2/4个工作进程
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --tts-mb 2000
+    python benchmarks/bench_workers.py --models real --modes preload
+"""
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+MODES = ["preload", "per-worker"]
+
+
+# ==================== 服务进程 ====================
+def use_fake_models(app, args):
+    """把模型管理器中的加载函数替换为假模型（预热函数保持不变）"""
+    from fake_models import EnergyVAD, FakeASR, FakeCosyVoice
+
+    def load_asr():
+        app.asr_model = FakeASR(rtf=0.01, weights_mb=args.asr_mb)
+        return True
+
+    def load_asr_offline():
+        app.asr_offline_model = FakeASR(rtf=0.01, streaming=False, weights_mb=args.asr_mb)
+        return True
+
+    def load_vad():
+        app.vad_model = app.vad_engine = EnergyVAD()
+        return True
+
+    def load_tts():
+        app.tts_model = FakeCosyVoice(rtf=0.05, weights_mb=args.tts_mb)
+        return app.init_voice_prompt() or True
+
+    loaders = {"asr": load_asr, "asr_offline": load_asr_offline, "vad": load_vad, "tts": load_tts}
+    for name, state in app.model_manager.models.items():
+        state.loader = loaders[name]
+
+
+def mark_ready(app, ready_dir: str):
+    """工作进程的模型全部就绪后在ready_dir中写入以进程号命名的文件"""
+
+    async def wait_and_mark():
+        while not app.model_manager.ready:
+            await asyncio.sleep(0.1)
+        open(os.path.join(ready_dir, str(os.getpid())), "w").close()
+
+    async def on_startup():
+        asyncio.ensure_future(wait_and_mark())
+
+    app.app.router.on_startup.append(on_startup)
+
+
+def serve(args):
+    import app
+    from prefork import PreforkServer
+
+    if args.models == "fake":
+        use_fake_models(app, args)
+    mark_ready(app, args.ready_dir)
+    # 只测量内存，不使用会话和audio_url，允许进程内的会话存储
+    PreforkServer(app, "127.0.0.1", args.port, args.serve, preload=args.mode == "preload",
+                  log_level="warning", require_shared_state=False).run()
+
+
+# ==================== 测量 ====================
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def child_pids(pid: int) -> list:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def memory_mb(pid: int) -> dict:
+    """RSS / PSS / USS（MB）"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {"rss": fields.get("Rss", 0.0), "pss": fields.get("Pss", 0.0),
+            "uss": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)}
+
+
+def wait_ready(proc: subprocess.Popen, ready_dir: str, workers: int, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务进程退出（状态 {proc.returncode}）")
+        if len(os.listdir(ready_dir)) >= workers:
+            return
+        time.sleep(0.2)
+    raise TimeoutError(f"{timeout}秒内工作进程未全部就绪")
+
+
+async def drive_load(port: int, requests: int, concurrency: int, wav: bytes):
+    """并发发送转写和合成请求，让每个工作进程都执行推理"""
+    import httpx
+
+    base = f"http://127.0.0.1:{port}"
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(index: int):
+        nonlocal failures
+        async with semaphore:
+            # 每个请求新建连接，由内核在工作进程之间分配
+            async with httpx.AsyncClient(base_url=base, timeout=60) as client:
+                if index % 2:
+                    resp = await client.post("/api/audio/tts", json={"text": "你好，今天天气怎么样"})
+                else:
+                    resp = await client.post("/api/audio/transcribe", files={"audio": ("voice.wav", wav, "audio/wav")})
+                failures += resp.status_code != 200
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return failures
+
+
+def run_case(mode: str, workers: int, args, wav: bytes) -> dict:
+    ready_dir = tempfile.mkdtemp(prefix="bench_workers_")
+    port = free_port()
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", str(workers), "--mode", mode,
+           "--port", str(port), "--ready-dir", ready_dir, "--models", args.models,
+           "--asr-mb", str(args.asr_mb), "--tts-mb", str(args.tts_mb)]
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR, MODEL_WARMUP="True")
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, env=env, cwd=ROOT_DIR, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        try:
+            wait_ready(proc, ready_dir, workers, args.timeout)
+        except (RuntimeError, TimeoutError):
+            log.seek(0)
+            print(log.read().decode(errors="replace")[-2000:], file=sys.stderr)
+            raise
+        failures = asyncio.run(drive_load(port, args.requests * workers, 2 * workers, wav))
+        master = memory_mb(proc.pid)
+        children = [memory_mb(pid) for pid in child_pids(proc.pid)]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(ready_dir, ignore_errors=True)
+        log.close()
+
+    count = max(1, len(children))
+    return {
+        "mode": mode,
+        "workers": len(children),
+        "failures": failures,
+        "master_rss": master["rss"],
+        "worker_rss": sum(c["rss"] for c in children) / count,
+        "worker_uss": sum(c["uss"] for c in children) / count,
+        "total_pss": master["pss"] + sum(c["pss"] for c in children),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程部署内存基准测试")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--asr-mb", type=float, default=100, help="每个假ASR模型（流式/离线）的模拟权重大小")
+    parser.add_argument("--tts-mb", type=float, default=300, help="假TTS模型的模拟权重大小")
+    parser.add_argument("--requests", type=int, default=10, help="每个工作进程平均处理的请求数")
+    parser.add_argument("--timeout", type=float, default=300, help="等待工作进程就绪的最长时间")
+    # 服务进程参数
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--ready-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    import soundfile as sf
+    voice, sample_rate = sf.read(os.path.join(ROOT_DIR, "voice.wav"), dtype="float32")
+    buffer = io.BytesIO()
+    sf.write(buffer, voice, sample_rate, format="WAV", subtype="PCM_16")
+    wav = buffer.getvalue()
+
+    if args.models == "fake":
+        print(f"假模型权重: ASR {args.asr_mb:.0f}MB x 2，TTS {args.tts_mb:.0f}MB")
+    print(f"{'方式':<10} | {'进程数':>4} | {'主进程RSS':>9} | {'每进程RSS':>9} | {'每进程USS':>9} | {'总PSS':>9} | 失败")
+    print("-" * 78)
+    for mode in args.modes:
+        for workers in args.workers:
+            r = run_case(mode, workers, args, wav)
+            print(f"{r['mode']:<10} | {r['workers']:>6} | {r['master_rss']:>10.1f} | {r['worker_rss']:>11.1f} | "
+                  f"{r['worker_uss']:>11.1f} | {r['total_pss']:>9.1f} | {r['failures']}")
+    print("\n单位MB；USS为每个工作进程独占的内存，PSS之和为整个服务占用的物理内存")
+
+
+if __name__ == "__main__":
+    main()
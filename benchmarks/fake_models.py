@@ -0,0 +1,142 @@
+"""
+基准测试用的轻量假模型
+接口与app.py实际使用的模型一致（silero批量VAD、FunASR AutoModel、CosyVoice），
+只按设定的实时率（RTF）睡眠并产出确定性的结果，可在没有GPU和模型文件的机器上运行
+"""
+import threading
+import time
+
+import numpy as np
+import torch
+
+
+def fake_weights(mb: float):
+    """模拟模型权重：mb兆字节的随机float32 tensor（所有内存页都已写入），0时返回None"""
+    if mb <= 0:
+        return None
+    return torch.rand(int(mb * 1024 * 1024 / 4))
+
+
+def busy_wait(seconds: float):
+    """占用CPU的纯Python循环（持有GIL，每个切换间隔才让出），模拟推理中计算密集的部分"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def compute(seconds: float, cpu_bound: bool):
+    """模拟一次推理的耗时：cpu_bound=True时占用CPU，否则睡眠（释放GIL）"""
+    if cpu_bound:
+        busy_wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def read_weights(weights):
+    """推理时读取权重：每个内存页读一个值（只读，不触发写时复制）"""
+    if weights is not None:
+        float(weights[::1024].sum())
+
+
+class EnergyVAD:
+    """按帧能量估算语音概率，接口与vad_engine.BatchVAD一致"""
+
+    def __init__(self, frame_size: int = 512, full_scale_rms: float = 0.02):
+        self.frame_size = frame_size
+        self.full_scale_rms = full_scale_rms
+
+    def frame_probs(self, audio) -> np.ndarray:
+        if isinstance(audio, torch.Tensor):
+            audio = audio.numpy()
+        num_frames = max(1, (len(audio) + self.frame_size - 1) // self.frame_size)
+        padded = np.zeros(num_frames * self.frame_size, dtype=np.float32)
+        padded[:len(audio)] = audio
+        rms = np.sqrt(np.mean(padded.reshape(num_frames, self.frame_size) ** 2, axis=1))
+        return np.clip(rms / self.full_scale_rms, 0.0, 1.0).astype(np.float32)
+
+
+class FakeASR:
+    """
+    模拟FunASR AutoModel.generate：按输入时长乘RTF睡眠，最后一块返回固定文本
+
+    streaming=False时模拟非流式模型的批量推理：每次调用固定开销call_overhead，
+    一批音频并行计算，耗时取决于最长的一段；cpu_bound=True时推理占用CPU而不是睡眠
+    """
+
+    def __init__(self, rtf: float = 0.05, text: str = "你好，今天天气怎么样",
+                 streaming: bool = True, call_overhead: float = 0.0, weights_mb: float = 0,
+                 cpu_bound: bool = False):
+        self.rtf = rtf
+        self.text = text
+        self.streaming = streaming
+        self.call_overhead = call_overhead
+        self.weights = fake_weights(weights_mb)
+        self.cpu_bound = cpu_bound
+
+    def generate(self, input, cache=None, is_final=False, **kwargs):
+        read_weights(self.weights)
+        inputs = input if isinstance(input, list) else [input]
+        if self.streaming:
+            duration = sum(len(x) for x in inputs) / 16000
+        else:
+            duration = max(len(x) for x in inputs) / 16000
+            is_final = True
+        compute(self.call_overhead + duration * self.rtf, self.cpu_bound)
+        if isinstance(input, list):
+            return [{"key": str(i), "text": self.text} for i in range(len(input))]
+        return [{"text": self.text if is_final else ""}]
+
+
+class _FakeFrontend:
+    def __init__(self):
+        self.spk2info = {}
+
+
+class FakeCosyVoice:
+    """
+    模拟CosyVoice：每个字0.2秒音频，按RTF睡眠；支持预计算音色和流式输出
+
+    耗时分为LLM（生成语音token）和flow/hift（生成波形）两个阶段，各阶段同一时刻只处理一段，
+    并发合成时两段可以分处不同阶段重叠执行（llm_fraction为LLM阶段所占比例）；
+    cpu_bound=True时各阶段占用CPU而不是睡眠
+    """
+
+    sample_rate = 24000
+
+    def __init__(self, rtf: float = 0.3, seconds_per_char: float = 0.2, chunk_seconds: float = 0.5,
+                 llm_fraction: float = 0.6, weights_mb: float = 0, cpu_bound: bool = False):
+        self.rtf = rtf
+        self.seconds_per_char = seconds_per_char
+        self.chunk_seconds = chunk_seconds
+        self.llm_fraction = llm_fraction
+        self.frontend = _FakeFrontend()
+        self._llm_lock = threading.Lock()
+        self._flow_lock = threading.Lock()
+        self.weights = fake_weights(weights_mb)
+        self.cpu_bound = cpu_bound
+
+    def add_zero_shot_spk(self, prompt_text, prompt_wav, zero_shot_spk_id):
+        time.sleep(0.05)
+        self.frontend.spk2info[zero_shot_spk_id] = {"embedding": torch.zeros(192)}
+        return True
+
+    def _synthesize(self, seconds: float) -> torch.Tensor:
+        read_weights(self.weights)
+        cost = seconds * self.rtf
+        with self._llm_lock:
+            compute(cost * self.llm_fraction, self.cpu_bound)
+        with self._flow_lock:
+            compute(cost * (1 - self.llm_fraction), self.cpu_bound)
+        t = np.arange(int(seconds * self.sample_rate), dtype=np.float32) / self.sample_rate
+        return torch.from_numpy(0.3 * np.sin(2 * np.pi * 220 * t)).unsqueeze(0)
+
+    def inference_zero_shot(self, tts_text, prompt_text, prompt_wav, zero_shot_spk_id='', stream=False, **kwargs):
+        total = max(0.2, len(tts_text) * self.seconds_per_char)
+        if not stream:
+            yield {"tts_speech": self._synthesize(total)}
+            return
+        remaining = total
+        while remaining > 0:
+            seconds = min(self.chunk_seconds, remaining)
+            remaining -= seconds
+            yield {"tts_speech": self._synthesize(seconds)}
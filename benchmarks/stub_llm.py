@@ -0,0 +1,75 @@
+"""
+本地OpenAI兼容桩服务
+模拟 /v1/chat/completions 的固定延迟回复，用于基准测试，不依赖真实LLM
+
+用法: python benchmarks/stub_llm.py [--port 18080] [--delay-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_REPLY = "我在呢。今天过得怎么样？有什么想和我聊的吗！"
+
+
+def create_app(delay_ms: float = 50.0, token_delay_ms: float = 20.0) -> FastAPI:
+    """创建桩服务：非流式请求等待delay_ms后返回，流式请求每个字符间隔token_delay_ms"""
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(delay_ms / 1000)
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": "stub",
+                "object": "chat.completion",
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": STUB_REPLY}, "finish_reason": "stop"}]
+            })
+
+        async def event_stream():
+            for char in STUB_REPLY:
+                chunk = {"choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(token_delay_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return stub
+
+
+class StubServer:
+    """在后台线程中运行桩服务"""
+
+    def __init__(self, port: int = 18080, delay_ms: float = 50.0, token_delay_ms: float = 20.0):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}/v1/chat/completions"
+        config = uvicorn.Config(create_app(delay_ms, token_delay_ms), host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI兼容桩服务")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--delay-ms", type=float, default=50.0)
+    parser.add_argument("--token-delay-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.delay_ms, args.token_delay_ms), host="127.0.0.1", port=args.port)
@@ -13,7 +13,12 @@ class Config:
     AI_API_URL = os.getenv("AI_API_URL") or os.getenv("OLLAMA_API_URL") or _default_api_url
     AI_API_MODEL = os.getenv("AI_API_MODEL") or os.getenv("OLLAMA_MODEL") or "Grok"
     AI_API_KEY = os.getenv("AI_API_KEY") or os.getenv("OLLAMA_API_KEY") or _default_api_key
-    AI_API_TIMEOUT = int(os.getenv("AI_API_TIMEOUT") or os.getenv("OLLAMA_TIMEOUT") or "30")
+    AI_API_TIMEOUT = int(os.getenv("AI_API_TIMEOUT") or os.getenv("OLLAMA_TIMEOUT") or "30")  # 读取超时
+    AI_API_CONNECT_TIMEOUT = float(os.getenv("AI_API_CONNECT_TIMEOUT", "5"))
+    AI_API_MAX_CONNECTIONS = int(os.getenv("AI_API_MAX_CONNECTIONS", "100"))
+    AI_API_MAX_KEEPALIVE = int(os.getenv("AI_API_MAX_KEEPALIVE", "20"))
+    AI_API_MAX_RETRIES = int(os.getenv("AI_API_MAX_RETRIES", "2"))  # 429/5xx/连接失败时的重试次数
+    AI_API_HTTP2 = os.getenv("AI_API_HTTP2", "True").lower() == "true"  # 需要安装 httpx[http2]
     
     SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", """你是一个温暖贴心的女友，名字叫EVA001。
 
@@ -46,10 +51,29 @@ class Config:
         """向后兼容属性"""
         return self.AI_API_TIMEOUT
     
+    # ==================== 会话配置 ====================
+    # 服务端会话存储：memory（进程内）或 模块:类名（自定义后端，继承session_store.SessionBackend）
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "86400"))  # 超过该时长未使用的会话过期
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    # 提示词中历史消息（含摘要）最多占用的token数（按字数估算），客户端发送的历史同样按此截取
+    SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "1500"))
+    SESSION_SUMMARIZE = os.getenv("SESSION_SUMMARIZE", "True").lower() == "true"  # 超出预算的早期对话用LLM总结成摘要
+    SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "200"))
+    
     # ==================== VAD配置 ====================
     VAD_SAMPLE_RATE = int(os.getenv("VAD_SAMPLE_RATE", "16000"))
     VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.5"))
     VAD_MODEL_REPO = os.getenv("VAD_MODEL_REPO", "snakers4/silero-vad")
+    VAD_BLOCK_FRAMES = int(os.getenv("VAD_BLOCK_FRAMES", "1024"))  # 批量推理时每块的帧数（1024帧约32秒）
+    # 语音分段：只把VAD检测到的语音区间送入ASR
+    VAD_TRIM_SILENCE = os.getenv("VAD_TRIM_SILENCE", "True").lower() == "true"
+    VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))    # 短于该时长的语音区间丢弃
+    VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "300"))  # 静音持续超过该时长才切分
+    VAD_SPEECH_PAD_MS = int(os.getenv("VAD_SPEECH_PAD_MS", "200"))    # 每个语音区间两侧保留的时长
+    # 实时语音会话（/ws/voice）的端点检测
+    VOICE_WS_END_SILENCE_MS = int(os.getenv("VOICE_WS_END_SILENCE_MS", "700"))  # 实时会话中持续静音多久判定一句话说完
+    VOICE_WS_MAX_UTTERANCE_SECONDS = float(os.getenv("VOICE_WS_MAX_UTTERANCE_SECONDS", "30"))  # 单句最长时长，超过强制结束
     
     # ==================== ASR配置 ====================
     ASR_MODEL_NAME = os.getenv("ASR_MODEL_NAME", "paraformer-zh-streaming")
@@ -57,20 +81,114 @@ class Config:
     ASR_CHUNK_SIZE = [0, 10, 5]
     ASR_ENCODER_CHUNK_LOOK_BACK = int(os.getenv("ASR_ENCODER_CHUNK_LOOK_BACK", "4"))
     ASR_DECODER_CHUNK_LOOK_BACK = int(os.getenv("ASR_DECODER_CHUNK_LOOK_BACK", "1"))
+    # 微批处理：并发请求的整段识别合成一批（对离线引擎和支持批量推理的非流式模型生效）
+    ASR_BATCH_ENABLED = os.getenv("ASR_BATCH_ENABLED", "True").lower() == "true"
+    ASR_BATCH_MAX_SIZE = int(os.getenv("ASR_BATCH_MAX_SIZE", "8"))
+    ASR_BATCH_MAX_WAIT_MS = float(os.getenv("ASR_BATCH_MAX_WAIT_MS", "5"))  # 第一段音频到达后最多等待多久组批
+    # 离线识别：上传的完整录音由非流式Paraformer一次识别整段（ASR_MODEL_NAME的流式模型用于实时会话）
+    ASR_OFFLINE_ENABLED = os.getenv("ASR_OFFLINE_ENABLED", "True").lower() == "true"
+    ASR_OFFLINE_MODEL_NAME = os.getenv("ASR_OFFLINE_MODEL_NAME", "paraformer-zh")
+    ASR_OFFLINE_MODEL_REVISION = os.getenv("ASR_OFFLINE_MODEL_REVISION", "v2.0.4")
+    ASR_PUNC_MODEL_NAME = os.getenv("ASR_PUNC_MODEL_NAME", "")  # 离线识别结果的标点模型（如ct-punc），留空不加标点
+    ASR_PUNC_MODEL_REVISION = os.getenv("ASR_PUNC_MODEL_REVISION", "v2.0.4")
+    ASR_UPLOAD_ENGINE = os.getenv("ASR_UPLOAD_ENGINE", "offline")  # 上传接口默认的识别引擎：offline / streaming，请求可用asr_engine参数指定
     
     # ==================== TTS配置 ====================
     TTS_MODEL_ID = os.getenv("TTS_MODEL_ID", "FunAudioLLM/Fun-CosyVoice3-0.5B-2512")
     TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "24000"))
+    TTS_OUTPUT_FORMAT = os.getenv("TTS_OUTPUT_FORMAT", "opus")  # 回复音频的默认格式（wav/wav-float/opus/mp3/pcm），请求未指定format且Accept不含音频类型时使用
+    # 分组队列：整段合成请求按音色分组，TTS线程空闲时一次取走一批（流式合成不经过该队列）。
+    # CosyVoice没有多文本批量推理，TTS_BATCH_CONCURRENCY=1时批内仍逐段合成，吞吐与直接调度相同，
+    # 只多了排队环节，所以默认关闭；只在确认CosyVoice可以多线程同时调用、TTS_BATCH_CONCURRENCY>1时开启
+    TTS_BATCH_ENABLED = os.getenv("TTS_BATCH_ENABLED", "False").lower() == "true"
+    TTS_BATCH_MAX_SIZE = int(os.getenv("TTS_BATCH_MAX_SIZE", "4"))
+    TTS_BATCH_MAX_WAIT_MS = float(os.getenv("TTS_BATCH_MAX_WAIT_MS", "0"))  # 0表示不额外等待，只合并排队中的请求
+    # 批内同时合成的段数（LLM与flow阶段流水线重叠）：额外的合成线程不受SCHEDULER_TTS_WORKERS限制，
+    # 大于1的前提是CosyVoice可以被多个线程同时调用，默认1（与SCHEDULER_TTS_WORKERS=1一样串行合成）
+    TTS_BATCH_CONCURRENCY = int(os.getenv("TTS_BATCH_CONCURRENCY", "1"))
+    
+    # 流式接口：逗号等句中停顿处切分所需的最少字数
+    STREAM_MIN_SENTENCE_CHARS = int(os.getenv("STREAM_MIN_SENTENCE_CHARS", "6"))
     
     # TTS参考音频路径
     _default_ref_audio = os.path.join(os.path.dirname(__file__), 'voice.wav')
     TTS_REF_AUDIO = os.getenv("TTS_REF_AUDIO", _default_ref_audio)
-    
+    # 参考音频对应的提示文本（CosyVoice3格式：指令<|endofprompt|>参考音频内容）
+    TTS_PROMPT_TEXT = os.getenv("TTS_PROMPT_TEXT", "You are a helpful assistant.<|endofprompt|>希望你以后能够做的比我还好呦。")
+    # 音色特征磁盘缓存目录（按参考音频内容哈希命名，设为空字符串则只缓存在内存中）
+    TTS_VOICE_CACHE_DIR = os.getenv("TTS_VOICE_CACHE_DIR", os.path.join(os.path.dirname(__file__), 'cache', 'voice_prompts')) or None
+    # 合成结果缓存：相同文本（规范化后）+音色+模型+采样率+格式直接返回编码好的音频
+    TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "True").lower() == "true"
+    TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "64"))  # 内存LRU的字节预算
+    # 磁盘层目录（设为空字符串则只缓存在内存中）及总大小上限
+    TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(__file__), 'cache', 'tts_output')) or None
+    TTS_CACHE_DISK_MAX_MB = float(os.getenv("TTS_CACHE_DISK_MAX_MB", "512"))
+    # 回复音频存储：/api/complete 和 /api/chat 的回复音频按随机ID保存，响应中只返回audio_url
+    AUDIO_ARTIFACT_ENABLED = os.getenv("AUDIO_ARTIFACT_ENABLED", "True").lower() == "true"
+    AUDIO_ARTIFACT_TTL_SECONDS = float(os.getenv("AUDIO_ARTIFACT_TTL_SECONDS", "600"))  # 过期后audio_url返回404
+    AUDIO_ARTIFACT_MAX_MB = float(os.getenv("AUDIO_ARTIFACT_MAX_MB", "64"))  # 内存层的字节预算
+    # 磁盘层目录（设为空字符串则只保存在内存中；多进程部署时共用同一目录，任一工作进程都能返回）及总大小上限
+    AUDIO_ARTIFACT_DIR = os.getenv("AUDIO_ARTIFACT_DIR", os.path.join(os.path.dirname(__file__), 'cache', 'audio_artifacts')) or None
+    AUDIO_ARTIFACT_DISK_MAX_MB = float(os.getenv("AUDIO_ARTIFACT_DISK_MAX_MB", "512"))
+
     # ==================== 服务器配置 ====================
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", "8000"))
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+    # 多进程部署：WORKERS>1时主进程加载模型后fork工作进程，模型内存以写时复制方式共享（start_server.py启动时生效）；
+    # 会话和回复音频必须保存在进程间共享的后端（SESSION_BACKEND不能是memory，回复音频需要磁盘层），否则拒绝启动
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    WORKERS_PRELOAD = os.getenv("WORKERS_PRELOAD", "True").lower() == "true"  # False时每个工作进程各自加载模型
+    WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "0"))  # 每个工作进程的PyTorch线程数，0为CPU核数/WORKERS
+    
+    # ==================== 模型加载配置 ====================
+    MODEL_LAZY_LOAD = os.getenv("MODEL_LAZY_LOAD", "False").lower() == "true"      # 启动时不加载，首次使用时再加载
+    MODEL_LOAD_WAIT_SECONDS = float(os.getenv("MODEL_LOAD_WAIT_SECONDS", "30"))  # 请求等待模型加载的最长时间，超过返回503
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "True").lower() == "true"          # 加载后用合成数据预热一次，预热结束才算就绪
+    MODEL_WARMUP_TEXT = os.getenv("MODEL_WARMUP_TEXT", "你好。")
+    # 离线模式：只从本地路径或缓存目录加载模型，不访问torch.hub/modelscope/版本检查
+    MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "False").lower() == "true"
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR") or None  # modelscope模型缓存目录（默认 ~/.cache/modelscope）
+    ASR_MODEL_PATH = os.getenv("ASR_MODEL_PATH") or None    # 固定的本地模型目录，设置后优先使用
+    ASR_OFFLINE_MODEL_PATH = os.getenv("ASR_OFFLINE_MODEL_PATH") or None
+    ASR_PUNC_MODEL_PATH = os.getenv("ASR_PUNC_MODEL_PATH") or None
+    VAD_MODEL_PATH = os.getenv("VAD_MODEL_PATH") or None    # silero-vad仓库的本地目录（torch.hub source=local）
+    TTS_MODEL_PATH = os.getenv("TTS_MODEL_PATH") or None
+    
+    # ==================== 推理后端配置 ====================
+    # VAD和ASR的推理后端：torch / onnx / onnx-int8（ONNX Runtime + int8动态量化权重），onnx后端需要安装onnxruntime
+    VAD_BACKEND = os.getenv("VAD_BACKEND", "torch")
+    ASR_BACKEND = os.getenv("ASR_BACKEND", "torch")  # onnx后端还需要安装funasr-onnx
+    VAD_ONNX_PATH = os.getenv("VAD_ONNX_PATH") or None  # silero-vad序列ONNX模型，默认首次使用时从JIT模型导出到ONNX_CACHE_DIR
+    ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "onnx"))  # 导出的VAD序列模型和int8量化结果的保存目录
+    ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 单个算子内的并行线程数，0为onnxruntime默认（物理核数）
+    ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))  # 算子间的并行线程数（funasr_onnx不支持设置，只对VAD生效）
+    
+    # ==================== 模型服务进程配置 ====================
+    # 拆分部署：ASR和TTS模型运行在独立的服务进程池中，API进程经本地unix socket发送推理任务，音频经共享内存传递
+    MODEL_SERVER_ENABLED = os.getenv("MODEL_SERVER_ENABLED", "False").lower() == "true"
+    MODEL_SERVER_AUTOSTART = os.getenv("MODEL_SERVER_AUTOSTART", "True").lower() == "true"  # start_server.py同时启动服务进程池，False时需单独运行model_server.py
+    MODEL_SERVER_DIR = os.getenv("MODEL_SERVER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "model_server"))  # unix socket目录
+    ASR_SERVER_WORKERS = int(os.getenv("ASR_SERVER_WORKERS", "1"))  # ASR服务进程数（每个进程加载流式/离线/标点模型）
+    TTS_SERVER_WORKERS = int(os.getenv("TTS_SERVER_WORKERS", "1"))  # TTS服务进程数
+    MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "120"))  # 单次推理等待服务进程响应的最长秒数
+    MODEL_SERVER_START_TIMEOUT = float(os.getenv("MODEL_SERVER_START_TIMEOUT", "600"))  # API进程等待服务进程加载完模型的最长秒数
+    
+    # ==================== 推理调度配置 ====================
+    # 每个阶段独立线程池的大小（模型本身非线程安全时应保持为1）
+    SCHEDULER_AUDIO_WORKERS = int(os.getenv("SCHEDULER_AUDIO_WORKERS", "2"))
+    SCHEDULER_VAD_WORKERS = int(os.getenv("SCHEDULER_VAD_WORKERS", "2"))
+    SCHEDULER_ASR_WORKERS = int(os.getenv("SCHEDULER_ASR_WORKERS", "1"))
+    SCHEDULER_TTS_WORKERS = int(os.getenv("SCHEDULER_TTS_WORKERS", "1"))
+    SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "16"))          # 每个阶段最多排队的请求数，超出返回503
+    SCHEDULER_QUEUE_TIMEOUT = float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", "30"))  # 排队超过该秒数返回503
+    
+    # ==================== 监控指标配置 ====================
+    METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "True").lower() == "true"  # 响应头附加Server-Timing（各阶段耗时）
     
     # ==================== 音频处理配置 ====================
-    MAX_AUDIO_SIZE_MB = int(os.getenv("MAX_AUDIO_SIZE_MB", "50"))
-    SUPPORTED_AUDIO_FORMATS = [".wav", ".mp3", ".flac", ".ogg", ".m4a"]
+    MAX_AUDIO_SIZE_MB = int(os.getenv("MAX_AUDIO_SIZE_MB", "50"))  # 上传请求体大小上限，接收过程中超出即返回413
+    # 上传音频解码后的时长上限（秒，0表示不限制）：压缩音频解码为float32后可能比上传大上百倍，超出即返回413
+    MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "600"))
+    RESAMPLER_CACHE_SIZE = int(os.getenv("RESAMPLER_CACHE_SIZE", "8"))  # 缓存的重采样器数量（按采样率组合）
+    SUPPORTED_AUDIO_FORMATS = [".wav", ".mp3", ".flac", ".ogg", ".opus", ".webm", ".m4a"]  # .webm/.m4a需要安装ffmpeg
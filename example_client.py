@@ -6,6 +6,9 @@ import requests
 import json
 import time
 
+# 回复音频保存为.wav文件，显式请求WAV格式（服务端默认返回Ogg/Opus）
+WAV_ACCEPT = {"Accept": "audio/wav"}
+
 class AIChatClient:
     """AI对话客户端"""
     
@@ -63,7 +66,7 @@ class AIChatClient:
         """文本转语音"""
         data = {"text": text}
         try:
-            response = requests.post(f"{self.base_url}/api/audio/tts", json=data)
+            response = requests.post(f"{self.base_url}/api/audio/tts", json=data, headers=WAV_ACCEPT)
             if response.status_code == 200:
                 with open(output_file, "wb") as f:
                     f.write(response.content)
@@ -105,7 +108,7 @@ class AIChatClient:
             with open(audio_file_path, "rb") as f:
                 files = {"audio": f}
                 data = {"conversation_history": json.dumps(self.conversation_history)}
-                response = requests.post(f"{self.base_url}/api/complete/audio", files=files, data=data)
+                response = requests.post(f"{self.base_url}/api/complete/audio", files=files, data=data, headers=WAV_ACCEPT)
             
             if response.status_code == 200:
                 # 保存音频
@@ -139,7 +142,7 @@ class AIChatClient:
         """
         data = {"text": text, "conversation_history": self.conversation_history}
         try:
-            response = requests.post(f"{self.base_url}/api/chat/text", json=data)
+            response = requests.post(f"{self.base_url}/api/chat/text", json=data, headers=WAV_ACCEPT)
             if response.status_code == 200:
                 # 保存音频
                 with open(output_file, "wb") as f:
@@ -171,7 +174,7 @@ class AIChatClient:
             with open(audio_file_path, "rb") as f:
                 files = {"audio": f}
                 data = {"conversation_history": json.dumps(self.conversation_history)}
-                response = requests.post(f"{self.base_url}/api/chat/audio", files=files, data=data)
+                response = requests.post(f"{self.base_url}/api/chat/audio", files=files, data=data, headers=WAV_ACCEPT)
             
             if response.status_code == 200:
                 # 保存音频
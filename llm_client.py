@@ -0,0 +1,188 @@
+"""
+LLM后端异步客户端
+基于httpx.AsyncClient的持久连接池（keep-alive，上游支持时使用HTTP/2），
+连接/读取超时分开配置，429和5xx按带抖动的指数退避重试，支持SSE流式输出
+"""
+import asyncio
+import json
+import logging
+import random
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 需要重试的状态码：限流和服务端错误
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMResponseError(RuntimeError):
+    """LLM返回非200状态码"""
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"LLM返回状态码 {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.body = body
+
+
+class LLMStreamInterrupted(RuntimeError):
+    """流式回复已经输出部分文本后出错，已产出的文本不是完整回复"""
+
+
+def _http2_available() -> bool:
+    """HTTP/2需要可选依赖h2（pip install httpx[http2]）"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class LLMClient:
+    """OpenAI兼容接口的异步客户端，应用启动时创建一次，关闭时释放连接池"""
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        http2: bool = True,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = http2 and _http2_available()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def headers(self) -> dict:
+        """OpenAI标准格式的请求头"""
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    async def start(self):
+        """创建连接池"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            )
+            logger.info(f"LLM客户端已创建: HTTP/2={'启用' if self.http2 else '未启用'}, 最大连接数={self.limits.max_connections}")
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("LLM客户端未启动")
+        return self._client
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """计算第attempt次重试前的等待时间：优先使用Retry-After，否则为带完全抖动的指数退避"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def post(self, payload: dict) -> httpx.Response:
+        """
+        发送请求，429/5xx和连接建立失败时重试（对话补全不是幂等的，请求可能已送达时不重试）
+
+        返回最后一次的响应（可能仍是错误状态码）；连接失败或超时重试耗尽后抛出httpx异常
+        """
+        if self._client is None:
+            await self.start()
+
+        for attempt in range(self.max_retries + 1):
+            is_last = attempt == self.max_retries
+            try:
+                response = await self.client.post(self.url, json=payload)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # 只重试请求确定没有发出的错误：RemoteProtocolError等可能发生在上游已经处理（并计费）之后
+                if is_last:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"LLM连接失败（{type(e).__name__}），{delay:.2f}秒后重试（{attempt + 1}/{self.max_retries}）")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and not is_last:
+                delay = self._backoff(attempt, response)
+                logger.warning(f"LLM返回{response.status_code}，{delay:.2f}秒后重试（{attempt + 1}/{self.max_retries}）")
+                await asyncio.sleep(delay)
+                continue
+            return response
+
+    async def stream(self, payload: dict) -> AsyncIterator[str]:
+        """
+        以SSE流式请求，逐个产出增量文本（choices[0].delta.content）
+
+        只在收到响应体之前重试；非200响应抛出LLMResponseError
+        """
+        if self._client is None:
+            await self.start()
+        payload = dict(payload, stream=True)
+
+        for attempt in range(self.max_retries + 1):
+            is_last = attempt == self.max_retries
+            try:
+                async with self.client.stream("POST", self.url, json=payload) as response:
+                    if response.status_code in RETRY_STATUS_CODES and not is_last:
+                        await response.aread()
+                        delay = self._backoff(attempt, response)
+                        logger.warning(f"LLM返回{response.status_code}，{delay:.2f}秒后重试（{attempt + 1}/{self.max_retries}）")
+                        await asyncio.sleep(delay)
+                        continue
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", errors="replace")
+                        raise LLMResponseError(response.status_code, body)
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            return
+                        try:
+                            chunk = json.loads(data)
+                        except json.JSONDecodeError:
+                            logger.debug(f"忽略无法解析的SSE数据: {data[:100]}")
+                            continue
+                        choices = chunk.get("choices") or []
+                        if choices:
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+                    return
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if is_last:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"LLM连接失败（{type(e).__name__}），{delay:.2f}秒后重试（{attempt + 1}/{self.max_retries}）")
+                await asyncio.sleep(delay)
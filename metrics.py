@@ -0,0 +1,322 @@
+"""
+性能指标模块
+各处理阶段（解码、重采样、VAD、ASR、LLM、TTS、编码）的耗时直方图、提前退出计数、
+模型加载与在途请求仪表，以Prometheus文本格式输出（不依赖prometheus_client）
+
+每个请求的阶段耗时通过contextvars记录，可作为Server-Timing响应头返回
+"""
+import bisect
+import contextvars
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 秒；覆盖几毫秒的编码到几十秒的长音频合成
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    @abstractmethod
+    def _samples(self):
+        ...
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels):
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = defaultdict(float)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各桶计数..., +Inf计数], 总和
+        self._counts: Dict[Tuple, list] = {}
+        self._sums: Dict[Tuple, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] += value
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class RollingLatency:
+    """每个接口最近N次请求耗时的滑动窗口，用于健康检查中的延迟摘要"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._values: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, seconds: float):
+        with self._lock:
+            values = self._values.get(endpoint)
+            if values is None:
+                values = self._values[endpoint] = deque(maxlen=self.window)
+            values.append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshot = {endpoint: list(values) for endpoint, values in self._values.items()}
+        result = {}
+        for endpoint, values in snapshot.items():
+            ms = np.array(values) * 1000
+            result[endpoint] = {
+                "count": len(values),
+                "p50_ms": round(float(np.percentile(ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(ms, 95)), 1),
+                "max_ms": round(float(ms.max()), 1)
+            }
+        return result
+
+
+class RequestTimings:
+    """单个请求内各阶段的累计耗时（秒）；接口名在路由匹配后从ASGI scope读取"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.stages: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] += seconds
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing响应头：stage;dur=毫秒"""
+        with self._lock:
+            items = list(self.stages.items())
+        items.append(("total", total))
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in items)
+
+
+# ==================== 指标定义 ====================
+STAGE_DURATION = Histogram(
+    "ai_eva_stage_duration_seconds", "各处理阶段耗时（秒）", ("stage", "endpoint")
+)
+REQUEST_DURATION = Histogram(
+    "ai_eva_request_duration_seconds", "接口请求耗时（秒，流式响应计到最后一个数据块）", ("endpoint", "status")
+)
+EARLY_EXITS = Counter(
+    "ai_eva_early_exits_total", "提前结束的请求数（no_speech: 未检测到语音, empty_transcript: 未识别出文本）",
+    ("endpoint", "reason")
+)
+INFLIGHT_REQUESTS = Gauge(
+    "ai_eva_inflight_requests", "正在处理的HTTP请求数"
+)
+MODEL_LOADED = Gauge(
+    "ai_eva_model_loaded", "模型是否已加载（1/0）", ("model",)
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "ai_eva_model_load_seconds", "模型加载耗时（秒）", ("model",)
+)
+QUEUE_DEPTH = Gauge(
+    "ai_eva_stage_queue_depth", "推理阶段排队中的任务数", ("stage",)
+)
+STAGE_RUNNING = Gauge(
+    "ai_eva_stage_running", "推理阶段正在执行的任务数", ("stage",)
+)
+BATCH_SIZE = Histogram(
+    "ai_eva_batch_size", "微批处理每批的任务数", ("stage",), buckets=(1, 2, 4, 8, 16, 32)
+)
+BATCH_QUEUE_POSITION = Histogram(
+    "ai_eva_batch_queue_position", "任务提交时排在前面的任务数（等待组批 + 已进入批次未完成）", ("stage",),
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64)
+)
+BATCH_QUEUE_WAIT = Histogram(
+    "ai_eva_batch_queue_wait_seconds", "任务从提交到所在批次开始执行的等待时间（秒）", ("stage",)
+)
+BATCH_JOB_DURATION = Histogram(
+    "ai_eva_batch_job_seconds", "任务从提交到拿到结果的耗时（秒）", ("stage",)
+)
+TTS_CACHE_REQUESTS = Counter(
+    "ai_eva_tts_cache_requests_total", "TTS输出缓存查询次数（memory_hit/disk_hit/miss）", ("result",)
+)
+
+ALL_METRICS = (
+    STAGE_DURATION, REQUEST_DURATION, EARLY_EXITS, INFLIGHT_REQUESTS,
+    MODEL_LOADED, MODEL_LOAD_SECONDS, QUEUE_DEPTH, STAGE_RUNNING,
+    BATCH_SIZE, BATCH_QUEUE_POSITION, BATCH_QUEUE_WAIT, BATCH_JOB_DURATION,
+    TTS_CACHE_REQUESTS
+)
+
+rolling_latency = RollingLatency()
+
+_current_request: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "ai_eva_request_timings", default=None
+)
+
+
+def current_endpoint() -> str:
+    timings = _current_request.get()
+    return timings.endpoint if timings is not None else "internal"
+
+
+def observe_stage(stage: str, seconds: float):
+    """记录一次阶段耗时（同时计入当前请求的Server-Timing）"""
+    timings = _current_request.get()
+    STAGE_DURATION.observe(seconds, stage=stage, endpoint=timings.endpoint if timings else "internal")
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """计时上下文：with stage_timer("asr"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def count_early_exit(reason: str):
+    EARLY_EXITS.inc(endpoint=current_endpoint(), reason=reason)
+
+
+def render() -> str:
+    """Prometheus文本格式"""
+    return "\n".join(metric.render() for metric in ALL_METRICS) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI中间件：记录请求耗时、在途请求数，并为处理函数提供请求级的阶段计时上下文
+    server_timing=True 时在响应头中附加各阶段耗时（流式响应只包含响应头发出前完成的阶段）
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            # WebSocket连接只提供阶段计时上下文，不计入请求耗时
+            token = _current_request.set(RequestTimings(scope))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current_request.reset(token)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope)
+        token = _current_request.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = timings.server_timing(time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        INFLIGHT_REQUESTS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            INFLIGHT_REQUESTS.dec()
+            _current_request.reset(token)
+            elapsed = time.perf_counter() - start
+            endpoint = timings.endpoint
+            REQUEST_DURATION.observe(elapsed, endpoint=endpoint, status=str(status))
+            if endpoint != "unmatched":
+                rolling_latency.add(endpoint, elapsed)
@@ -0,0 +1,203 @@
+"""
+动态微批处理模块
+并发请求提交的单个任务在一个很短的时间窗口内汇集成一批，由一次模型调用处理，
+结果再分发回各自调用方的future；正在执行的批次数达到上限时，新任务继续累积到下一批
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Hashable, List, Optional
+
+from metrics import BATCH_JOB_DURATION, BATCH_QUEUE_POSITION, BATCH_QUEUE_WAIT, BATCH_SIZE
+from scheduler import QueueFullError
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    """一个提交的任务"""
+
+    __slots__ = ("item", "future", "enqueued_at", "finished")
+
+    def __init__(self, item: Any, future: asyncio.Future):
+        self.item = item
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.finished = False
+
+
+class MicroBatcher:
+    """
+    动态微批处理器（在事件循环中使用）
+
+    Args:
+        run_batch: 异步函数，接收任务列表，返回等长的结果列表（通常把阻塞的批处理函数交给调度器线程池），
+            某个位置是异常对象时该任务的调用方收到这个异常
+        max_batch_size: 每批最多任务数，凑满立即执行
+        max_wait_ms: 第一个任务到达后最多等待多久再执行（凑不满也执行）；
+            为0时只合并同一轮事件循环中提交的任务，以及上一批执行期间累积的任务
+        max_concurrent_batches: 同时执行的批次上限（一般等于模型所在阶段的线程数）
+        max_pending: 等待组批的任务上限，超出时抛出QueueFullError
+        key: 任务分组函数，只有key相同的任务才会合成一批（如同一音色的TTS任务）
+        incremental: 为True时run_batch的签名为run_batch(items, deliver)，
+            每完成一个任务就调用deliver(index, result)（可在其他线程中调用），调用方不必等整批结束
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[..., Awaitable[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        max_concurrent_batches: int = 1,
+        max_pending: int = 64,
+        key: Optional[Callable[[Any], Hashable]] = None,
+        incremental: bool = False,
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.max_pending = max_pending
+        self.key = key
+        self.incremental = incremental
+
+        self._pending: List[_Job] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = 0
+        self._unfinished = 0  # 已进入批次、尚未拿到结果的任务数
+
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+
+    async def submit(self, item: Any) -> Any:
+        """提交一个任务，等待它的结果（非incremental模式下等所在批次执行完成）"""
+        if len(self._pending) >= self.max_pending:
+            raise QueueFullError(self.name, 1, reason="批处理排队已满")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        position = len(self._pending) + self._unfinished
+        BATCH_QUEUE_POSITION.observe(position, stage=self.name)
+        logger.debug(f"{self.name}批处理排队位置: {position}")
+        self._pending.append(_Job(item, future))
+
+        if self._group_size(item) >= self.max_batch_size:
+            self._maybe_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._on_timer)
+        return await future
+
+    def _key_of(self, item: Any) -> Hashable:
+        return self.key(item) if self.key is not None else None
+
+    def _group_size(self, item: Any) -> int:
+        if self.key is None:
+            return len(self._pending)
+        group = self.key(item)
+        return sum(1 for job in self._pending if self.key(job.item) == group)
+
+    def _on_timer(self):
+        self._timer = None
+        self._maybe_flush(force=True)
+
+    def _take_batch(self, force: bool) -> Optional[List[_Job]]:
+        """取出最早提交的任务所在分组的一批；未凑满且未超时返回None"""
+        group = self._key_of(self._pending[0].item)
+        members = [job for job in self._pending if self._key_of(job.item) == group]
+        expired = force or (time.perf_counter() - self._pending[0].enqueued_at) >= self.max_wait
+        if len(members) < self.max_batch_size and not expired:
+            return None
+        # 凑不满一批时把任务分摊到空闲的批次额度上，避免一个批次串行处理所有任务而其他线程空闲
+        free_slots = self.max_concurrent_batches - self._running
+        size = min(self.max_batch_size, max(1, math.ceil(len(members) / free_slots)))
+        batch = members[:size]
+        taken = set(id(job) for job in batch)
+        self._pending = [job for job in self._pending if id(job) not in taken]
+        return batch
+
+    def _maybe_flush(self, force: bool = False):
+        """有空闲批次额度时，取出一批任务执行"""
+        while self._pending and self._running < self.max_concurrent_batches:
+            batch = self._take_batch(force)
+            if batch is None:
+                break
+            self._running += 1
+            self._unfinished += len(batch)
+            asyncio.ensure_future(self._execute(batch))
+
+        if self._timer is not None and (not self._pending or self._running >= self.max_concurrent_batches):
+            # 没有待处理任务，或额度已满（批次结束时会继续处理）
+            self._timer.cancel()
+            self._timer = None
+        elif self._pending and self._timer is None and self._running < self.max_concurrent_batches:
+            delay = max(0.0, self.max_wait - (time.perf_counter() - self._pending[0].enqueued_at))
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _resolve(self, job: _Job, result: Any):
+        if job.finished:
+            return
+        job.finished = True
+        self._unfinished -= 1
+        BATCH_JOB_DURATION.observe(time.perf_counter() - job.enqueued_at, stage=self.name)
+        if job.future.done():  # 调用方已取消
+            return
+        # 单个任务失败时批处理函数可以在对应位置返回异常
+        if isinstance(result, BaseException):
+            job.future.set_exception(result)
+        else:
+            job.future.set_result(result)
+
+    async def _execute(self, batch: List[_Job]):
+        started = time.perf_counter()
+        BATCH_SIZE.observe(len(batch), stage=self.name)
+        for job in batch:
+            BATCH_QUEUE_WAIT.observe(started - job.enqueued_at, stage=self.name)
+
+        items = [job.item for job in batch]
+        try:
+            if self.incremental:
+                loop = asyncio.get_running_loop()
+
+                def deliver(index: int, result: Any):
+                    loop.call_soon_threadsafe(self._resolve, batch[index], result)
+
+                await self.run_batch(items, deliver)
+                # 线程中调用deliver安排的回调先于批次完成的回调执行，这里仍未完成的任务没有交付结果
+                for job in batch:
+                    self._resolve(job, RuntimeError(f"{self.name}批处理未返回该任务的结果"))
+            else:
+                results = await self.run_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}批处理返回{len(results)}个结果，期望{len(items)}个")
+                for job, result in zip(batch, results):
+                    self._resolve(job, result)
+        except BaseException as e:
+            for job in batch:
+                self._resolve(job, e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._running -= 1
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            # 批次执行期间到达的任务已经等待过，有空闲额度就立即执行
+            if self._pending:
+                self._maybe_flush(force=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "pending": len(self._pending),
+            "running_batches": self._running,
+            "unfinished": self._unfinished,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen
+        }
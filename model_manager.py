@@ -0,0 +1,191 @@
+"""
+模型加载管理模块
+ASR、VAD、TTS在后台线程中并行加载，启动钩子不再阻塞；每个模型单独记录状态
+（pending/loading/ready/failed）和加载耗时，接口只等待自己依赖的模型。
+加载后可先用合成数据预热一次（算子编译、显存分配等首次开销），预热结束才算就绪。
+懒加载模式下模型在第一次被使用时才加载
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# 模型仍在加载时建议客户端的重试间隔
+RETRY_AFTER_SECONDS = 5
+
+
+class ModelNotReadyError(RuntimeError):
+    """等待模型加载超时，调用方应返回503并带上Retry-After"""
+
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name}模型正在加载，请{retry_after}秒后重试")
+
+
+class ModelState:
+    """单个模型的加载状态"""
+
+    def __init__(self, name: str, loader: Callable[[], bool], required: bool,
+                 warmup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.required = required  # 必需模型加载失败时服务不算就绪
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.warmup_duration: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> dict:
+        duration = self.duration
+        if self.status == LOADING and self.started_at is not None:
+            duration = time.perf_counter() - self.started_at
+        return {
+            "status": self.status,
+            "required": self.required,
+            "duration_s": round(duration, 2) if duration is not None else None,
+            "warmup_s": round(self.warmup_duration, 2) if self.warmup_duration is not None else None,
+            "error": self.error
+        }
+
+
+class ModelManager:
+    """
+    并行/懒加载模型管理器
+
+    loader返回True表示加载成功（与app.py中的init_*_model一致），抛出异常或返回False视为失败
+    """
+
+    def __init__(self, lazy: bool = False, wait_timeout: float = 30.0, warmup: bool = True):
+        self.lazy = lazy
+        self.wait_timeout = wait_timeout
+        self.warmup = warmup
+        self.models: Dict[str, ModelState] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], bool], required: bool = False,
+                 warmup: Optional[Callable[[], None]] = None):
+        """注册模型；warmup在加载成功后执行一次，失败只记录警告"""
+        self.models[name] = ModelState(name, loader, required, warmup)
+
+    def start(self):
+        """非懒加载模式下，在后台线程中同时开始加载所有模型（立即返回）"""
+        if self.lazy:
+            logger.info(f"模型懒加载已启用，首次使用时加载: {', '.join(self.models)}")
+            return
+        for name in self.models:
+            self.load(name)
+
+    def load(self, name: str) -> Future:
+        """开始加载一个模型（已在加载或已完成时返回原来的Future）"""
+        with self._lock:
+            state = self.models[name]
+            if state.future is not None:
+                return state.future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.models)), thread_name_prefix="model-loader")
+            state.status = LOADING
+            state.started_at = time.perf_counter()
+            state.future = self._executor.submit(self._run, state)
+            return state.future
+
+    def _run(self, state: ModelState) -> bool:
+        logger.info(f"开始加载{state.name}模型...")
+        try:
+            ok = bool(state.loader())
+            if not ok:
+                state.error = "加载失败"
+        except Exception as e:
+            logger.error(f"{state.name}模型加载异常: {e}")
+            state.error = str(e)
+            ok = False
+        if ok and self.warmup and state.warmup is not None:
+            warmup_start = time.perf_counter()
+            try:
+                state.warmup()
+                state.warmup_duration = time.perf_counter() - warmup_start
+                logger.info(f"{state.name}模型预热完成，耗时 {state.warmup_duration:.2f}秒")
+            except Exception as e:
+                logger.warning(f"{state.name}模型预热失败（不影响使用）: {e}")
+        state.duration = time.perf_counter() - state.started_at
+        state.status = READY if ok else FAILED
+        log = logger.info if ok else logger.warning
+        log(f"{state.name}模型{'加载完成' if ok else '加载失败'}，耗时 {state.duration:.1f}秒")
+        return ok
+
+    def load_all(self, names: Optional[Iterable[str]] = None) -> dict:
+        """同步加载所有模型或names中的模型（懒加载模式也立即加载），全部结束后返回各模型的状态"""
+        for future in [self.load(name) for name in (self.models if names is None else names)]:
+            future.result()
+        return self.status()
+
+    async def wait_for(self, *names: str):
+        """
+        等待指定模型加载结束（成功或失败），失败的模型由调用方按原有逻辑降级处理
+
+        未通过本管理器加载的模型（pending且非懒加载，例如基准测试中直接赋值的模型）不等待
+
+        Raises:
+            ModelNotReadyError: 等待超过wait_timeout秒仍在加载
+        """
+        for name in names:
+            state = self.models.get(name)
+            if state is None or state.status in (READY, FAILED):
+                continue
+            if state.status == PENDING:
+                if not self.lazy:
+                    continue
+                self.load(name)
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(state.future)), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise ModelNotReadyError(name, RETRY_AFTER_SECONDS)
+
+    def loaded(self, name: str) -> Optional[bool]:
+        """
+        不等待地查询模型是否加载结束：成功返回True，失败返回False，仍在加载时返回None
+        懒加载模式下尚未加载的模型在这里开始加载（返回None）；未通过本管理器加载的模型视为已加载
+        """
+        state = self.models.get(name)
+        if state is None or state.status == READY:
+            return True
+        if state.status == FAILED:
+            return False
+        if state.status == PENDING:
+            if not self.lazy:
+                return True
+            self.load(name)
+        return None
+
+    @property
+    def ready(self) -> bool:
+        """就绪：没有模型还在加载，且必需模型没有加载失败（懒加载模式下未加载的模型不影响就绪）"""
+        for state in self.models.values():
+            if state.status == LOADING:
+                return False
+            if state.status == PENDING and not self.lazy:
+                return False
+            if state.status == FAILED and state.required:
+                return False
+        return True
+
+    def status(self) -> dict:
+        return {name: state.to_dict() for name, state in self.models.items()}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,157 @@
+"""
+模型路径解析模块
+离线模式下ASR、VAD、TTS只从固定路径或本地缓存目录加载，不访问torch.hub、modelscope和版本检查接口；
+在线模式保持原来的下载行为（可指定缓存目录）
+"""
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def enable_offline_mode():
+    """设置各模型库的离线环境变量（必须在导入这些库之前调用才对其全局配置生效）"""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    os.environ.setdefault("HF_DATASETS_OFFLINE", "1")
+
+
+def _modelscope_cache_roots(cache_dir: Optional[str]) -> list:
+    """modelscope缓存根目录候选（不同版本布局不同：<root>/<id>、<root>/hub/<id>、<root>/hub/models/<id>）"""
+    roots = []
+    for base in (cache_dir, os.getenv("MODELSCOPE_CACHE"), os.path.join(os.path.expanduser("~"), ".cache", "modelscope")):
+        if not base:
+            continue
+        roots.extend([base, os.path.join(base, "models"), os.path.join(base, "hub"), os.path.join(base, "hub", "models")])
+    return roots
+
+
+def find_local_modelscope_model(model_id: str, cache_dir: Optional[str] = None) -> Optional[str]:
+    """在本地modelscope缓存中查找模型目录，找不到返回None（不发起网络请求）"""
+    # modelscope缓存目录中模型名的'.'会被替换为'___'
+    owner, _, name = model_id.rpartition("/")
+    names = [model_id, os.path.join(owner, name.replace(".", "___"))] if owner else [model_id]
+    for root in _modelscope_cache_roots(cache_dir):
+        for candidate in names:
+            path = os.path.join(root, candidate)
+            if os.path.isdir(path) and os.listdir(path):
+                return path
+    return None
+
+
+def resolve_modelscope_model(model_id: str, pinned_path: Optional[str], cache_dir: Optional[str], offline: bool) -> str:
+    """
+    解析modelscope模型的本地目录
+
+    优先使用固定路径；离线模式只在本地缓存中查找，在线模式调用snapshot_download（已缓存时不重复下载）
+
+    Raises:
+        FileNotFoundError: 固定路径不存在，或离线模式下本地缓存中没有该模型
+    """
+    if pinned_path:
+        if not os.path.isdir(pinned_path):
+            raise FileNotFoundError(f"模型路径不存在: {pinned_path}")
+        return pinned_path
+
+    if offline:
+        path = find_local_modelscope_model(model_id, cache_dir)
+        if path is None:
+            raise FileNotFoundError(
+                f"离线模式下未在本地缓存中找到模型 {model_id}，请先在联网环境下载，"
+                f"或通过环境变量指定模型目录"
+            )
+        return path
+
+    from modelscope import snapshot_download
+    return snapshot_download(model_id, cache_dir=cache_dir) if cache_dir else snapshot_download(model_id)
+
+
+def resolve_asr_model(model_name: str, revision: str, pinned_path: Optional[str],
+                      cache_dir: Optional[str], offline: bool) -> dict:
+    """
+    构造funasr.AutoModel的参数
+
+    离线模式下把模型简称（如paraformer-zh-streaming）映射为modelscope模型ID后在本地缓存中查找，
+    并关闭funasr的版本检查和模型更新检查
+    """
+    if not pinned_path and not offline:
+        kwargs = {"model": model_name, "model_revision": revision}
+        if cache_dir:
+            os.environ.setdefault("MODELSCOPE_CACHE", cache_dir)
+        return kwargs
+
+    model_id = model_name
+    if not pinned_path:
+        try:
+            from funasr.download.name_maps_from_hub import name_maps_ms
+            model_id = name_maps_ms.get(model_name, model_name)
+        except ImportError:
+            pass
+    path = resolve_modelscope_model(model_id, pinned_path, cache_dir, offline=True)
+    logger.info(f"ASR模型使用本地目录: {path}")
+    return {"model": path, "disable_update": True, "check_latest": False}
+
+
+# funasr模型简称对应的ONNX导出版本（modelscope上与PyTorch版本同名加-onnx后缀的仓库）
+ONNX_MODEL_IDS = {
+    "paraformer-zh": "iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-onnx",
+    "paraformer-zh-streaming": "iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-online-onnx",
+    "ct-punc": "iic/punc_ct-transformer_cn-en-common-vocab471067-large-onnx",
+}
+
+
+def resolve_onnx_asr_model(model_name: str, pinned_path: Optional[str], cache_dir: Optional[str], offline: bool) -> str:
+    """
+    解析ASR模型ONNX版本的本地目录（funasr_onnx加载）
+
+    固定路径可以是ONNX导出目录，也可以是PyTorch模型目录（funasr_onnx加载时自动导出，需要安装funasr）；
+    模型简称映射为对应的ONNX仓库，其他名称按modelscope模型ID处理
+    """
+    model_id = ONNX_MODEL_IDS.get(model_name, model_name)
+    path = resolve_modelscope_model(model_id, pinned_path, cache_dir, offline)
+    logger.info(f"ASR ONNX模型目录: {path}")
+    return path
+
+
+def find_local_silero_repo() -> Optional[str]:
+    """torch.hub缓存中的silero-vad仓库目录"""
+    import torch
+    hub_dir = torch.hub.get_dir()
+    if not os.path.isdir(hub_dir):
+        return None
+    for name in sorted(os.listdir(hub_dir)):
+        if name.startswith("snakers4_silero-vad"):
+            return os.path.join(hub_dir, name)
+    return None
+
+
+def load_silero_vad(repo: str, pinned_path: Optional[str], offline: bool):
+    """
+    加载silero-vad（JIT版本）
+
+    固定路径 -> torch.hub本地加载；离线模式 -> silero-vad pip包自带的模型，其次torch.hub缓存；
+    在线模式 -> torch.hub（已缓存时不重新下载）
+    """
+    import torch
+
+    if pinned_path:
+        if not os.path.isdir(pinned_path):
+            raise FileNotFoundError(f"VAD模型路径不存在: {pinned_path}")
+        model, _ = torch.hub.load(repo_or_dir=pinned_path, model="silero_vad", source="local", onnx=False)
+        return model
+
+    if offline:
+        try:
+            from silero_vad import load_silero_vad as load_packaged
+            return load_packaged(onnx=False)
+        except ImportError:
+            pass
+        local_repo = find_local_silero_repo()
+        if local_repo is None:
+            raise FileNotFoundError("离线模式下未找到silero-vad（请安装silero-vad包或指定VAD_MODEL_PATH）")
+        model, _ = torch.hub.load(repo_or_dir=local_repo, model="silero_vad", source="local", onnx=False)
+        return model
+
+    model, _ = torch.hub.load(repo_or_dir=repo, model="silero_vad", force_reload=False, onnx=False)
+    return model
@@ -0,0 +1,704 @@
+"""
+模型服务进程（可选的拆分部署）
+ASR和TTS模型各自运行在独立的服务进程池中，API进程只负责HTTP/WebSocket、VAD和调度，
+推理任务经本地unix socket发送给服务进程：
+- 进程隔离：CosyVoice合成占用的GIL和内存不再拖慢同一进程中的ASR和事件循环
+- 音频经共享内存传递：请求音频和合成结果写入共享内存段，socket上只传递段名和长度，不对采样数据做pickle
+- 独立扩缩：ASR_SERVER_WORKERS / TTS_SERVER_WORKERS分别设置两个进程池的大小，
+  API进程按各服务进程正在处理的任务数分发（流式识别的同一段语音固定发往同一个进程）
+- 服务进程异常退出时由进程池重新启动，期间API进程正常服务，发往该进程的任务改发其他进程或返回错误
+
+服务进程导入app模块并在本进程中加载自己角色的模型，推理时直接调用app中的函数，
+结果与单进程部署一致。start_server.py在MODEL_SERVER_ENABLED=True时自动启动进程池，
+也可以单独运行（例如放在另一个容器中）：
+
+    python model_server.py --role asr --workers 2
+    python model_server.py --role tts --workers 1
+"""
+import argparse
+import importlib
+import itertools
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ASR = "asr"
+TTS = "tts"
+ROLES = (ASR, TTS)
+
+# 每种服务进程加载的模型（model_manager中注册的名称）与对外提供的模型（app中的全局变量）
+ROLE_LOADERS = {ASR: ("asr", "asr_offline"), TTS: ("tts",)}
+ROLE_MODELS = {
+    ASR: {"asr": "asr_model", "asr_offline": "asr_offline_model", "asr_punc": "asr_punc_model"},
+    TTS: {"tts": "tts_model"},
+}
+
+# 流式识别的cache保存在服务进程中，客户端的cache字典只记录流ID和固定的服务进程
+STREAM_ID_KEY = "_model_server_stream"
+STREAM_ENDPOINT_KEY = "_model_server_endpoint"
+STREAM_IDLE_SECONDS = 300  # 超过该时间没有新分块的流（连接中途断开）被清理
+
+# Python 3.13起SharedMemory支持track=False；更早的版本手动从resource_tracker注销
+_HAS_TRACK_PARAM = sys.version_info >= (3, 13)
+
+
+class ModelServerError(RuntimeError):
+    """模型服务进程不可用或响应超时"""
+
+
+class ModelServerUnavailable(ModelServerError):
+    """连接失败或处理中断开（服务进程未启动、正在重启或已退出），无状态的任务可以改发其他进程"""
+
+
+# ==================== 共享内存音频 ====================
+def _open_shm(name: Optional[str] = None, size: int = 0) -> SharedMemory:
+    """
+    创建或打开共享内存段，不交给resource_tracker管理
+    段由API进程在用完后删除；API进程和服务进程可能共用同一个resource_tracker，
+    各自注册/注销同名的段会相互干扰
+    """
+    if _HAS_TRACK_PARAM:
+        return SharedMemory(name=name, create=name is None, size=size, track=False)
+    shm = SharedMemory(name=name, create=name is None, size=size)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _close_shm(shm: SharedMemory, unlink: bool = False):
+    try:
+        shm.close()
+    except BufferError:
+        # 仍有数组引用共享内存（例如模型保留了输入），映射在这些数组释放后回收
+        logger.debug(f"共享内存段 {shm.name} 仍被引用，延迟关闭")
+    if unlink:
+        if not _HAS_TRACK_PARAM:
+            resource_tracker.register(shm._name, "shared_memory")  # unlink()会注销一次
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            # 对方已经删除；unlink()失败时不会注销上面的注册
+            if not _HAS_TRACK_PARAM:
+                resource_tracker.unregister(shm._name, "shared_memory")
+
+
+def export_audio(arrays: Sequence[np.ndarray]) -> Tuple[SharedMemory, dict]:
+    """把一组音频复制到新的共享内存段，返回 (共享内存段, 可以发送给其他进程的描述)"""
+    lengths = [len(audio) for audio in arrays]
+    shm = _open_shm(size=max(4, sum(lengths) * 4))
+    flat = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+    offset = 0
+    for audio, length in zip(arrays, lengths):
+        flat[offset:offset + length] = audio
+        offset += length
+    del flat
+    return shm, {"shm": shm.name, "lengths": lengths}
+
+
+def import_audio(ref: dict) -> Tuple[SharedMemory, List[np.ndarray]]:
+    """打开其他进程导出的音频，返回 (共享内存段, 各段音频的数组视图)；视图释放前不能关闭共享内存段"""
+    shm = _open_shm(ref["shm"])
+    flat = np.ndarray((sum(ref["lengths"]),), dtype=np.float32, buffer=shm.buf)
+    views, offset = [], 0
+    for length in ref["lengths"]:
+        views.append(flat[offset:offset + length])
+        offset += length
+    return shm, views
+
+
+def take_audio(ref: dict) -> List[np.ndarray]:
+    """复制出其他进程导出的音频并删除共享内存段（服务进程返回的合成结果由API进程负责删除）"""
+    shm, views = import_audio(ref)
+    arrays = [view.copy() for view in views]
+    del views
+    _close_shm(shm, unlink=True)
+    return arrays
+
+
+def server_addresses(socket_dir: str, role: str, workers: int) -> List[str]:
+    """各服务进程的unix socket路径（API进程和服务进程按同样的配置计算）"""
+    return [os.path.join(socket_dir, f"{role}-{index}.sock") for index in range(max(1, workers))]
+
+
+# ==================== 服务进程 ====================
+class _Disconnected(Exception):
+    """客户端连接已断开"""
+
+
+def _send(conn: Connection, message):
+    try:
+        conn.send(message)
+    except (OSError, EOFError) as e:
+        raise _Disconnected() from e
+
+
+def _recv(conn: Connection):
+    try:
+        return conn.recv()
+    except (OSError, EOFError) as e:
+        raise _Disconnected() from e
+
+
+class ModelServer:
+    """
+    单个模型服务进程：加载本角色的模型后在unix socket上接受连接，每个连接一个线程
+
+    同一模型的推理串行执行（与单进程部署时SCHEDULER_ASR_WORKERS=1一致）；
+    TTS按TTS_BATCH_CONCURRENCY个并发槽合成，每个槽使用自己的音色副本
+    """
+
+    def __init__(self, app_module, role: str, index: int, address: str):
+        self.app = app_module
+        self.role = role
+        self.index = index
+        self.address = address
+        self._model_locks = {key: threading.Lock() for key in ROLE_MODELS[role]}
+        self._streams: Dict[str, list] = {}  # 流ID -> [cache, 最后使用时间]
+        self._streams_lock = threading.Lock()
+        # 同时合成的段数上限（与进程内的批内并发数相同）
+        self._tts_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(max(1, self.app.config.TTS_BATCH_CONCURRENCY)):
+            self._tts_slots.put(slot)
+
+    def serve_forever(self):
+        names = [name for name in ROLE_LOADERS[self.role] if name in self.app.model_manager.models]
+        for name, state in self.app.model_manager.load_all(names).items():
+            if name in names:
+                logger.info(f"{self.role}服务进程 {self.index}: {name}模型{state['status']}（{state['duration_s']}秒）")
+        self._watch_parent()
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family="AF_UNIX")
+        os.chmod(self.address, 0o600)
+        logger.info(f"{self.role}服务进程 {self.index}（{os.getpid()}）已就绪: {self.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                logger.warning(f"接受连接失败: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _watch_parent(self):
+        """父进程（进程池）退出后服务进程随之退出，不留下孤儿进程"""
+        parent = os.getppid()
+
+        def watch():
+            while os.getppid() == parent:
+                time.sleep(2)
+            logger.warning(f"{self.role}服务进程 {self.index}: 父进程已退出，停止服务")
+            os._exit(0)
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    def _handle(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    message = _recv(conn)
+                    try:
+                        if message["op"] == "tts":
+                            self._synthesize(conn, message)
+                            continue
+                        result = self._dispatch(message)
+                    except _Disconnected:
+                        raise
+                    except Exception as e:
+                        logger.error(f"{self.role}服务进程处理失败: {e}")
+                        _send(conn, {"ok": False, "error": str(e)})
+                        continue
+                    _send(conn, {"ok": True, "result": result})
+                except _Disconnected:
+                    return
+
+    def _dispatch(self, message: dict):
+        if message["op"] == "info":
+            return self.info()
+        if message["op"] == "generate":
+            return self._generate(message)
+        raise ValueError(f"不支持的操作: {message['op']}")
+
+    def _model(self, key: str):
+        model = getattr(self.app, ROLE_MODELS[self.role][key]) if key in ROLE_MODELS[self.role] else None
+        if model is None:
+            raise RuntimeError(f"{self.role}服务进程未加载{key}模型")
+        return model
+
+    def info(self) -> dict:
+        from asr_engine import model_supports_batch
+        from onnx_runtime import TORCH
+
+        models = {}
+        for key, attr in ROLE_MODELS[self.role].items():
+            model = getattr(self.app, attr)
+            if model is None:
+                continue
+            models[key] = {"backend": self.app.inference_backends.get(key, TORCH)}
+            if self.role == ASR:
+                models[key]["streaming"] = not model_supports_batch(model)
+        return {
+            "role": self.role,
+            "index": self.index,
+            "pid": os.getpid(),
+            "models": models,
+            "sample_rate": self.app.tts_output_sample_rate() if "tts" in models else None,
+        }
+
+    # ---------- ASR ----------
+    def _stream_cache(self, stream_id: str) -> dict:
+        now = time.monotonic()
+        with self._streams_lock:
+            entry = self._streams.get(stream_id)
+            if entry is None:
+                for key in [k for k, (_, used) in self._streams.items() if now - used > STREAM_IDLE_SECONDS]:
+                    del self._streams[key]
+                entry = self._streams[stream_id] = [{}, now]
+            entry[1] = now
+            return entry[0]
+
+    def _generate(self, message: dict) -> List[dict]:
+        """调用模型的generate；音频输入在共享内存中，流式分块的cache按流ID保存在本进程"""
+        key = message["model"]
+        model = self._model(key)
+        stream_id = message.get("stream")
+        kwargs = dict(message.get("kwargs") or {})
+        shm = None
+        try:
+            if "audio" in message:
+                shm, inputs = import_audio(message["audio"])
+                if stream_id:
+                    # 流式模型的cache会保留输入的尾部，复制出共享内存（每块只有几十KB）
+                    inputs = [audio.copy() for audio in inputs]
+                data = inputs if message.get("batch") else inputs[0]
+                del inputs
+            else:
+                data = message["input"]
+
+            with self._model_locks[key]:
+                if stream_id:
+                    cache = self._stream_cache(stream_id)
+                    res = model.generate(input=data, cache=cache, is_final=message.get("is_final", False), **kwargs)
+                    if message.get("is_final"):
+                        with self._streams_lock:
+                            self._streams.pop(stream_id, None)
+                else:
+                    res = model.generate(input=data, **kwargs)
+            del data
+            return [{"text": (r.get("text", "") or "") if isinstance(r, dict) else str(r)} for r in (res or [])]
+        finally:
+            if shm is not None:
+                _close_shm(shm)
+
+    # ---------- TTS ----------
+    def _voice(self, message: dict):
+        """请求的音色（并发合成时iter_tts_chunks为每次合成借用各自的副本）"""
+        if not self.app.is_cosyvoice_model():
+            return None
+        if message.get("ref_audio"):
+            return self.app.voice_registry.get(message["ref_audio"], message.get("prompt_text") or "")
+        return self.app.get_default_voice()
+
+    def _synthesize(self, conn: Connection, message: dict):
+        """
+        逐段合成并经共享内存返回：每发送一段等待客户端取走（"next"）后再合成下一段，
+        与进程内的生成器一样按需合成；客户端发送"stop"或断开时停止
+
+        客户端回复"next"表示已经取走并删除了该段的共享内存；回复"stop"、断开或未回复时由服务进程删除
+        （共享内存段不受resource_tracker管理，没有人删除就会一直留在/dev/shm）
+        """
+        slot = self._tts_slots.get()
+        chunks = None
+        try:
+            voice = self._voice(message)
+            chunks = self.app.iter_tts_chunks(message["text"], stream=message.get("stream", False), voice=voice)
+            for audio, sample_rate in chunks:
+                shm, ref = export_audio([audio])
+                taken = False
+                try:
+                    _send(conn, {"ok": True, "chunk": ref, "sample_rate": int(sample_rate)})
+                    taken = _recv(conn) == "next"
+                finally:
+                    _close_shm(shm, unlink=not taken)
+                if not taken:
+                    return
+            _send(conn, {"ok": True, "done": True})
+        finally:
+            if chunks is not None:
+                chunks.close()
+            self._tts_slots.put(slot)
+
+
+def load_setup(spec: str) -> Callable:
+    """按 模块:函数名 加载服务进程的初始化函数（基准测试用来替换模型加载函数）"""
+    module_name, _, func_name = spec.partition(":")
+    if not func_name:
+        raise ValueError(f"无效的初始化函数: {spec}（应为 模块:函数名）")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def run_server(role: str, index: int, address: str, setup: Optional[str] = None):
+    """服务进程入口：在本进程中加载模型（不再转发给其他服务进程）后开始服务"""
+    # Ctrl+C会发给整个进程组，由进程池统一停止服务进程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from config import Config
+    Config.MODEL_SERVER_ENABLED = False
+    import app
+
+    if setup:
+        load_setup(setup)(app, role)
+    ModelServer(app, role, index, address).serve_forever()
+
+
+class ModelServerPool:
+    """
+    一组同角色的模型服务进程：启动、监控，异常退出后重新启动
+
+    服务进程以spawn方式启动（不继承父进程的线程和CUDA上下文），各自加载模型
+    """
+
+    def __init__(self, role: str, workers: int, socket_dir: str, setup: Optional[str] = None):
+        if role not in ROLES:
+            raise ValueError(f"不支持的服务进程角色: {role}（支持 {', '.join(ROLES)}）")
+        self.role = role
+        self.socket_dir = socket_dir
+        self.addresses = server_addresses(socket_dir, role, workers)
+        self.setup = setup
+        self.processes: list = [None] * len(self.addresses)
+        self.restarts = 0
+        self._context = get_context("spawn")
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        os.makedirs(self.socket_dir, mode=0o700, exist_ok=True)
+        for index in range(len(self.addresses)):
+            self._spawn(index)
+        self._thread = threading.Thread(target=self._monitor, daemon=True, name=f"model-server-{self.role}")
+        self._thread.start()
+        logger.info(f"已启动 {len(self.addresses)} 个{self.role}服务进程: {self.socket_dir}")
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=run_server, args=(self.role, index, self.addresses[index], self.setup),
+            name=f"model-server-{self.role}-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+
+    def _monitor(self):
+        while not self._stopping.wait(1.0):
+            for index, process in enumerate(self.processes):
+                if process.is_alive() or self._stopping.is_set():
+                    continue
+                logger.warning(f"{self.role}服务进程 {index}（{process.pid}）退出（状态 {process.exitcode}），重新启动")
+                self.restarts += 1
+                self._spawn(index)
+
+    def pids(self) -> List[int]:
+        return [process.pid for process in self.processes if process is not None]
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        logger.info(f"{self.role}服务进程已停止")
+
+
+# ==================== 客户端（API进程） ====================
+class _Endpoint:
+    """一个服务进程的连接池：每个并发调用使用一条连接，用完放回"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.info: Optional[dict] = None
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self) -> Connection:
+        with self._lock:
+            if self._pid != os.getpid():
+                # fork出的工作进程不能沿用父进程的连接
+                self._idle, self.in_flight, self._pid = [], 0, os.getpid()
+            self.in_flight += 1
+            self.requests += 1
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            return conn
+        try:
+            return Client(self.address, family="AF_UNIX")
+        except (OSError, EOFError) as e:
+            with self._lock:
+                self.in_flight -= 1
+                self.failures += 1
+            raise ModelServerUnavailable(f"模型服务进程不可用（{self.address}）: {e}") from e
+
+    def release(self, conn: Connection, reusable: bool):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if reusable and self._pid == os.getpid():
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def disconnected(self, error: Exception) -> ModelServerUnavailable:
+        with self._lock:
+            self.failures += 1
+        return ModelServerUnavailable(f"模型服务进程连接中断（{self.address}）: {error}")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {"address": self.address, "pid": (self.info or {}).get("pid"), "in_flight": self.in_flight,
+                "requests": self.requests, "failures": self.failures}
+
+
+class ModelServerClient:
+    """
+    API进程访问一组同角色服务进程的客户端（线程安全）
+
+    任务发往正在处理的任务数最少的进程；连接失败时无状态的任务改发其他进程，
+    流式识别的分块依赖服务进程中的cache，只发往固定的进程
+    """
+
+    def __init__(self, role: str, addresses: Sequence[str], timeout: float = 120.0):
+        self.role = role
+        self.endpoints = [_Endpoint(address) for address in addresses]
+        self.timeout = timeout
+        self._counter = itertools.count()
+        self._info: Optional[dict] = None
+
+    def connect(self, wait: float) -> dict:
+        """
+        等待服务进程加载完模型（最多wait秒），返回其中一个进程的信息
+        超时仍有进程未就绪时先使用已就绪的（未就绪的进程连接失败时任务改发其他进程）
+        """
+        if self._info is not None:
+            return self._info
+        deadline = time.monotonic() + wait
+        while True:
+            for endpoint in self.endpoints:
+                if endpoint.info is None:
+                    try:
+                        endpoint.info = self._request(endpoint, {"op": "info"})
+                    except ModelServerUnavailable:
+                        continue
+                    endpoint.requests = endpoint.failures = 0  # 等待就绪期间的连接失败不计入统计
+            ready = [endpoint.info for endpoint in self.endpoints if endpoint.info is not None]
+            if len(ready) == len(self.endpoints) or (ready and time.monotonic() >= deadline):
+                self._info = ready[0]
+                return self._info
+            if time.monotonic() >= deadline:
+                raise ModelServerUnavailable(f"{wait:.0f}秒内{self.role}服务进程未就绪")
+            time.sleep(0.5)
+
+    def model(self, key: str, wait: float):
+        """服务进程中模型的代理对象（接口与进程内的模型一致），服务进程未加载该模型时抛出RuntimeError"""
+        info = self.connect(wait)
+        model_info = info["models"].get(key)
+        if model_info is None:
+            raise RuntimeError(f"{self.role}服务进程未加载{key}模型")
+        if self.role == TTS:
+            return RemoteTTSModel(self, info["sample_rate"], model_info["backend"])
+        return RemoteASRModel(self, key, model_info["streaming"], model_info["backend"])
+
+    def pick(self) -> int:
+        """正在处理的任务数最少的进程（相同时轮流）"""
+        return self._order()[0]
+
+    def _order(self) -> List[int]:
+        start = next(self._counter) % len(self.endpoints)
+        indexes = [(start + i) % len(self.endpoints) for i in range(len(self.endpoints))]
+        return sorted(indexes, key=lambda i: self.endpoints[i].in_flight)
+
+    def _receive(self, endpoint: _Endpoint, conn: Connection):
+        if not conn.poll(self.timeout):
+            raise ModelServerError(f"{self.role}服务进程 {self.timeout:.0f}秒内未响应（{endpoint.address}）")
+        try:
+            return conn.recv()
+        except (OSError, EOFError) as e:
+            raise endpoint.disconnected(e) from e
+
+    def _request(self, endpoint: _Endpoint, message: dict):
+        conn = endpoint.acquire()
+        reusable = False
+        try:
+            try:
+                conn.send(message)
+            except (OSError, EOFError) as e:
+                raise endpoint.disconnected(e) from e
+            reply = self._receive(endpoint, conn)
+            reusable = True
+        finally:
+            endpoint.release(conn, reusable)
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    def call(self, message: dict, endpoint: Optional[int] = None):
+        """发送一个任务并等待结果；未指定进程时连接失败的任务依次改发其他进程"""
+        indexes = [endpoint] if endpoint is not None else self._order()
+        error = None
+        for index in indexes:
+            try:
+                return self._request(self.endpoints[index], message)
+            except ModelServerUnavailable as e:
+                logger.warning(str(e))
+                error = e
+        raise error
+
+    def stream(self, message: dict) -> Iterator[Tuple[np.ndarray, int]]:
+        """流式任务（TTS）：逐段产出 (音频, 采样率)；尚未产出任何一段时连接失败会改发其他进程"""
+        error = None
+        for index in self._order():
+            endpoint = self.endpoints[index]
+            try:
+                conn = endpoint.acquire()
+            except ModelServerUnavailable as e:
+                error = e
+                continue
+            reusable, produced = False, False
+            try:
+                conn.send(message)
+                while True:
+                    reply = self._receive(endpoint, conn)
+                    if not reply["ok"]:
+                        reusable = True
+                        raise RuntimeError(reply["error"])
+                    if reply.get("done"):
+                        reusable = True
+                        return
+                    audio = take_audio(reply["chunk"])[0]
+                    produced = True
+                    try:
+                        yield audio, reply["sample_rate"]
+                    except GeneratorExit:
+                        # 调用方不再需要后续的音频，通知服务进程停止合成，连接可以继续使用
+                        try:
+                            conn.send("stop")
+                            reusable = True
+                        except OSError:
+                            pass
+                        return
+                    conn.send("next")
+            except (OSError, EOFError, ModelServerUnavailable) as e:
+                error = e if isinstance(e, ModelServerUnavailable) else endpoint.disconnected(e)
+                if produced:
+                    raise error from e
+                logger.warning(str(error))
+            finally:
+                endpoint.release(conn, reusable)
+        raise error
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+    def stats(self) -> dict:
+        return {"role": self.role, "endpoints": [endpoint.stats() for endpoint in self.endpoints]}
+
+
+class RemoteASRModel:
+    """
+    服务进程中ASR/标点模型的代理，generate接口与funasr.AutoModel一致，识别引擎不需要区分部署方式
+
+    传入cache时为流式识别：cache保存在服务进程中，这里的cache字典只记录流ID和固定的服务进程
+    """
+
+    def __init__(self, client: ModelServerClient, key: str, streaming: bool, backend: str):
+        self.client = client
+        self.key = key
+        self.streaming = streaming
+        self.backend = backend
+
+    def generate(self, input, cache: Optional[dict] = None, is_final: bool = False, **kwargs) -> List[dict]:
+        message = {"op": "generate", "model": self.key, "kwargs": kwargs}
+        endpoint = None
+        if cache is not None:
+            if STREAM_ID_KEY not in cache:
+                cache[STREAM_ID_KEY] = uuid.uuid4().hex
+                cache[STREAM_ENDPOINT_KEY] = self.client.pick()
+            message.update(stream=cache[STREAM_ID_KEY], is_final=is_final)
+            endpoint = cache[STREAM_ENDPOINT_KEY]
+
+        if isinstance(input, str):
+            message["input"] = input
+            return self.client.call(message, endpoint)
+
+        arrays = input if isinstance(input, list) else [input]
+        shm, message["audio"] = export_audio([np.asarray(audio, dtype=np.float32) for audio in arrays])
+        message["batch"] = isinstance(input, list)
+        try:
+            return self.client.call(message, endpoint)
+        finally:
+            _close_shm(shm, unlink=True)
+
+
+class RemoteTTSModel:
+    """服务进程中TTS模型的代理，inference_zero_shot接口与CosyVoice一致（音色特征在服务进程中预计算）"""
+
+    def __init__(self, client: ModelServerClient, sample_rate: int, backend: str):
+        self.client = client
+        self.sample_rate = sample_rate
+        self.backend = backend
+
+    def inference_zero_shot(self, tts_text: str, prompt_text: str, prompt_wav: str,
+                            zero_shot_spk_id: str = "", stream: bool = False, **kwargs) -> Iterator[dict]:
+        message = {"op": "tts", "text": tts_text, "prompt_text": prompt_text, "ref_audio": prompt_wav, "stream": stream}
+        for audio, _ in self.client.stream(message):
+            yield {"tts_speech": audio}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型服务进程池")
+    parser.add_argument("--role", choices=ROLES, required=True)
+    parser.add_argument("--workers", type=int, default=None, help="服务进程数（默认ASR_SERVER_WORKERS/TTS_SERVER_WORKERS）")
+    parser.add_argument("--socket-dir", default=None, help="unix socket目录（默认MODEL_SERVER_DIR）")
+    args = parser.parse_args()
+
+    from config import Config
+
+    logging.basicConfig(level=logging.INFO)
+    workers = args.workers or (Config.ASR_SERVER_WORKERS if args.role == ASR else Config.TTS_SERVER_WORKERS)
+    pool = ModelServerPool(args.role, workers, args.socket_dir or Config.MODEL_SERVER_DIR)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+    pool.start()
+    try:
+        while not stopped.wait(1.0):
+            pass
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
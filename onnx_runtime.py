@@ -0,0 +1,75 @@
+"""
+ONNX Runtime推理后端的公共部分
+VAD和ASR可以分别选择推理后端：torch（原来的PyTorch模型）、onnx（ONNX Runtime）、
+onnx-int8（ONNX Runtime + 动态int8量化的权重）。CPU节点上ONNX Runtime通常更快、占用内存更少。
+onnxruntime是可选依赖，只在选择onnx后端时需要
+"""
+import logging
+import os
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+TORCH = "torch"
+ONNX = "onnx"
+ONNX_INT8 = "onnx-int8"
+BACKENDS = (TORCH, ONNX, ONNX_INT8)
+
+
+def backend_name(name: str) -> str:
+    key = (name or TORCH).strip().lower()
+    if key not in BACKENDS:
+        raise ValueError(f"不支持的推理后端: {name}（支持 {', '.join(BACKENDS)}）")
+    return key
+
+
+def is_onnx(backend: str) -> bool:
+    return backend in (ONNX, ONNX_INT8)
+
+
+def require_onnxruntime():
+    if ort is None:
+        raise ImportError("使用onnx推理后端需要安装onnxruntime（pip install onnxruntime）")
+
+
+def create_session(model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """创建CPU推理会话；线程数为0时使用onnxruntime的默认值（物理核数）"""
+    require_onnxruntime()
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = max(0, intra_op_threads)
+    options.inter_op_num_threads = max(0, inter_op_threads)
+    options.log_severity_level = 3
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def quantized_path(model_path: str, cache_dir: Optional[str]) -> str:
+    """int8量化模型的保存路径：cache_dir下与原模型同名加_int8后缀（cache_dir为空时放在原模型旁边）"""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir or os.path.dirname(model_path), f"{stem}_int8.onnx")
+
+
+def quantize_dynamic_int8(model_path: str, cache_dir: Optional[str], op_types: Optional[Sequence[str]] = None) -> str:
+    """
+    权重动态量化为int8（激活值在推理时按批量化），返回量化后的模型路径
+    op_types为要量化的算子类型（None时量化所有支持的算子）；已有比原模型新的量化结果时直接复用
+    """
+    require_onnxruntime()
+    output_path = quantized_path(model_path, cache_dir)
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(model_path):
+        return output_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    logger.info(f"int8动态量化: {model_path} -> {output_path}")
+    quantize_dynamic(model_path, tmp_path, op_types_to_quantize=list(op_types) if op_types else None,
+                     weight_type=QuantType.QInt8)
+    os.replace(tmp_path, output_path)
+    return output_path
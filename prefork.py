@@ -0,0 +1,190 @@
+"""
+多进程部署
+主进程先加载所有模型并预热，再fork出多个uvicorn工作进程共享同一个监听端口：
+模型权重在fork之前已经分配，工作进程只读不写，这些内存页由操作系统以写时复制（copy-on-write）方式共享，
+增加工作进程数时每个进程新增的私有内存只有各自的请求处理状态，而不是一整份ASR/VAD/TTS。
+
+fork前后的处理：
+- 主进程加载期间把PyTorch算子内的线程数设为1：OpenMP线程池在fork后的子进程中不可用，
+  父进程用过多线程并行区时子进程的第一次推理会卡死；工作进程启动后再恢复线程数
+- 加载完成后gc.freeze()把已有对象移出垃圾回收的扫描范围，避免子进程中的GC改写对象头导致大量内存页被复制
+- CUDA上下文不能跨fork使用，有可用GPU时不预加载，由每个工作进程在启动后各自加载
+- 工作进程异常退出时主进程重新fork一个（仍然共享已加载的模型）
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 当前进程的工作进程信息（主进程和单进程部署时为None）
+_worker: Optional[dict] = None
+
+
+def worker_info() -> Optional[dict]:
+    """当前工作进程的编号、进程号和部署方式，单进程部署时返回None"""
+    return dict(_worker) if _worker is not None else None
+
+
+def torch_threads_per_worker(workers: int, configured: int = 0) -> int:
+    """每个工作进程的PyTorch线程数：未配置时按CPU核数平分"""
+    if configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def can_preload() -> bool:
+    """CUDA上下文不能在fork后继续使用，有GPU时不能在主进程中预加载"""
+    try:
+        import torch
+        return not torch.cuda.is_available()
+    except ImportError:
+        return True
+
+
+def local_state_errors(config) -> List[str]:
+    """
+    只保存在单个工作进程内、下一个请求落到其他进程时就找不到的状态
+    （TTS输出缓存的内存层未命中时只是重新合成，不在此列）
+    """
+    errors = []
+    if config.SESSION_BACKEND == "memory":
+        errors.append("SESSION_BACKEND=memory的会话只保存在各自的工作进程中，请配置共享的会话后端（模块:类名）")
+    if config.AUDIO_ARTIFACT_ENABLED and not (config.AUDIO_ARTIFACT_DIR and config.AUDIO_ARTIFACT_DISK_MAX_MB > 0):
+        errors.append("回复音频（audio_url）没有磁盘层，只保存在各自的工作进程中，"
+                      "请设置AUDIO_ARTIFACT_DIR和AUDIO_ARTIFACT_DISK_MAX_MB（所有工作进程共用该目录）或关闭AUDIO_ARTIFACT_ENABLED")
+    return errors
+
+
+def preload_models(app_module) -> Dict[str, dict]:
+    """在主进程中同步加载（并预热）所有注册的模型，返回各模型的加载状态"""
+    import torch
+
+    torch.set_num_threads(1)
+    manager = app_module.model_manager
+    status = manager.load_all()
+    for name, state in status.items():
+        logger.info(f"预加载{name}模型: {state['status']}（{state['duration_s']}秒）")
+    # 加载线程在子进程中不存在，之后的懒加载由子进程新建线程池
+    manager.shutdown()
+    gc.collect()
+    gc.freeze()
+    return status
+
+
+class PreforkServer:
+    """
+    预加载模型并管理uvicorn工作进程
+
+    主进程只负责加载模型、监听端口和监控工作进程，不处理请求；
+    多个工作进程时，会话和回复音频必须保存在进程间共享的后端（见local_state_errors），否则拒绝启动
+    """
+
+    def __init__(self, app_module, host: str, port: int, workers: int, preload: bool = True,
+                 torch_threads: int = 0, log_level: str = "info", require_shared_state: bool = True):
+        self.app_module = app_module
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.preload = preload and can_preload()
+        self._gpu_skipped_preload = preload and not self.preload
+        self.torch_threads = torch_threads_per_worker(self.workers, torch_threads)
+        self.log_level = log_level
+        self.require_shared_state = require_shared_state
+        self.children: Dict[int, int] = {}  # 进程号 -> 工作进程编号
+        self._sock: Optional[socket.socket] = None
+        self._stopping = False
+
+    def run(self):
+        if self.workers > 1 and self.require_shared_state:
+            errors = local_state_errors(self.app_module.config)
+            if errors:
+                raise RuntimeError(f"不能以{self.workers}个工作进程启动：" + "；".join(errors))
+        if self.preload:
+            logger.info(f"主进程预加载模型，之后fork {self.workers} 个工作进程共享模型内存")
+            preload_models(self.app_module)
+        elif self._gpu_skipped_preload:
+            logger.warning("检测到GPU，CUDA上下文不能跨fork共享，每个工作进程各自加载模型")
+
+        self._sock = self._bind()
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"服务已启动: http://{self.host}:{self.port}（{self.workers} 个工作进程，主进程 {os.getpid()}）")
+        self._supervise()
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            return
+        # 子进程：恢复默认信号处理（uvicorn会安装自己的），运行到退出为止
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self._serve(index)
+        except Exception as e:
+            logger.error(f"工作进程 {index} 异常退出: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _serve(self, index: int):
+        global _worker
+        import torch
+        import uvicorn
+
+        torch.set_num_threads(self.torch_threads)
+        _worker = {"index": index, "pid": os.getpid(), "workers": self.workers, "preloaded": self.preload}
+        server = uvicorn.Server(uvicorn.Config(self.app_module.app, log_level=self.log_level))
+        server.run(sockets=[self._sock])
+
+    def _supervise(self):
+        """
+        等待工作进程退出；非主动停止时重新fork
+        只回收自己fork的工作进程（主进程还可能有模型服务进程等其他子进程，由各自的管理者回收）
+        """
+        while self.children:
+            for pid in list(self.children):
+                try:
+                    done, status = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done, status = pid, 0
+                if not done:
+                    continue
+                index = self.children.pop(pid)
+                if self._stopping:
+                    continue
+                logger.warning(f"工作进程 {index}（{pid}）退出（状态 {status}），1秒后重新启动")
+                time.sleep(1)
+                if not self._stopping:
+                    self._spawn(index)
+            time.sleep(0.2)
+        if self._sock is not None:
+            self._sock.close()
+        logger.info("所有工作进程已退出")
+
+    def _on_signal(self, signum, frame):
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info(f"收到信号 {signum}，停止 {len(self.children)} 个工作进程")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
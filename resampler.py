@@ -0,0 +1,70 @@
+"""
+重采样模块
+缓存torchaudio的Resample实例（内部预先计算好的sinc卷积核），按 (源采样率, 目标采样率, dtype) 复用
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+import torch
+import torchaudio
+
+from audio_buffer import as_tensor
+
+logger = logging.getLogger(__name__)
+
+# VAD和ASR统一使用的采样率
+CANONICAL_SAMPLE_RATE = 16000
+
+
+class ResamplerPool:
+    """Resample实例的LRU缓存（线程安全）"""
+
+    def __init__(self, max_size: int = 8):
+        self.max_size = max(1, max_size)
+        self._cache: "OrderedDict[Tuple[int, int, torch.dtype], torchaudio.transforms.Resample]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, src_rate: int, dst_rate: int, dtype: torch.dtype = torch.float32) -> torchaudio.transforms.Resample:
+        """获取（或创建）指定采样率转换的Resample实例"""
+        key = (int(src_rate), int(dst_rate), dtype)
+        with self._lock:
+            resampler = self._cache.get(key)
+            if resampler is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return resampler
+            self.misses += 1
+
+        # 在锁外计算卷积核，避免阻塞其他采样率的请求
+        resampler = torchaudio.transforms.Resample(key[0], key[1], dtype=dtype)
+        logger.info(f"创建重采样器: {key[0]}Hz -> {key[1]}Hz ({dtype})")
+
+        with self._lock:
+            resampler = self._cache.setdefault(key, resampler)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return resampler
+
+    def resample(self, audio: np.ndarray, src_rate: int, dst_rate: int = CANONICAL_SAMPLE_RATE) -> np.ndarray:
+        """将一维float32音频从src_rate重采样到dst_rate，采样率相同时原样返回"""
+        if src_rate == dst_rate:
+            return audio
+        with torch.no_grad():
+            return self.get(src_rate, dst_rate, torch.float32)(as_tensor(audio)).numpy()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "keys": [f"{src}->{dst}" for src, dst, _ in self._cache.keys()]
+            }
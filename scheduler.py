@@ -0,0 +1,214 @@
+"""
+推理调度模块
+每个模型阶段（VAD、ASR、TTS、音频编解码）使用独立的有界线程池，
+并在事件循环侧做准入控制：排队数超过上限时直接拒绝，避免阻塞整个服务
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """阶段排队已满（或排队超时），调用方应返回503并带上Retry-After"""
+
+    def __init__(self, stage: str, retry_after: int, reason: str = "排队已满"):
+        super().__init__(f"{stage}阶段{reason}，请{retry_after}秒后重试")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StagePool:
+    """单个推理阶段：线程池 + 并发信号量 + 排队统计"""
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"infer-{name}")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # 延迟创建，确保绑定到uvicorn实际运行的事件循环
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    def avg_service_time(self) -> float:
+        """平均单次执行耗时（秒），无数据时返回1秒"""
+        return self.total_service / self.completed if self.completed else 1.0
+
+    def retry_after(self) -> int:
+        """按当前排队长度估算的重试等待秒数"""
+        backlog = self.waiting + self.running
+        return max(1, math.ceil(backlog / self.workers * self.avg_service_time()))
+
+    def stats(self) -> dict:
+        """排队深度与等待时间统计"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.waiting,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "avg_service_ms": round(self.total_service / self.completed * 1000, 2) if self.completed else 0.0
+            }
+
+
+class InferenceScheduler:
+    """按阶段调度阻塞的推理函数，避免在事件循环中直接执行"""
+
+    def __init__(self, stage_workers: Dict[str, int], max_queue: int = 16, queue_timeout: float = 30.0):
+        self.queue_timeout = queue_timeout
+        self.stages = {name: StagePool(name, workers, max_queue) for name, workers in stage_workers.items()}
+
+    async def run(self, stage: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        在指定阶段的线程池中执行func
+
+        Raises:
+            QueueFullError: 排队数已达上限，或排队超过queue_timeout秒
+        """
+        pool = self.stages[stage]
+        if pool.waiting + pool.running >= pool.workers + pool.max_queue:
+            pool.rejected += 1
+            raise QueueFullError(stage, pool.retry_after())
+
+        enqueue_time = time.perf_counter()
+        pool.waiting += 1
+        try:
+            await asyncio.wait_for(pool.semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            pool.rejected += 1
+            raise QueueFullError(stage, pool.retry_after(), reason="排队超时")
+        finally:
+            pool.waiting -= 1
+
+        wait_time = time.perf_counter() - enqueue_time
+        pool.running += 1
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        def release():
+            service_time = time.perf_counter() - start_time
+            pool.running -= 1
+            pool.semaphore.release()
+            with pool._lock:
+                pool.completed += 1
+                pool.total_wait += wait_time
+                pool.max_wait = max(pool.max_wait, wait_time)
+                pool.total_service += service_time
+
+        def on_done(_):
+            # 工作线程执行结束（或未开始执行就被取消）后才归还名额：等待方被取消时（客户端断开、
+            # 实时会话打断）线程仍在执行func，提前归还会让准入控制放进超过线程数的任务
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        # run_in_executor不传递contextvars，手动复制当前上下文（请求级指标等依赖它）
+        context = contextvars.copy_context()
+        try:
+            future = pool.executor.submit(functools.partial(context.run, func, *args, **kwargs))
+        except RuntimeError:
+            release()  # 线程池已关闭
+            raise
+        future.add_done_callback(on_done)
+        if wait_time > 1.0:
+            logger.info(f"{stage}阶段排队 {wait_time:.2f}秒（当前排队 {pool.waiting}）")
+        return await asyncio.wrap_future(future, loop=loop)
+
+    async def iterate(self, stage: str, func: Callable[..., Iterator], *args, max_buffered: int = 2,
+                      **kwargs) -> AsyncIterator:
+        """
+        在指定阶段的线程池中迭代同步生成器func(*args, **kwargs)，逐个产出元素
+
+        整个生成器占用一个工作线程直到结束；最多缓冲max_buffered个元素，消费方（如慢速客户端）
+        跟不上时生成器等待，不会提前算完整段结果。消费方提前退出（如客户端断开）时，
+        还在排队的任务被取消，已经开始的生成器在产出下一个元素后停止
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_buffered))
+        finished = object()
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            """在工作线程中放入队列，队列满时等待消费方取走；消费方已退出时返回False"""
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        return False
+
+        def pump():
+            try:
+                if stop.is_set():
+                    return  # 拿到名额前消费方已经退出，不必再开始执行func
+                for item in func(*args, **kwargs):
+                    if stop.is_set() or not put(item):
+                        break
+            finally:
+                if not stop.is_set():
+                    try:
+                        put(finished)
+                    except RuntimeError:
+                        pass  # 事件循环已关闭
+
+        task = asyncio.ensure_future(self.run(stage, pump))
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    # 任务已结束：失败（如排队已满）时抛出异常，否则继续取出队列中剩余的元素
+                    if task.exception() is not None:
+                        getter.cancel()
+                        raise task.exception()
+                    item = await getter
+                else:
+                    item = getter.result()
+                if item is finished:
+                    break
+                yield item
+            await task
+        finally:
+            stop.set()
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # 消费方提前退出时也取走异常，避免"exception was never retrieved"
+
+    def stats(self) -> dict:
+        """所有阶段的统计信息"""
+        return {name: pool.stats() for name, pool in self.stages.items()}
+
+    def shutdown(self):
+        """关闭所有线程池"""
+        for pool in self.stages.values():
+            pool.executor.shutdown(wait=False)
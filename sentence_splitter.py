@@ -0,0 +1,36 @@
+"""
+流式分句模块
+把LLM逐token输出的文本按中英文句子边界切分，每凑满一句就交给TTS
+"""
+from typing import List
+
+# 句末标点：遇到即切分
+SENTENCE_END_CHARS = set("。！？!?\n")
+# 句中停顿：只有累计长度达到min_chars时才切分，避免过短的片段单独合成
+PAUSE_CHARS = set("，,；;")
+
+
+class SentenceSplitter:
+    """增量分句器：feed()返回已完整的句子，flush()返回剩余文本"""
+
+    def __init__(self, min_chars: int = 6):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """追加增量文本，返回本次新完成的句子"""
+        sentences = []
+        for char in delta:
+            self._buffer += char
+            if char in SENTENCE_END_CHARS or (char in PAUSE_CHARS and len(self._buffer.strip()) >= self.min_chars):
+                sentence = self._buffer.strip()
+                self._buffer = ""
+                if sentence and not all(c in SENTENCE_END_CHARS or c in PAUSE_CHARS for c in sentence):
+                    sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> List[str]:
+        """流结束时返回缓冲区中剩余的文本"""
+        sentence = self._buffer.strip()
+        self._buffer = ""
+        return [sentence] if sentence else []
@@ -0,0 +1,282 @@
+"""
+服务端对话会话存储
+客户端每轮只发送新的一句话和session_id，历史在服务端追加；构建提示词时历史按token预算截取，
+超出预算的早期对话折叠成摘要（后台用LLM总结，失败时退化为截断拼接），上游提示词大小不随对话增长
+"""
+import asyncio
+import importlib
+import logging
+import math
+import re
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每条消息的格式开销（role、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_CJK = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+# 摘要函数：(之前的摘要, 需要折叠的消息) -> 新摘要
+Summarizer = Callable[[str, List[dict]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符每字约1个token，其余字符每4个约1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit_history(history: List[dict], budget: int) -> List[dict]:
+    """
+    按token预算截取历史：开头的system消息（摘要）固定保留，其余从最新的消息往前取，
+    超出预算的早期消息丢弃；以user消息开头，避免只留下半轮对话
+    """
+    pinned = []
+    index = 0
+    while index < len(history) and history[index].get("role") == "system":
+        pinned.append(history[index])
+        index += 1
+    remaining = budget - sum(message_tokens(message) for message in pinned)
+
+    kept = []
+    for message in reversed(history[index:]):
+        cost = message_tokens(message)
+        if cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+    kept.reverse()
+    while kept and kept[0].get("role") != "user":
+        kept.pop(0)
+    return pinned + kept
+
+
+def valid_session_id(session_id: str) -> bool:
+    return bool(_SESSION_ID.match(session_id or ""))
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+class SessionBackend(ABC):
+    """
+    会话存储后端接口：按session_id读写会话数据（可JSON序列化的dict）
+
+    自定义后端（如Redis）继承本类实现三个方法，通过环境变量 SESSION_BACKEND=模块:类名 启用，
+    构造函数接收 ttl_seconds 和 max_sessions 两个关键字参数
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def set(self, session_id: str, data: dict):
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemorySessionBackend(SessionBackend):
+    """进程内会话存储：超过ttl_seconds未使用的会话过期，超过max_sessions时淘汰最久未使用的会话"""
+
+    def __init__(self, ttl_seconds: float = 86400, max_sessions: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        data = self._sessions.get(session_id)
+        if data is None:
+            return None
+        if time.time() - data["updated_at"] > self.ttl_seconds:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return data
+
+    async def set(self, session_id: str, data: dict):
+        self._sessions[session_id] = data
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+
+def load_session_backend(spec: str, ttl_seconds: float, max_sessions: int) -> SessionBackend:
+    """按配置创建后端：memory 或 模块:类名"""
+    if spec == "memory":
+        return InMemorySessionBackend(ttl_seconds=ttl_seconds, max_sessions=max_sessions)
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"无效的SESSION_BACKEND: {spec}（应为 memory 或 模块:类名）")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(backend_class, type) and issubclass(backend_class, SessionBackend)):
+        raise TypeError(f"SESSION_BACKEND必须是session_store.SessionBackend的子类: {spec}")
+    return backend_class(ttl_seconds=ttl_seconds, max_sessions=max_sessions)
+
+
+def truncate_summary(previous: str, messages: List[dict], max_chars: int) -> str:
+    """不调用LLM的摘要：保留之前的摘要并拼接被折叠消息的开头，超出长度时保留最新的部分"""
+    names = {"user": "用户", "assistant": "AI"}
+    parts = [previous] if previous else []
+    for message in messages:
+        content = str(message.get("content", "")).strip()
+        if content:
+            parts.append(f"{names.get(message.get('role'), message.get('role'))}：{content[:40]}")
+    summary = "；".join(parts)
+    return summary[-max_chars:]
+
+
+class SessionStore:
+    """
+    会话存储
+
+    Args:
+        backend: 存储后端
+        token_budget: 构建提示词时历史（含摘要）最多占用的token数（估算）
+        summarizer: 摘要函数，为None时折叠的对话直接截断拼接
+        summary_max_chars: 摘要最大字数
+    """
+
+    def __init__(self, backend: SessionBackend, token_budget: int = 1500,
+                 summarizer: Optional[Summarizer] = None, summary_max_chars: int = 300):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.summary_max_chars = summary_max_chars
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._folding: Dict[str, asyncio.Task] = {}
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def _lock(self, session_id: str) -> asyncio.Lock:
+        """每个会话一把锁（没有协程持有时自动回收）"""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    @staticmethod
+    def _empty() -> dict:
+        now = time.time()
+        return {"summary": "", "turns": [], "created_at": now, "updated_at": now}
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return await self.backend.get(session_id)
+
+    async def create(self) -> str:
+        session_id = new_session_id()
+        await self.backend.set(session_id, self._empty())
+        return session_id
+
+    async def delete(self, session_id: str):
+        task = self._folding.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+        self._locks.pop(session_id, None)
+        await self.backend.delete(session_id)
+
+    async def history(self, session_id: str) -> List[dict]:
+        """会话历史（摘要作为开头的system消息），不存在的会话返回空列表"""
+        data = await self.backend.get(session_id)
+        if data is None:
+            return []
+        messages = []
+        if data["summary"]:
+            messages.append({"role": "system", "content": f"此前对话的摘要：{data['summary']}"})
+        messages.extend(data["turns"])
+        return messages
+
+    async def append(self, session_id: str, user_text: str, ai_reply: str):
+        """追加一轮对话；历史超出预算时在后台把早期对话折叠进摘要"""
+        async with self._lock(session_id):
+            data = await self.backend.get(session_id) or self._empty()
+            data["turns"].append({"role": "user", "content": user_text})
+            data["turns"].append({"role": "assistant", "content": ai_reply})
+            data["updated_at"] = time.time()
+            await self.backend.set(session_id, data)
+
+        tokens = sum(message_tokens(message) for message in data["turns"])
+        if tokens > self.token_budget and session_id not in self._folding:
+            self._folding[session_id] = asyncio.ensure_future(self._fold(session_id))
+
+    async def _fold(self, session_id: str):
+        """把最早的若干轮对话折叠进摘要，直到剩余对话不超过预算的一半（留出余量，避免每轮都总结）"""
+        try:
+            data = await self.backend.get(session_id)
+            if data is None:
+                return
+            turns = data["turns"]
+            remaining = sum(message_tokens(message) for message in turns)
+            count = 0
+            while count < len(turns) and remaining > self.token_budget // 2:
+                remaining -= message_tokens(turns[count])
+                count += 1
+            # 按整轮折叠（user + assistant）
+            count += count % 2
+            if count == 0:
+                return
+            folded = turns[:count]
+            previous = data["summary"]
+            created_at = data.get("created_at")
+
+            summary = None
+            if self.summarizer is not None:
+                try:
+                    summary = (await self.summarizer(previous, folded)).strip()[:self.summary_max_chars]
+                    self.summaries += 1
+                except Exception as e:
+                    self.summary_failures += 1
+                    logger.warning(f"会话摘要生成失败，改用截断拼接: {e}")
+            if not summary:
+                summary = truncate_summary(previous, folded, self.summary_max_chars)
+
+            async with self._lock(session_id):
+                # 总结期间可能追加了新的对话，只移除已折叠的部分；会话被删除重建、重置或已被折叠过时
+                # 开头的对话不再是总结的那些，放弃这次折叠（下一轮对话会重新检查）
+                data = await self.backend.get(session_id)
+                if (data is None or data.get("created_at") != created_at or data["summary"] != previous
+                        or data["turns"][:count] != folded):
+                    logger.debug(f"会话{session_id}在总结期间已改变，放弃折叠")
+                    return
+                data["turns"] = data["turns"][count:]
+                data["summary"] = summary
+                await self.backend.set(session_id, data)
+            logger.debug(f"会话{session_id}折叠了{count}条消息")
+        finally:
+            self._folding.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {
+            **self.backend.stats(),
+            "token_budget": self.token_budget,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "folding": len(self._folding)
+        }
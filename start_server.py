@@ -1,16 +1,54 @@
 """
 启动服务器脚本
+WORKERS>1时以多进程方式启动：主进程预加载模型后fork工作进程（见prefork.py）
+MODEL_SERVER_ENABLED=True时先启动ASR/TTS模型服务进程池（见model_server.py），API进程只转发推理任务
 """
+import logging
+
 import uvicorn
 from config import Config
 
+
+def start_model_servers(config: Config) -> list:
+    """拆分部署时启动ASR和TTS服务进程池（MODEL_SERVER_AUTOSTART=False时由外部单独启动）"""
+    if not (config.MODEL_SERVER_ENABLED and config.MODEL_SERVER_AUTOSTART):
+        return []
+    from model_server import ASR, TTS, ModelServerPool
+
+    logging.basicConfig(level=logging.INFO)
+    pools = [
+        ModelServerPool(ASR, config.ASR_SERVER_WORKERS, config.MODEL_SERVER_DIR),
+        ModelServerPool(TTS, config.TTS_SERVER_WORKERS, config.MODEL_SERVER_DIR)
+    ]
+    for pool in pools:
+        pool.start()
+    return pools
+
+
 if __name__ == "__main__":
     config = Config()
-    uvicorn.run(
-        "app:app",
-        host=config.HOST,
-        port=config.PORT,
-        reload=config.DEBUG,
-        log_level="info"
-    )
+    pools = start_model_servers(config)
+    try:
+        if config.WORKERS > 1:
+            import app
+            from prefork import PreforkServer
 
+            PreforkServer(
+                app,
+                host=config.HOST,
+                port=config.PORT,
+                workers=config.WORKERS,
+                preload=config.WORKERS_PRELOAD,
+                torch_threads=config.WORKER_TORCH_THREADS
+            ).run()
+        else:
+            uvicorn.run(
+                "app:app",
+                host=config.HOST,
+                port=config.PORT,
+                reload=config.DEBUG,
+                log_level="info"
+            )
+    finally:
+        for pool in pools:
+            pool.stop()
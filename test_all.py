@@ -8,6 +8,9 @@ import os
 import sys
 from pathlib import Path
 
+# 回复音频保存为.wav文件，显式请求WAV格式（默认格式可通过TTS_OUTPUT_FORMAT改为其他格式）
+WAV_ACCEPT = {"Accept": "audio/wav"}
+
 class TestClient:
     """测试客户端"""
     
@@ -87,6 +90,7 @@ class TestClient:
             response = requests.post(
                 f"{self.base_url}/api/chat/text",
                 json=data,
+                headers=WAV_ACCEPT,
                 timeout=60
             )
             
@@ -164,6 +168,7 @@ class TestClient:
                     f"{self.base_url}/api/chat/audio",
                     files=files,
                     data=data,
+                    headers=WAV_ACCEPT,
                     timeout=120  # 音频处理可能需要更长时间
                 )
             
@@ -7,6 +7,9 @@ import json
 
 BASE_URL = "http://localhost:8000"
 
+# 回复音频保存为.wav文件，显式请求WAV格式（默认格式可通过TTS_OUTPUT_FORMAT改为其他格式）
+WAV_ACCEPT = {"Accept": "audio/wav"}
+
 def test_health():
     """测试健康检查接口"""
     print("=" * 50)
@@ -59,7 +62,7 @@ def test_tts():
     data = {
         "text": "你好，这是TTS测试"
     }
-    response = requests.post(f"{BASE_URL}/api/audio/tts", json=data)
+    response = requests.post(f"{BASE_URL}/api/audio/tts", json=data, headers=WAV_ACCEPT)
     print(f"状态码: {response.status_code}")
     if response.status_code == 200:
         # 保存音频文件
@@ -100,7 +103,7 @@ def test_complete_with_audio(audio_file_path):
         with open(audio_file_path, "rb") as f:
             files = {"audio": f}
             data = {"conversation_history": "[]"}
-            response = requests.post(f"{BASE_URL}/api/complete/audio", files=files, data=data)
+            response = requests.post(f"{BASE_URL}/api/complete/audio", files=files, data=data, headers=WAV_ACCEPT)
         print(f"状态码: {response.status_code}")
         if response.status_code == 200:
             # 保存音频文件
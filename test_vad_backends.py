@@ -0,0 +1,90 @@
+"""
+VAD推理后端一致性测试
+以voice.wav为输入，比较ONNX Runtime后端（导出的序列模型，以及int8量化版本）与PyTorch后端（BatchVAD）的每帧语音概率，
+超出容差时失败。需要安装torch、torchaudio、silero-vad、onnx和onnxruntime
+
+用法:
+    python -m pytest test_vad_backends.py
+    python test_vad_backends.py
+"""
+import os
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from config import Config
+from model_paths import load_silero_vad
+from onnx_runtime import quantize_dynamic_int8
+from resampler import CANONICAL_SAMPLE_RATE, ResamplerPool
+from vad_engine import INT8_OP_TYPES, BatchVAD, OnnxVAD, VADStream, export_sequence_onnx, sequence_onnx_path
+
+VOICE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "voice.wav")
+
+# fp32 ONNX与PyTorch每帧概率的最大误差
+ONNX_MAX_DIFF = 1e-3
+# int8只量化LSTM：每帧概率的平均误差上限，以及按VAD_THRESHOLD判定语音/非语音的一致率下限
+INT8_MAX_MEAN_DIFF = 0.02
+INT8_MIN_AGREEMENT = 0.99
+
+_cache = {}
+
+
+def load_voice() -> np.ndarray:
+    """voice.wav的第一个声道，重采样到16000Hz"""
+    audio, sample_rate = sf.read(VOICE_PATH, dtype="float32", always_2d=True)
+    return ResamplerPool().resample(np.ascontiguousarray(audio[:, 0]), sample_rate, CANONICAL_SAMPLE_RATE)
+
+
+def engines():
+    """(PyTorch引擎, ONNX引擎, onnx-int8引擎)，序列模型导出到临时目录，所有测试共用"""
+    if not _cache:
+        model = load_silero_vad(Config.VAD_MODEL_REPO, Config.VAD_MODEL_PATH, Config.MODEL_OFFLINE)
+        torch_engine = BatchVAD(model, CANONICAL_SAMPLE_RATE)
+        assert torch_engine.vectorized, "PyTorch后端没有启用向量化路径"
+        tmp_dir = tempfile.mkdtemp(prefix="vad_onnx_")
+        model_path = export_sequence_onnx(model, sequence_onnx_path(tmp_dir))
+        int8_path = quantize_dynamic_int8(model_path, tmp_dir, INT8_OP_TYPES)
+        _cache["engines"] = (torch_engine, OnnxVAD(model_path), OnnxVAD(int8_path))
+    return _cache["engines"]
+
+
+def test_onnx_matches_torch():
+    torch_engine, onnx_engine, _ = engines()
+    audio = load_voice()
+    reference = torch_engine.frame_probs(audio)
+    probs = onnx_engine.frame_probs(audio)
+    assert probs.shape == reference.shape
+    diff = float(np.abs(probs - reference).max())
+    assert diff <= ONNX_MAX_DIFF, f"ONNX与PyTorch的每帧概率最大误差 {diff:.2e} 超过 {ONNX_MAX_DIFF:.0e}"
+
+
+def test_onnx_int8_matches_torch():
+    torch_engine, _, int8_engine = engines()
+    audio = load_voice()
+    reference = torch_engine.frame_probs(audio)
+    probs = int8_engine.frame_probs(audio)
+    assert probs.shape == reference.shape
+    mean_diff = float(np.abs(probs - reference).mean())
+    agreement = float(((probs >= Config.VAD_THRESHOLD) == (reference >= Config.VAD_THRESHOLD)).mean())
+    assert mean_diff <= INT8_MAX_MEAN_DIFF, f"onnx-int8每帧概率平均误差 {mean_diff:.3f} 超过 {INT8_MAX_MEAN_DIFF}"
+    assert agreement >= INT8_MIN_AGREEMENT, f"onnx-int8判定一致率 {agreement:.2%} 低于 {INT8_MIN_AGREEMENT:.0%}"
+
+
+def test_onnx_stream_matches_whole():
+    """ONNX流式计算（LSTM状态跨调用传递）与整段计算一致"""
+    _, onnx_engine, _ = engines()
+    audio = load_voice()
+    chunk = 3 * onnx_engine.frame_size
+    audio = audio[:len(audio) // chunk * chunk]
+    stream = VADStream(onnx_engine)
+    streamed = np.concatenate([stream.feed(audio[i:i + chunk]) for i in range(0, len(audio), chunk)])
+    whole = onnx_engine.frame_probs(audio)
+    diff = float(np.abs(streamed - whole).max())
+    assert diff <= ONNX_MAX_DIFF, f"流式与整段计算的每帧概率最大误差 {diff:.2e}"
+
+
+if __name__ == "__main__":
+    for test in (test_onnx_matches_torch, test_onnx_int8_matches_torch, test_onnx_stream_matches_whole):
+        test()
+        print(f"✓ {test.__name__}")
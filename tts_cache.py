@@ -0,0 +1,187 @@
+"""
+TTS输出缓存
+按（规范化文本、音色、模型、采样率、输出格式）的哈希缓存编码好的音频字节：
+内存中是按字节预算淘汰的LRU，可选的磁盘层按总大小淘汰最久未使用的文件。
+命中时跳过合成和编码，直接返回字节
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from metrics import TTS_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """缓存键使用的文本规范化：全角/半角统一（NFKC），去掉首尾空白，连续空白合并为一个空格"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class TTSCache:
+    """
+    两级TTS输出缓存（线程安全）
+
+    Args:
+        max_bytes: 内存缓存的字节预算，为0时不使用内存层
+        disk_dir: 磁盘缓存目录，为None时不使用磁盘层
+        disk_max_bytes: 磁盘缓存的总大小上限
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir if disk_dir and disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @staticmethod
+    def key(text: str, voice_id: str, model_id: str, sample_rate: int, audio_format: str) -> str:
+        digest = hashlib.sha256()
+        for part in (normalize_text(text), voice_id, model_id, str(sample_rate), audio_format):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @property
+    def disk_enabled(self) -> bool:
+        return self.disk_dir is not None
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        """只查内存层（不做IO，可以在事件循环中直接调用）；未命中时不计数，由get_disk或miss计数"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+        if data is not None:
+            TTS_CACHE_REQUESTS.inc(result="memory_hit")
+        return data
+
+    def get_disk(self, key: str) -> Optional[bytes]:
+        """查磁盘层，命中时放回内存层（阻塞IO，应在线程池中调用）"""
+        data = None
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)  # 修改时间作为最近使用时间，淘汰时按它排序
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"TTS缓存读取失败: {e}")
+
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            TTS_CACHE_REQUESTS.inc(result="miss")
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        TTS_CACHE_REQUESTS.inc(result="disk_hit")
+        self._put_memory(key, data)
+        return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        """先查内存层再查磁盘层"""
+        data = self.get_memory(key)
+        return data if data is not None else self.get_disk(key)
+
+    def put(self, key: str, data: bytes):
+        """写入内存层和磁盘层（磁盘写入是阻塞IO，开启磁盘层时应在线程池中调用）"""
+        self._put_memory(key, data)
+        if self.disk_dir:
+            self._put_disk(key, data)
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _disk_files(self):
+        """磁盘缓存文件 (路径, 大小, 修改时间)"""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _put_disk(self, key: str, data: bytes):
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        with self._disk_lock:
+            try:
+                if os.path.exists(path):
+                    return
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(data)
+                if self._disk_bytes > self.disk_max_bytes:
+                    self._evict_disk()
+            except OSError as e:
+                logger.warning(f"TTS缓存写入磁盘失败: {e}")
+
+    def _evict_disk(self):
+        """按最近使用时间删除文件，直到总大小降到上限的90%（避免每次写入都扫描目录）"""
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes if self.disk_dir else None,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,382 @@
+"""
+批量VAD推理引擎
+一次性将整段音频分帧（unfold），按块批量计算silero-vad的每帧语音概率，
+并根据概率切分出语音区间；推理后端可以是PyTorch（BatchVAD）或ONNX Runtime（OnnxVAD）
+"""
+import inspect
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+
+from audio_buffer import as_tensor, concat
+from onnx_runtime import create_session
+
+logger = logging.getLogger(__name__)
+
+
+class BatchVAD:
+    """
+    silero-vad批量推理封装
+
+    silero-vad（v6）的结构是 STFT -> 卷积编码器 -> LSTMCell解码器：
+    - STFT和编码器只依赖当前帧（512采样点 + 64采样点上下文），可以对所有帧批量计算
+    - LSTM是唯一的循环部分，用权重相同的 nn.LSTM 对整段序列一次计算，保证隐状态按时间顺序正确传递
+
+    向量化路径依赖silero的内部模块，初始化时用一小段噪声做一次探测推理，与逐帧调用的结果比对；
+    如果模型结构不符合预期（例如ONNX版本或内部结构变化）或结果不一致，退回逐帧调用模型，
+    但仍然只在最后做一次同步，不再每帧 .item()。
+    """
+
+    PROBE_FRAMES = 8
+    PROBE_TOLERANCE = 1e-3
+
+    def __init__(self, model, sample_rate: int = 16000, block_frames: int = 1024):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.frame_size = 512 if sample_rate == 16000 else 256
+        self.block_frames = max(1, block_frames)
+
+        self._inner = None
+        self._lstm = None
+        self._lock = threading.Lock()  # 逐帧模式依赖模型内部状态，需要串行
+        self.context_size = 64 if sample_rate == 16000 else 32
+        try:
+            inner = model._model if sample_rate == 16000 else model._model_8k
+            rnn = inner.decoder.rnn
+            lstm = torch.nn.LSTM(rnn.weight_ih.shape[1], rnn.weight_hh.shape[1], batch_first=True)
+            with torch.no_grad():
+                lstm.weight_ih_l0.copy_(rnn.weight_ih)
+                lstm.weight_hh_l0.copy_(rnn.weight_hh)
+                lstm.bias_ih_l0.copy_(rnn.bias_ih)
+                lstm.bias_hh_l0.copy_(rnn.bias_hh)
+            lstm.eval()
+            self.context_size = int(inner.context_size_samples)
+            self._inner = inner
+            self._lstm = lstm
+            self._probe()
+            logger.info("VAD批量推理已启用（向量化编码器 + 序列LSTM）")
+        except Exception as e:
+            self._inner = None
+            self._lstm = None
+            logger.warning(f"VAD模型结构不支持批量推理，退回逐帧模式: {e}")
+
+    def _probe(self):
+        """用几帧固定的噪声比对向量化路径和逐帧路径的概率，不一致时抛出异常"""
+        generator = torch.Generator().manual_seed(0)
+        audio = torch.randn(self.PROBE_FRAMES * self.frame_size, generator=generator) * 0.1
+        with torch.no_grad():
+            vectorized, _ = self._vectorized_probs(audio, self.PROBE_FRAMES, 0)
+            sequential = self._sequential_probs(audio, self.PROBE_FRAMES, 0)
+        if vectorized.shape != sequential.shape:
+            raise RuntimeError(f"探测推理帧数不一致: {tuple(vectorized.shape)} != {tuple(sequential.shape)}")
+        diff = float((vectorized - sequential).abs().max())
+        if not diff <= self.PROBE_TOLERANCE:
+            raise RuntimeError(f"探测推理与逐帧结果不一致（最大误差 {diff:.4g}）")
+
+    @property
+    def vectorized(self) -> bool:
+        """是否使用向量化路径"""
+        return self._inner is not None
+
+    def frame_probs(self, audio: Union[np.ndarray, torch.Tensor]) -> np.ndarray:
+        """
+        计算每帧的语音概率
+
+        Args:
+            audio: 单声道音频，采样率必须为 self.sample_rate
+
+        Returns:
+            形状为 [帧数] 的 float32 数组，第i个值对应 audio[i*frame_size:(i+1)*frame_size]
+        """
+        # float32连续数组直接共享内存，不再复制
+        if isinstance(audio, np.ndarray):
+            audio = as_tensor(audio)
+        elif audio.dtype != torch.float32:
+            audio = audio.float()
+
+        # 向上取整到整数帧，末尾补零
+        num_frames = max(1, (audio.shape[0] + self.frame_size - 1) // self.frame_size)
+        tail_padding = num_frames * self.frame_size - audio.shape[0]
+
+        with torch.no_grad():
+            if self.vectorized:
+                probs, _ = self._vectorized_probs(audio, num_frames, tail_padding)
+            else:
+                probs = self._sequential_probs(audio, num_frames, tail_padding)
+        return probs.numpy().astype(np.float32, copy=False)
+
+    def stream_probs(self, audio: np.ndarray, state=None):
+        """
+        流式计算新到音频（长度为frame_size的整数倍）的每帧概率，只在向量化路径下可用
+        state为上一次调用返回的 (上下文采样点, LSTM状态)，第一次调用传None
+        """
+        chunk = as_tensor(audio)
+        context, hidden = state if state is not None else (None, None)
+        with torch.no_grad():
+            probs, hidden = self._vectorized_probs(chunk, len(audio) // self.frame_size, 0, context, hidden)
+        return probs.numpy().astype(np.float32, copy=False), (chunk[-self.context_size:], hidden)
+
+    def _vectorized_probs(self, audio: torch.Tensor, num_frames: int, tail_padding: int,
+                          context: Optional[torch.Tensor] = None, hidden=None):
+        """
+        向量化路径：unfold分帧 -> 按块批量编码 -> LSTM序列解码
+        context/hidden为上一次调用留下的上下文采样点和LSTM状态（流式调用时传入），返回 (概率, LSTM状态)
+        """
+        # 每帧前面拼接上一帧末尾的 context_size 个采样点（第一帧为零），与模型流式调用的输入一致
+        if context is None:
+            padded = torch.nn.functional.pad(audio, (self.context_size, tail_padding))
+        else:
+            padded = torch.nn.functional.pad(torch.cat([context, audio]), (0, tail_padding))
+        frames = padded.unfold(0, self.frame_size + self.context_size, self.frame_size)
+
+        inner = self._inner
+        outputs = []
+        for start in range(0, num_frames, self.block_frames):
+            block = frames[start:start + self.block_frames]
+            features = inner.encoder(inner.run_extractors(block))
+            # [块帧数, 128, 1] -> [1, 块帧数, 128]，LSTM状态跨块传递
+            seq, hidden = self._lstm(features.squeeze(-1).unsqueeze(0), hidden)
+            out = inner.decoder.decoder(seq.squeeze(0).unsqueeze(-1))
+            outputs.append(out.squeeze(1).mean(dim=1))
+        return torch.cat(outputs), hidden
+
+    def _sequential_probs(self, audio: torch.Tensor, num_frames: int, tail_padding: int) -> torch.Tensor:
+        """兜底路径：逐帧调用模型，结果保留为tensor，最后统一同步"""
+        padded = torch.nn.functional.pad(audio, (0, tail_padding))
+        frames = padded.view(num_frames, self.frame_size)
+        with self._lock:
+            if hasattr(self.model, "reset_states"):
+                self.model.reset_states()
+            outputs = [self.model(frames[i:i + 1], self.sample_rate).reshape(-1) for i in range(num_frames)]
+            if hasattr(self.model, "reset_states"):
+                self.model.reset_states()
+        return torch.cat(outputs)
+
+
+# int8量化只量化LSTM：STFT和编码器卷积量化后（ConvInteger）概率误差接近1，无法使用
+INT8_OP_TYPES = ("LSTM",)
+
+
+# 由silero-vad（JIT）权重导出的16kHz序列ONNX模型的文件名
+SEQUENCE_ONNX_NAME = "silero_vad_16k_sequence.onnx"
+
+
+def sequence_onnx_path(cache_dir: Optional[str]) -> str:
+    """导出的序列ONNX模型的保存路径（ONNX_CACHE_DIR下）"""
+    return os.path.join(cache_dir or ".", SEQUENCE_ONNX_NAME)
+
+
+class _SequenceVAD(torch.nn.Module):
+    """BatchVAD向量化路径的导出包装：[帧数, 512 + 64] 的帧和LSTM状态 (h, c) -> (每帧概率, h, c)"""
+
+    def __init__(self, engine: BatchVAD):
+        super().__init__()
+        self.inner = engine._inner
+        self.lstm = engine._lstm
+
+    def forward(self, frames: torch.Tensor, h: torch.Tensor, c: torch.Tensor):
+        features = self.inner.encoder(self.inner.run_extractors(frames))
+        seq, (h, c) = self.lstm(features.squeeze(-1).unsqueeze(0), (h, c))
+        out = self.inner.decoder.decoder(seq.squeeze(0).unsqueeze(-1))
+        return out.squeeze(1).mean(dim=1), h, c
+
+
+def export_sequence_onnx(model, output_path: str) -> str:
+    """
+    用silero-vad（JIT）的权重导出OnnxVAD使用的16kHz序列ONNX模型（输入 input/h/c），返回模型路径
+
+    silero-vad包自带的ONNX模型是逐帧调用的 input/state/sr 接口，不能一次输入多帧，所以从JIT模型导出；
+    导出结构与BatchVAD的向量化路径相同，模型结构不支持向量化路径时抛出RuntimeError
+    """
+    engine = BatchVAD(model, 16000)
+    if not engine.vectorized:
+        raise RuntimeError("silero-vad模型结构不支持向量化推理，无法导出序列ONNX模型")
+    module = _SequenceVAD(engine).eval()
+    frames = torch.zeros(4, engine.frame_size + engine.context_size)
+    hidden = torch.zeros(1, 1, engine._lstm.hidden_size)
+
+    # torch 2.9起默认使用dynamo导出，JIT子模块需要原来的TorchScript导出
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"  # 多个进程同时导出时互不覆盖
+    logger.info(f"导出silero-vad序列ONNX模型: {output_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            module, (frames, hidden, hidden), tmp_path,
+            input_names=["input", "h", "c"], output_names=["output", "hn", "cn"],
+            dynamic_axes={"input": {0: "frames"}, "output": {0: "frames"}},
+            opset_version=17, **options
+        )
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class OnnxVAD:
+    """
+    silero-vad的ONNX Runtime推理，接口与BatchVAD相同
+
+    使用export_sequence_onnx导出的序列模型：输入 [帧数, 512 + 64] 的帧（与BatchVAD向量化路径相同的分帧方式），
+    LSTM状态 (h, c) 作为输入输出，按块计算时跨块传递；只支持16000Hz。
+    InferenceSession.run可以并发调用，不需要加锁
+    """
+
+    vectorized = True
+
+    def __init__(self, model_path: str, sample_rate: int = 16000, block_frames: int = 1024,
+                 intra_op_threads: int = 0, inter_op_threads: int = 0):
+        if sample_rate != 16000:
+            raise ValueError(f"ONNX VAD只支持16000Hz采样率（当前{sample_rate}Hz）")
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.frame_size = 512
+        self.context_size = 64
+        self.block_frames = max(1, block_frames)
+        self.session = create_session(model_path, intra_op_threads, inter_op_threads)
+        self._hidden_size = self.session.get_inputs()[1].shape[-1]
+        logger.info(f"VAD ONNX推理已启用: {model_path}")
+
+    def frame_probs(self, audio: Union[np.ndarray, torch.Tensor]) -> np.ndarray:
+        """计算每帧的语音概率，返回形状为 [帧数] 的 float32 数组"""
+        if isinstance(audio, torch.Tensor):
+            audio = audio.detach().cpu().numpy()
+        num_frames = max(1, (len(audio) + self.frame_size - 1) // self.frame_size)
+        # 前面补context_size个零、末尾补齐整数帧，只复制一次
+        padded = np.zeros(self.context_size + num_frames * self.frame_size, dtype=np.float32)
+        padded[self.context_size:self.context_size + len(audio)] = audio
+        probs, _ = self._run(padded, num_frames, None)
+        return probs
+
+    def stream_probs(self, audio: np.ndarray, state=None):
+        """
+        流式计算新到音频（长度为frame_size的整数倍）的每帧概率
+        state为上一次调用返回的 (上下文采样点, LSTM状态)，第一次调用传None
+        """
+        context, hidden = state if state is not None else (np.zeros(self.context_size, dtype=np.float32), None)
+        padded = concat([context, np.asarray(audio, dtype=np.float32)])
+        probs, hidden = self._run(padded, len(audio) // self.frame_size, hidden)
+        return probs, (padded[-self.context_size:].copy(), hidden)
+
+    def _run(self, padded: np.ndarray, num_frames: int, hidden):
+        """padded为带前置上下文的音频，按块推理，返回 (概率, LSTM状态)"""
+        frames = np.lib.stride_tricks.sliding_window_view(padded, self.frame_size + self.context_size)[::self.frame_size]
+        if hidden is None:
+            hidden = (np.zeros((1, 1, self._hidden_size), dtype=np.float32),
+                      np.zeros((1, 1, self._hidden_size), dtype=np.float32))
+        h, c = hidden
+        outputs = []
+        for start in range(0, num_frames, self.block_frames):
+            block = np.ascontiguousarray(frames[start:min(start + self.block_frames, num_frames)])
+            probs, h, c = self.session.run(None, {"input": block, "h": h, "c": c})
+            outputs.append(probs.reshape(-1))
+        return concat(outputs).astype(np.float32, copy=False), (h, c)
+
+
+class VADStream:
+    """
+    流式VAD：音频按到达顺序分批喂入，LSTM状态和帧间上下文跨调用保留，
+    结果与对整段音频调用 frame_probs 一致
+
+    引擎不支持向量化路径时（逐帧模式或其他实现），对最近max_history_seconds秒的音频重新计算，
+    只返回新增帧的概率
+    """
+
+    def __init__(self, engine, max_history_seconds: float = 10.0):
+        self.engine = engine
+        self.frame_size = engine.frame_size
+        self.max_history_frames = max(1, int(max_history_seconds * getattr(engine, "sample_rate", 16000) / self.frame_size))
+        self._state = None  # 引擎的流式状态（帧间上下文和LSTM状态）
+        self._history: List[np.ndarray] = []
+        self._frames_done = 0
+
+    def feed(self, audio: np.ndarray) -> np.ndarray:
+        """
+        计算新到音频的每帧语音概率
+
+        Args:
+            audio: float32单声道音频，长度必须是frame_size的整数倍
+        """
+        num_frames = len(audio) // self.frame_size
+        if num_frames == 0:
+            return np.zeros(0, dtype=np.float32)
+        if len(audio) != num_frames * self.frame_size:
+            raise ValueError(f"流式VAD输入长度必须是{self.frame_size}的整数倍")
+
+        engine = self.engine
+        if getattr(engine, "vectorized", False):
+            probs, self._state = engine.stream_probs(audio, self._state)
+            return probs
+
+        self._history.append(audio)
+        # 只保留最近的音频，丢弃的帧从已计算帧数中扣除
+        while len(self._history) > 1 and self._frames_done + num_frames > self.max_history_frames:
+            self._frames_done -= len(self._history.pop(0)) // self.frame_size
+        probs = engine.frame_probs(concat(self._history))
+        new_probs = probs[self._frames_done:self._frames_done + num_frames]
+        self._frames_done += num_frames
+        return new_probs
+
+    def reset(self):
+        """清空状态（开始新的一段语音）"""
+        self._state = None
+        self._history.clear()
+        self._frames_done = 0
+
+
+def speech_segments(
+    speech_probs: np.ndarray,
+    num_samples: int,
+    frame_size: int = 512,
+    sample_rate: int = 16000,
+    threshold: float = 0.5,
+    min_speech_ms: int = 250,
+    min_silence_ms: int = 300,
+    speech_pad_ms: int = 200,
+) -> List[Tuple[int, int]]:
+    """
+    根据每帧语音概率计算语音区间（采样点下标，左闭右开）
+
+    与silero的get_speech_timestamps规则一致：不低于threshold开始语音，
+    低于threshold-0.15且持续min_silence_ms才结束；短于min_speech_ms的区间丢弃；
+    每个区间两侧各扩展speech_pad_ms，扩展后重叠的区间合并。
+    """
+    neg_threshold = max(threshold - 0.15, 0.01)
+    min_speech_samples = sample_rate * min_speech_ms // 1000
+    min_silence_samples = sample_rate * min_silence_ms // 1000
+    pad_samples = sample_rate * speech_pad_ms // 1000
+
+    segments = []
+    triggered = False
+    start = 0
+    temp_end = 0
+    for i, prob in enumerate(np.asarray(speech_probs).tolist()):
+        position = i * frame_size
+        if prob >= threshold:
+            temp_end = 0
+            if not triggered:
+                triggered = True
+                start = position
+        elif prob < neg_threshold and triggered:
+            if not temp_end:
+                temp_end = position
+            if position - temp_end >= min_silence_samples:
+                if temp_end - start >= min_speech_samples:
+                    segments.append((start, temp_end))
+                triggered = False
+                temp_end = 0
+    if triggered and num_samples - start >= min_speech_samples:
+        segments.append((start, num_samples))
+
+    # 两侧扩展并合并重叠区间
+    merged = []
+    for seg_start, seg_end in segments:
+        seg_start = max(0, seg_start - pad_samples)
+        seg_end = min(num_samples, seg_end + pad_samples)
+        if merged and seg_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], seg_end))
+        else:
+            merged.append((seg_start, seg_end))
+    return merged
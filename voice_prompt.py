@@ -0,0 +1,161 @@
+"""
+零样本TTS音色提示缓存
+参考音频的说话人特征（speaker embedding、prompt speech tokens、prompt mel）每个音色只提取一次：
+内存中注册到CosyVoice的 frontend.spk2info，磁盘上按内容哈希缓存，重启后直接加载
+"""
+import hashlib
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class VoicePrompt:
+    """一个已注册的音色：参考音频、提示文本和内容哈希生成的spk_id"""
+
+    def __init__(self, ref_audio: str, prompt_text: str, spk_id: str, precomputed: bool):
+        self.ref_audio = ref_audio
+        self.prompt_text = prompt_text
+        self.spk_id = spk_id
+        self.precomputed = precomputed  # False表示模型不支持预计算，每次仍传入参考音频路径
+
+    def to_dict(self) -> dict:
+        return {
+            "spk_id": self.spk_id,
+            "ref_audio": self.ref_audio,
+            "precomputed": self.precomputed
+        }
+
+
+class VoicePromptRegistry:
+    """音色提示注册表（线程安全）"""
+
+    def __init__(self, cache_dir: Optional[str], model_id: str):
+        self.cache_dir = cache_dir
+        self.model_id = model_id
+        self.tts_model = None
+        self._voices: Dict[str, VoicePrompt] = {}
+        self._lock = threading.Lock()
+        # 每个音色的副本：已创建的副本数和当前空闲的副本编号
+        self._replica_counts: Dict[str, int] = {}
+        self._free_replicas: Dict[str, List[int]] = {}
+        self._lease_lock = threading.Lock()
+
+    def bind(self, tts_model):
+        """绑定TTS模型，清空已注册的音色"""
+        with self._lock:
+            self.tts_model = tts_model
+            self._voices.clear()
+        with self._lease_lock:
+            self._replica_counts.clear()
+            self._free_replicas.clear()
+
+    @property
+    def supported(self) -> bool:
+        """模型是否支持预计算音色（CosyVoice的add_zero_shot_spk）"""
+        return (self.tts_model is not None
+                and callable(getattr(self.tts_model, "add_zero_shot_spk", None))
+                and hasattr(getattr(self.tts_model, "frontend", None), "spk2info"))
+
+    def voice_id(self, ref_audio: str, prompt_text: str) -> str:
+        """按参考音频内容、提示文本和模型ID计算音色ID"""
+        digest = hashlib.sha256()
+        with open(ref_audio, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(prompt_text.encode("utf-8"))
+        digest.update(self.model_id.encode("utf-8"))
+        return f"voice_{digest.hexdigest()[:16]}"
+
+    def peek(self, ref_audio: str, prompt_text: str) -> Optional[VoicePrompt]:
+        """已注册的音色，未注册时返回None（不提取特征）"""
+        return self._voices.get(f"{ref_audio}\0{prompt_text}")
+
+    def get(self, ref_audio: str, prompt_text: str) -> VoicePrompt:
+        """获取音色，首次使用时计算（或从磁盘缓存加载）说话人特征"""
+        key = f"{ref_audio}\0{prompt_text}"
+        voice = self._voices.get(key)
+        if voice is not None:
+            return voice
+
+        with self._lock:
+            voice = self._voices.get(key)
+            if voice is None:
+                voice = self._register(ref_audio, prompt_text)
+                self._voices[key] = voice
+        return voice
+
+    def _register(self, ref_audio: str, prompt_text: str) -> VoicePrompt:
+        spk_id = self.voice_id(ref_audio, prompt_text)
+        if not self.supported:
+            logger.info(f"TTS模型不支持预计算音色，每次合成时处理参考音频: {ref_audio}")
+            return VoicePrompt(ref_audio, prompt_text, spk_id, precomputed=False)
+
+        spk2info = self.tts_model.frontend.spk2info
+        cache_path = os.path.join(self.cache_dir, f"{spk_id}.pt") if self.cache_dir else None
+
+        if spk_id not in spk2info and cache_path and os.path.exists(cache_path):
+            try:
+                spk2info[spk_id] = torch.load(cache_path, map_location="cpu")
+                logger.info(f"从磁盘缓存加载音色特征: {cache_path}")
+            except Exception as e:
+                logger.warning(f"音色缓存加载失败，将重新计算: {e}")
+
+        if spk_id not in spk2info:
+            logger.info(f"提取音色特征: {ref_audio} -> {spk_id}")
+            self.tts_model.add_zero_shot_spk(prompt_text, ref_audio, spk_id)
+            if cache_path:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = f"{cache_path}.tmp"
+                    torch.save(spk2info[spk_id], tmp_path)
+                    os.replace(tmp_path, cache_path)
+                    logger.info(f"音色特征已缓存: {cache_path}")
+                except Exception as e:
+                    logger.warning(f"音色特征写入磁盘缓存失败: {e}")
+
+        return VoicePrompt(ref_audio, prompt_text, spk_id, precomputed=True)
+
+    @contextmanager
+    def lease(self, voice: VoicePrompt) -> Iterator[VoicePrompt]:
+        """
+        借出音色的一份独占副本，合成结束后归还
+        CosyVoice合成时会把文本写入spk2info中该音色的字典，同一音色并发合成（多个TTS线程、
+        批内并发、流式与整段合成重叠）时每次合成都要使用各自的副本；副本是浅拷贝，特征张量共享（只读）。
+        副本数等于同时合成的最大数量，空闲副本被后续合成复用
+        """
+        if not voice.precomputed:
+            yield voice
+            return
+        with self._lease_lock:
+            free = self._free_replicas.setdefault(voice.spk_id, [])
+            if free:
+                index = free.pop()
+            else:
+                index = self._replica_counts.get(voice.spk_id, 0)
+                self._replica_counts[voice.spk_id] = index + 1
+            replica = self._replica(voice, index)
+        try:
+            yield replica
+        finally:
+            with self._lease_lock:
+                free.append(index)
+
+    def _replica(self, voice: VoicePrompt, index: int) -> VoicePrompt:
+        """第index份副本（0为注册的音色本身）"""
+        if index == 0:
+            return voice
+        spk_id = f"{voice.spk_id}_{index}"
+        spk2info = self.tts_model.frontend.spk2info
+        if spk_id not in spk2info:
+            spk2info[spk_id] = dict(spk2info[voice.spk_id])
+        return VoicePrompt(voice.ref_audio, voice.prompt_text, spk_id, precomputed=True)
+
+    def stats(self) -> list:
+        """已注册的音色列表"""
+        return [voice.to_dict() for voice in list(self._voices.values())]
@@ -0,0 +1,184 @@
+"""
+实时语音会话模块
+WebSocket连接逐帧送入16kHz PCM，服务端边收边做流式VAD和分块ASR：
+检测到说话开始后每凑满一个ASR分块就识别一次（返回中间结果），
+检测到说话结束（持续静音）时识别剩余音频，得到整句文本
+"""
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from audio_buffer import concat, pcm16_to_float32
+
+
+class Utterance:
+    """
+    一句话的识别状态：流式ASR缓存和累计的中间结果
+
+    每句话一个实例并随事件传递：一段音频可能同时产生上一句的剩余分块、speech_end
+    和下一句的speech_start，事件处理（识别）在feed返回之后才进行，不能读取会话上已经切换到下一句的状态
+    """
+
+    def __init__(self):
+        self.asr_cache = {}
+        self.partial_text = ""
+
+
+# 会话事件：(类型, 音频, 所属的一句话)
+#   speech_start: 检测到开始说话
+#   asr_chunk:    凑满一个ASR分块，音频为该分块
+#   speech_end:   说话结束，音频为剩余未识别的部分（需以is_final=True识别）
+#   speech_discard: 语音过短被丢弃（已送入的ASR分块作废）
+SessionEvent = Tuple[str, Optional[np.ndarray], Utterance]
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """16位小端PCM转float32"""
+    return pcm16_to_float32(data)
+
+
+class VoiceSession:
+    """
+    单个连接的状态：流式VAD、端点检测、ASR缓存与待识别的音频
+
+    vad_stream为None时（VAD未加载）不做端点检测，所有音频都视为语音，
+    只能由客户端发送end消息结束一句话
+    """
+
+    def __init__(
+        self,
+        vad_stream=None,
+        frame_size: int = 512,
+        sample_rate: int = 16000,
+        asr_chunk_samples: int = 9600,
+        threshold: float = 0.5,
+        min_speech_ms: int = 250,
+        end_silence_ms: int = 700,
+        speech_pad_ms: int = 200,
+        max_utterance_seconds: float = 30.0,
+    ):
+        self.vad_stream = vad_stream
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.asr_chunk_samples = asr_chunk_samples
+        self.threshold = threshold
+        self.neg_threshold = max(threshold - 0.15, 0.01)
+        self.min_speech_samples = sample_rate * min_speech_ms // 1000
+        self.end_silence_samples = sample_rate * end_silence_ms // 1000
+        self.max_utterance_samples = int(sample_rate * max_utterance_seconds)
+
+        # 说话开始前保留的音频（语音区间前的填充）
+        self._preroll = deque(maxlen=max(1, sample_rate * speech_pad_ms // 1000 // frame_size))
+        self._unframed = np.zeros(0, dtype=np.float32)
+        self._pending: List[np.ndarray] = []  # 已确认属于当前语音、尚未送入ASR的音频
+        self._pending_samples = 0
+        self.reset()
+
+    def reset(self):
+        """清空当前语音（ASR缓存、中间结果、端点检测状态）"""
+        self.in_speech = False
+        self.utterance = Utterance()
+        self._speech_samples = 0
+        self._utterance_samples = 0
+        self._silence_samples = 0
+        self._pending.clear()
+        self._pending_samples = 0
+        self._preroll.clear()
+
+    def feed(self, audio: np.ndarray) -> List[SessionEvent]:
+        """送入一段新到的音频，返回触发的事件"""
+        if self.vad_stream is None:
+            events = [] if self.in_speech else [self._start()]
+            self._append(audio)
+            return events + self._take_chunks()
+
+        audio = np.concatenate([self._unframed, audio]) if len(self._unframed) else audio
+        usable = len(audio) // self.frame_size * self.frame_size
+        self._unframed = audio[usable:].copy()
+        if usable == 0:
+            return []
+
+        frames = audio[:usable]
+        probs = self.vad_stream.feed(frames)
+        events = []
+        for i, prob in enumerate(probs.tolist()):
+            frame = frames[i * self.frame_size:(i + 1) * self.frame_size]
+            events.extend(self._on_frame(frame, prob))
+        return events
+
+    def finish(self) -> List[SessionEvent]:
+        """客户端主动结束当前语音（如松开按键），返回speech_end或空列表"""
+        if not self.in_speech:
+            return []
+        if len(self._unframed):
+            self._append(self._unframed)
+            self._unframed = np.zeros(0, dtype=np.float32)
+        return [self._end()]
+
+    def _on_frame(self, frame: np.ndarray, prob: float) -> List[SessionEvent]:
+        if not self.in_speech:
+            if prob < self.threshold:
+                self._preroll.append(frame)
+                return []
+            event = self._start()
+            for previous in self._preroll:
+                self._append(previous)
+            self._preroll.clear()
+            self._append(frame)
+            self._speech_samples += len(frame)
+            return [event] + self._take_chunks()
+
+        self._append(frame)
+        if prob >= self.threshold:
+            self._speech_samples += len(frame) + self._silence_samples
+            self._silence_samples = 0
+        elif prob < self.neg_threshold:
+            self._silence_samples += len(frame)
+
+        if self._silence_samples >= self.end_silence_samples:
+            if self._speech_samples < self.min_speech_samples:
+                utterance = self.utterance
+                self.reset()
+                return [("speech_discard", None, utterance)]
+            return [self._end()]
+        if self._utterance_samples >= self.max_utterance_samples:
+            return [self._end()]
+        return self._take_chunks()
+
+    def _append(self, audio: np.ndarray):
+        self._pending.append(audio)
+        self._pending_samples += len(audio)
+        self._utterance_samples += len(audio)
+
+    def _take_chunks(self) -> List[SessionEvent]:
+        """待识别音频每凑满一个ASR分块就产出一个asr_chunk事件"""
+        if self._pending_samples < self.asr_chunk_samples:
+            return []
+        audio = concat(self._pending)
+        events = []
+        offset = 0
+        while len(audio) - offset >= self.asr_chunk_samples:
+            events.append(("asr_chunk", audio[offset:offset + self.asr_chunk_samples], self.utterance))
+            offset += self.asr_chunk_samples
+        rest = audio[offset:]
+        self._pending = [rest] if len(rest) else []
+        self._pending_samples = len(rest)
+        return events
+
+    def _start(self) -> SessionEvent:
+        """开始新的一句话（新的ASR缓存和识别结果，上一句的事件仍使用各自的状态）"""
+        self.in_speech = True
+        self.utterance = Utterance()
+        return ("speech_start", None, self.utterance)
+
+    def _end(self) -> SessionEvent:
+        """结束当前语音：产出剩余音频，保留ASR缓存供最后一次识别使用（VAD状态跨句保留）"""
+        rest = concat(self._pending) if self._pending else np.zeros(0, dtype=np.float32)
+        self._pending = []
+        self._pending_samples = 0
+        self.in_speech = False
+        self._speech_samples = 0
+        self._utterance_samples = 0
+        self._silence_samples = 0
+        return ("speech_end", rest, self.utterance)